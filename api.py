@@ -0,0 +1,187 @@
+import math
+
+import numpy
+
+from parameters import Parameters
+from parser import Parser
+from simulation import Simulation
+
+################################################################################
+# Library interface to the simulation, for calibration loops and notebooks:
+#
+#   from api import simulate, readConfig
+#   config = readConfig('input.csv')            # read (and parse) once...
+#   config['parameters']['INITIAL_SEED'] = 42   # ...then vary in memory
+#   result = simulate(config, exit_records = True)
+#   result.getPopulation(), result.getExitRecordFrame(), result.getGrid()
+#
+# By default nothing is written to disk: see the sink argument of simulate.
+################################################################################
+
+# columns of the exit-record table, in the order of the per-symbiont CSV file
+# (see Symbiont.openCSVFile), each with the index of its value in the records
+# made by Symbiont.csvOutputOnExit, and its numpy dtype
+EXIT_RECORD_COLUMNS : tuple[tuple[str, int, object]] = ( \
+    ('symbID', 0, numpy.int64),   ('poolOrDiv', 1, object),  ('parent', 2, numpy.int64), \
+    ('agentZero', 3, numpy.int64), ('clade', 4, numpy.int64), ('mcr', 5, numpy.float64), \
+    ('ppr', 6, numpy.float64),    ('arrTime', 7, numpy.float64), ('exitTime', 8, numpy.float64), \
+    ('exitStatus', 9, object),    ('lastEventTime', 10, numpy.float64), \
+    ('lastEventType', 11, object), ('arrSurplus', 12, numpy.float64), \
+    ('exitSurplus', 13, numpy.float64), ('divs', 14, numpy.int64), \
+    ('tEsc', 15, numpy.float64),  ('tDig', 16, numpy.float64), ('tRes', 17, numpy.float64), \
+    ('cells', 18, object),        ('inhabitTimes', 19, object), ('hcds', 20, object), \
+    ('g0Times', 21, object),      ('g1sg2mTimes', 22, object))
+
+################################################################################
+class Result:
+    ''' Class holding the results of one simulation run (see simulate) as
+        numpy arrays (and, on request, pandas DataFrames) '''
+
+    __slots__ = ('_population', '_interval', '_exit_records', '_grid', '_summary', \
+                 '_stop')
+
+    ############################################################################
+    def __init__(self, population: numpy.ndarray, interval: float, \
+                 exit_records: dict[str, numpy.ndarray], grid: dict[str, numpy.ndarray], \
+                 summary: str, stop: tuple[str, float]) -> None:
+        self._population   = population
+        self._interval     = interval
+        self._exit_records = exit_records
+        self._grid         = grid
+        self._summary      = summary
+        self._stop         = stop
+
+    ############################################################################
+    def getPopulation(self) -> numpy.ndarray:
+        ''' returns the population time series: 2D array with one row per
+            sample; column 0 is the total number of symbionts and column c+1
+            the number of symbionts of clade c (see getTimes) '''
+        return self._population
+
+    def getTimes(self) -> numpy.ndarray:
+        ''' returns the sample times (in days) of the population time series '''
+        return numpy.arange(self._population.shape[0]) * self._interval
+
+    def getExitRecords(self) -> dict[str, numpy.ndarray] or None:
+        ''' returns the per-symbiont exit records as a dict mapping column
+            name (as in the per-symbiont CSV file) to a numpy array (object
+            arrays of lists for the multi-valued columns), or None if not
+            requested '''
+        return self._exit_records
+
+    def getGrid(self) -> dict[str, numpy.ndarray] or None:
+        ''' returns the final state of the sponge as a dict of 2D (rows x cols)
+            arrays: 'clade' and 'symbID' of the occupying symbiont (-1 if
+            empty), its 'surplus' (nan if empty), the cell 'demand', and the
+            'numOccupants' that have left each cell; None if the result came
+            from the result cache '''
+        return self._grid
+
+    def getSummary(self) -> str or None:
+        ''' returns the exit-statistics summary (if WRITE_SUMMARY_INFO) '''
+        return self._summary
+
+    def getStopReason(self) -> tuple[str, float] or None:
+        ''' returns (reason, time) if the run was stopped early by a stopping
+            rule, or None '''
+        return self._stop
+
+    ############################################################################
+    def getPopulationFrame(self) -> 'pandas.DataFrame':
+        ''' returns the population time series as a pandas DataFrame indexed
+            by time, with columns 'total', 'clade0', 'clade1', ... '''
+        import pandas
+        columns = ['total'] + [f'clade{c}' for c in range(self._population.shape[1] - 1)]
+        return pandas.DataFrame(self._population, columns = columns, \
+                                index = pandas.Index(self.getTimes(), name = 'time'))
+
+    def getExitRecordFrame(self) -> 'pandas.DataFrame' or None:
+        ''' returns the exit records (see getExitRecords) as a pandas DataFrame '''
+        if self._exit_records is None: return None
+        import pandas
+        return pandas.DataFrame(self._exit_records)
+
+################################################################################
+def readConfig(csv_fname: str) -> dict:
+    ''' reads a configuration from an input CSV file, to be modified in memory
+        and passed (possibly many times) to simulate; see Parser.readConfig '''
+    return Parser.readConfig(csv_fname)
+
+################################################################################
+def simulate(config: dict or str, overrides: dict[str, object] = None, \
+             clade_overrides: dict[int, dict[str, object]] = None, \
+             exit_records: bool = False, sink: str = 'memory', \
+             use_cache: bool = False) -> Result:
+    ''' runs the simulation and returns its results in memory
+    Parameters:
+        config: a configuration (see readConfig), or an input CSV filename
+        overrides, clade_overrides: parameter values to use in place of those
+            in the configuration (see Parser.applyOverrides)
+        exit_records: whether to collect the per-symbiont exit records (i.e.,
+            the contents of the per-symbiont CSV file); overrides
+            WRITE_CSV_INFO
+        sink: 'memory' (default) writes no files; 'null' writes no files and
+            collects no exit records; 'file' writes the output files named in
+            the configuration, including the per-symbiont CSV file in place
+            of the exit records (see Simulation.run)
+        use_cache: whether to use the result cache (see result_cache.py); a
+            cached result has no exit records and no grid
+    Returns:
+        a Result
+    Raises:
+        ValueError, for an invalid configuration, override, or sink
+    '''
+    overrides = dict(overrides or {})
+    overrides['WRITE_CSV_INFO'] = exit_records
+    if isinstance(config, str): config = readConfig(config)
+    Simulation.run(config = config, overrides = overrides, \
+                   clade_overrides = clade_overrides, use_cache = use_cache, sink = sink)
+
+    records = None
+    if exit_records and Simulation.getExitRecords() is not None:
+        records = _exitRecordTable(Simulation.getExitRecords())
+    sponge = Simulation.getSponge()
+    series = Simulation.getPopulationSeries()
+    return Result(series.copy(), Parameters.POPULATION_INTERVAL, records, \
+                  _gridArrays(sponge) if sponge is not None else None, \
+                  Simulation.getSummary(), Simulation.getStopReason())
+
+################################################################################
+def _exitRecordTable(records: list[tuple]) -> dict[str, numpy.ndarray]:
+    ''' converts exit records (see Symbiont.csvOutputOnExit) to a dict of
+        numpy arrays, one per column '''
+    table = {}
+    for name, index, dtype in EXIT_RECORD_COLUMNS:
+        values = [record[index] for record in records]
+        if name in ('poolOrDiv', 'exitStatus', 'lastEventType'):
+            values = [value.name for value in values]   # enumerations
+        if dtype is object:
+            column = numpy.empty(len(values), dtype = object)
+            column[:] = values
+        else:
+            column = numpy.array(values, dtype = dtype)
+        table[name] = column
+        if name == 'lastEventType':   # as in the CSV file
+            table['resTime'] = table['exitTime'] - table['arrTime']
+    return table
+
+################################################################################
+def _gridArrays(sponge: 'Sponge') -> dict[str, numpy.ndarray]:
+    ''' returns the state of each cell of the sponge as 2D numpy arrays '''
+    rows, cols = sponge.getDimensions()
+    grid = {'clade':        numpy.full((rows, cols), -1, dtype = numpy.int64), \
+            'symbID':       numpy.full((rows, cols), -1, dtype = numpy.int64), \
+            'surplus':      numpy.full((rows, cols), math.nan), \
+            'demand':       numpy.empty((rows, cols)), \
+            'numOccupants': numpy.empty((rows, cols), dtype = numpy.int64)}
+    for r in range(rows):
+        for c in range(cols):
+            cell = sponge.getCell(r, c)
+            grid['demand'][r, c]       = cell.getDemand()
+            grid['numOccupants'][r, c] = cell.getNumOccupants()
+            symbiont = cell.getSymbiont()
+            if symbiont is not None:
+                grid['clade'][r, c]   = symbiont.getCladeNumber()
+                grid['symbID'][r, c]  = symbiont.getID()
+                grid['surplus'][r, c] = symbiont.getSurplus()
+    return grid
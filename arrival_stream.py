@@ -0,0 +1,107 @@
+from bisect import bisect_left
+from itertools import accumulate
+
+from parameters import INFINITY
+from rng_mt19937 import RNG, Stream
+
+################################################################################
+class ArrivalStream:
+    ''' Class to implement the arrival process of symbionts from the pool as a
+        pre-generated stream of arrival times, merged with the event list by
+        the main simulation loop (see Simulation.runUntil) rather than stored
+        in it: arrival times are generated in blocks of BLOCK_SIZE, as the
+        cumulative sums of exponential(AVG_TIME_BETWEEN_ARRIVALS) draws from
+        Stream.ARRIVALS.  The draws, and their sums (added in order, as one at
+        a time), are exactly those of scheduling each arrival at the previous
+        one, so the arrival times are unchanged; only the heap no longer
+        carries arrival events.
+
+        The stream can be suspended while the sponge is full, when every
+        arrival would be rejected (see ARRIVAL_FAST_FORWARD in simulation.py),
+        and resumed once a cell frees up: either exactly, with the arrival
+        times of the unsuspended stream (those in between being skipped, see
+        skipBefore), or, by the memoryless property of the exponential, with
+        arrival times drawn afresh from the time of resumption.
+    '''
+    BLOCK_SIZE : int = 1024
+
+    __slots__ = ('_mean', '_times', '_index', '_last', '_suspended')
+
+    ############################################################################
+    def __init__(self, mean: float or None) -> None:
+        ''' initializer, generating the first block of arrival times
+        Parameters:
+            mean: average time between arrivals (days), or None for no
+                arrivals at all
+        '''
+        self._mean  : float or None = mean
+        self._times : list[float]   = []
+        self._index : int           = 0
+        self._last  : float         = 0.0   # last time generated so far
+        self._suspended : bool      = False
+        self._generate()
+
+    ############################################################################
+    def _generate(self) -> None:
+        ''' generates the next block of arrival times '''
+        self._index = 0
+        if self._mean is None:
+            self._times = [INFINITY]
+            return
+        draws = RNG.exponential(self._mean, Stream.ARRIVALS, size = self.BLOCK_SIZE)
+        self._times = list(accumulate(draws.tolist(), initial = self._last))[1:]
+        self._last  = self._times[-1]
+
+    ############################################################################
+    def peek(self) -> float:
+        ''' returns the time of the next arrival (INFINITY while suspended) '''
+        return INFINITY if self._suspended else self._times[self._index]
+
+    def advance(self) -> float:
+        ''' moves past the next arrival (once it has been handled)
+        Returns:
+            the time of the arrival after it (INFINITY while suspended)
+        '''
+        self._index += 1
+        if self._index == len(self._times): self._generate()
+        return INFINITY if self._suspended else self._times[self._index]
+
+    ############################################################################
+    def isSuspended(self) -> bool: return self._suspended
+
+    def suspend(self) -> None:
+        ''' suspends the stream: no arrivals until resume '''
+        self._suspended = True
+
+    def resume(self, time: float or None = None) -> None:
+        ''' resumes the stream
+        Parameters:
+            time: None to resume with the next arrival not yet skipped (see
+                skipBefore), as if never suspended; otherwise the current
+                time, from which the arrival times are drawn afresh
+        '''
+        self._suspended = False
+        if time is not None:
+            self._last = time
+            self._generate()
+
+    ############################################################################
+    def upcoming(self) -> float:
+        ''' returns the time of the next arrival, even while suspended '''
+        return self._times[self._index]
+
+    def skipBefore(self, time: float) -> tuple[int, float or None]:
+        ''' moves past all arrivals before the given time, unhandled
+        Returns:
+            the number of arrivals skipped, and the time of the last one
+            (None if none)
+        '''
+        skipped, last = 0, None
+        while True:
+            index = bisect_left(self._times, time, self._index)
+            if index > self._index:
+                skipped += index - self._index
+                last = self._times[index - 1]
+            self._index = index
+            if index < len(self._times): return skipped, last
+            self._generate()
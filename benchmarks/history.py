@@ -0,0 +1,124 @@
+import datetime
+import json
+import os.path
+import platform
+import subprocess
+import sys
+
+################################################################################
+# Stored benchmark history: a JSON file holding a list of entries, one per
+# benchmark session, each with the time, git commit, environment, and the
+# seconds of each benchmark (per call for micro-benchmarks, CPU seconds per
+# run for scaling runs), so that sessions can be compared (see compare).
+################################################################################
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(ROOT, "benchmarks", "history.json")
+
+################################################################################
+def gitCommit() -> str or None:
+    ''' returns the current git commit (short hash, with "+dirty" if there are
+        uncommitted changes), or None outside a git checkout '''
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd = ROOT, \
+            capture_output = True, text = True, check = True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], \
+            cwd = ROOT, capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("+dirty" if dirty else "")
+
+################################################################################
+def load(path: str = DEFAULT_PATH) -> list[dict]:
+    ''' returns the list of history entries (empty if there is no file) '''
+    if not os.path.exists(path): return []
+    with open(path) as file:
+        return json.load(file)
+
+################################################################################
+def append(results: dict[str, float], label: str = None, \
+           path: str = DEFAULT_PATH) -> dict:
+    ''' appends an entry with the given results (benchmark name -> seconds)
+        to the history file
+    Returns:
+        the new entry
+    '''
+    import numpy
+    entry = {'timestamp': datetime.datetime.now().isoformat(timespec = 'seconds'), \
+             'commit': gitCommit(), 'label': label, \
+             'python': platform.python_version(), 'numpy': numpy.__version__, \
+             'machine': f"{platform.node()} {platform.machine()} {platform.processor()}".strip(), \
+             'results': results}
+    history = load(path)
+    history.append(entry)
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump(history, file, indent = 1)
+    os.replace(temporary, path)
+    return entry
+
+################################################################################
+def findEntry(history: list[dict], ref: str) -> dict:
+    ''' returns the history entry given by ref: an index (e.g., -1 for the
+        latest), or else the latest entry whose label or commit starts with ref
+    Raises:
+        ValueError, if there is no such entry
+    '''
+    try:
+        return history[int(ref)]
+    except ValueError:
+        pass
+    except IndexError:
+        raise ValueError(f"Error in history: no entry {ref} ({len(history)} entries)")
+    for entry in reversed(history):
+        if entry.get('label') == ref or (entry.get('commit') or "").startswith(ref):
+            return entry
+    raise ValueError(f"Error in history: no entry with label or commit {ref}")
+
+################################################################################
+def compare(baseline: dict, current: dict, threshold: float = 0.10) \
+        -> list[tuple[str, float, float, float, str]]:
+    ''' compares the results of two history entries
+    Parameters:
+        baseline, current: history entries
+        threshold: relative change (e.g., 0.10 for 10%) beyond which a
+            benchmark is flagged as a regression (slower) or an improvement
+    Returns:
+        list of (name, baseline seconds, current seconds, ratio, flag) for
+        the benchmarks in both entries, where flag is 'REGRESSION',
+        'improved', or ''
+    '''
+    rows = []
+    for name, seconds in current['results'].items():
+        if name not in baseline['results']: continue
+        before = baseline['results'][name]
+        ratio = seconds / before if before > 0 else float('inf')
+        flag = 'REGRESSION' if ratio > 1 + threshold else \
+               'improved' if ratio < 1 - threshold else ''
+        rows.append((name, before, seconds, ratio, flag))
+    return rows
+
+################################################################################
+def describe(entry: dict) -> str:
+    ''' returns a one-line description of a history entry '''
+    label = f" [{entry['label']}]" if entry.get('label') else ""
+    return f"{entry['timestamp']} {entry.get('commit') or '(no commit)'}{label}" + \
+           f" -- {len(entry['results'])} results"
+
+################################################################################
+def printComparison(baseline: dict, current: dict, threshold: float) -> int:
+    ''' prints the comparison of two entries (see compare)
+    Returns:
+        the number of regressions
+    '''
+    print(f"baseline: {describe(baseline)}")
+    print(f"current:  {describe(current)}")
+    if baseline.get('machine') != current.get('machine'):
+        print("WARNING: the entries were recorded on different machines")
+    rows = compare(baseline, current, threshold)
+    print(f"{'benchmark':<64}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, before, seconds, ratio, flag in rows:
+        print(f"{name:<64}{before:>12.4g}{seconds:>12.4g}{ratio:>8.3f}  {flag}")
+    regressions = sum([1 for row in rows if row[4] == 'REGRESSION'])
+    print(f"{regressions} regression(s) beyond {threshold:.0%}")
+    return regressions
@@ -0,0 +1,77 @@
+import argparse
+import os.path
+import statistics
+import subprocess
+import sys
+import time
+
+################################################################################
+# Benchmark of simulation start-up cost: the wall time for a fresh interpreter
+# to import the simulation modules (and, separately, to also parse an input
+# CSV file), which matters for sweeps of many short runs.  Also lists the
+# slowest imports as reported by python -X importtime.
+#
+#   python benchmarks/import_time.py [--repeats N] [--input input.csv]
+################################################################################
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+################################################################################
+def timeCommand(code: str, repeats: int) -> list[float]:
+    ''' runs "python -c code" (from the repository root) repeats times
+    Parameters:
+        code: the Python source to be run in a fresh interpreter
+        repeats: number of times to run
+    Returns:
+        list of wall times (in seconds)
+    '''
+    times = []
+    for r in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd = ROOT, check = True)
+        times.append(time.perf_counter() - start)
+    return times
+
+################################################################################
+def slowestImports(code: str, count: int) -> list[tuple[int, str]]:
+    ''' returns the count slowest imports (cumulative microseconds, module)
+        reported by python -X importtime when running "python -c code"
+    '''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], \
+                            cwd = ROOT, check = True, capture_output = True, text = True)
+    entries = []
+    for line in result.stderr.splitlines():
+        # lines look like: "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line: continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        entries.append((int(cumulative_us), module.rstrip()))
+    entries.sort(reverse = True)
+    return entries[:count]
+
+################################################################################
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "benchmark simulation start-up time")
+    parser.add_argument("--repeats", type = int, default = 10, \
+        help = "number of fresh interpreters to time (default: 10)")
+    parser.add_argument("--input", default = "input.csv", \
+        help = "input CSV file to parse (default: input.csv)")
+    args = parser.parse_args()
+
+    baseline = "pass"
+    imports  = "import simulation"
+    parse    = "import simulation; from parser import Parser; " + \
+               f"Parser.parseCSVInput({os.path.abspath(args.input)!r})"
+
+    print(f"{'':<28}{'median (ms)':>12}{'min (ms)':>12}")
+    for name, code in (("interpreter only", baseline), ("import simulation", imports), \
+                       ("import + parse input", parse)):
+        times = timeCommand(code, args.repeats)
+        print(f"{name:<28}{statistics.median(times)*1000:>12.1f}{min(times)*1000:>12.1f}")
+
+    print("\nslowest imports (cumulative):")
+    for cumulative_us, module in slowestImports(imports, 10):
+        print(f"{cumulative_us/1000:>10.1f} ms  {module}")
+
+##########################
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import concurrent.futures
+import contextlib
+import csv
+import multiprocessing
+import os.path
+import sys
+import tempfile
+
+################################################################################
+# Memory stress runs: the simulation is run with the per-symbiont CSV file on
+# (WRITE_CSV_INFO, the setting under which large runs have run out of memory)
+# and a memory report (see memory_report.py) on sponges of growing size, each
+# in a fresh process (so that its peak RSS is its own), and the footprint is
+# tabulated by grid and simulated time: live symbionts, bytes traced in all
+# and per symbiont, the bytes of Symbiont objects, their history lists, Event
+# objects, and Cell objects, and the peak RSS (each run's top allocation
+# sites are kept in memory.<grid>.txt, with --output-dir):
+#
+#   python benchmarks/memory.py [--grids 25,50,100] [--days 30] [--interval 5]
+#
+# The scaled configurations are those of scaling.py (the input CSV's initial
+# density on each sponge).  Tracing slows the runs several-fold.
+################################################################################
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from parser import Parser
+from scaling import scaledConfig, parseList
+
+COLUMNS : tuple[str] = ('liveSymbionts', 'tracedMB', 'bytesPerSymbiont', 'symbiontMB', \
+                        'historyMB', 'eventMB', 'cellMB', 'peakRssMB')
+
+################################################################################
+def runGrid(input_csv: str, side: int, days: float, interval: float, \
+            directory: str) -> list[dict[str, str]]:
+    ''' runs the scaled configuration of one grid with a memory report
+    Returns:
+        the rows of the memory report (see MemoryReport.columns)
+    '''
+    from simulation import Simulation
+    base = Parser.readConfig(input_csv)
+    config = scaledConfig(base, side, base['parameters']['AVG_TIME_BETWEEN_ARRIVALS'], \
+                          len(base['clades']), days)
+    config['parameters'].update({'WRITE_CSV_INFO': True, \
+        'CSV_FILENAME': os.path.join(directory, f"perSymbiont.{side}.csv"), \
+        'POPULATION_FILENAME': os.path.join(directory, f"population.{side}.txt"), \
+        'WRITE_SUMMARY_INFO': False})
+    report = os.path.join(directory, f"memory.{side}.csv")
+    # (the run's own report of allocation sites goes to memory.<side>.txt)
+    with open(os.path.join(directory, f"memory.{side}.txt"), "w") as text, \
+         contextlib.redirect_stdout(text):
+        Simulation.run(config = config, use_cache = False, memory_report = report, \
+                       memory_interval = interval)
+    with open(report) as file:
+        return list(csv.DictReader(file))
+
+################################################################################
+def runAll(input_csv: str, grids: list[int], days: float, interval: float, \
+           directory: str) -> dict[int, list[dict[str, str]]]:
+    ''' runs the grids in turn, each in a fresh process, printing a table of
+        each one's footprint as it finishes
+    Returns:
+        dict mapping grid side to the rows of its memory report
+    '''
+    results = {}
+    print(f"{'grid':>6}{'day':>8}" + ''.join(f"{c:>18}" for c in COLUMNS))
+    for side in grids:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = 1, \
+                mp_context = multiprocessing.get_context('spawn')) as pool:
+            rows = pool.submit(runGrid, input_csv, side, days, interval, directory).result()
+        results[side] = rows
+        for row in rows:
+            print(f"{side:>6}{float(row['simTime']):>8.1f}" + \
+                  ''.join(f"{float(row[c]):>18.6g}" for c in COLUMNS), flush = True)
+    return results
+
+################################################################################
+def main() -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description = "memory stress runs")
+    parser.add_argument("--input", default = os.path.join(ROOT, "input.csv"), \
+        help = "input CSV file of the base configuration (default: input.csv)")
+    parser.add_argument("--grids", default = "25,50,100", \
+        help = "sponge sides to run (default: 25,50,100)")
+    parser.add_argument("--days", type = float, default = 30.0, \
+        help = "simulated days per run (default: 30)")
+    parser.add_argument("--interval", type = float, default = 5.0, \
+        help = "simulated days between memory report rows (default: 5)")
+    parser.add_argument("--output-dir", default = None, \
+        help = "directory in which to keep the memory reports (and the " + \
+        "runs' other outputs); default: a temporary directory")
+    args = parser.parse_args()
+    if args.interval <= 0: parser.error("--interval must be positive")
+
+    grids = parseList(args.grids, int)
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok = True)
+        runAll(args.input, grids, args.days, args.interval, args.output_dir)
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        runAll(args.input, grids, args.days, args.interval, directory)
+
+##########################
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os.path
+import statistics
+import sys
+import timeit
+
+import numpy
+
+################################################################################
+# Micro-benchmarks of the simulation's hot paths, each timed in isolation on a
+# sponge filled to a given fraction of its cells:
+#
+#   EventList        insert + remove at steady state (the "hold" model)
+#   findOpenCell     random open cell over the whole grid (arrivals)
+#   _checkForOpenAdjacentCell  open cell in the Moore neighborhood (division)
+#   RNG.fuzz         fuzzed normal variate
+#   csvOutputOnExit  per-symbiont exit record pushed to the output pipeline
+#   formatCSVRecord  formatting of that record (in the writer thread)
+#
+# Run from the command line (or via benchmarks/run.py micro):
+#
+#   python benchmarks/micro.py [--input input.csv] [--repeat 5]
+################################################################################
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from parser import Parser
+from rng_mt19937 import RNG, Stream
+from event_list import Event, EventList, EventType
+from sponge import Sponge
+from symbiont import Symbiont, SymbiontState
+from output_writer import OutputWriter, Channel, NullSink
+
+################################################################################
+def timePerCall(function: 'callable', number: int, repeat: int) -> dict[str, float]:
+    ''' times repeat batches of number calls of function
+    Returns:
+        dict with the 'min' and 'median' seconds per call over the batches
+    '''
+    times = timeit.Timer(function).repeat(repeat = repeat, number = number)
+    return {'min': min(times) / number, 'median': statistics.median(times) / number}
+
+################################################################################
+def setUpSponge(input_csv: str, rows: int, cols: int, fill: float) -> list[Symbiont]:
+    ''' configures the simulation from input_csv with a rows x cols sponge,
+        with the given fraction of its cells occupied by symbionts at random
+    Returns:
+        the list of symbionts placed
+    '''
+    Parser.parseCSVInput(input_csv)
+    Parser.applyOverrides({'NUM_ROWS': rows, 'NUM_COLS': cols})
+    Symbiont.computeCumulativeCladeProportions()
+    Symbiont.initializeRun()
+    RNG.initializeStreams()
+    Symbiont.sponge = Sponge(rows, cols)
+    Symbiont.computeCladeConstants(rows)
+
+    placement = numpy.random.default_rng(0).permutation(rows * cols)
+    symbionts = []
+    for index in placement[:int(fill * rows * cols)]:
+        cell = Symbiont.sponge.getCell(int(index) // cols, int(index) % cols)
+        symbiont = Symbiont(len(symbionts) % len(Symbiont.clade_cumulative_proportions), \
+                            cell, 0.0)
+        cell.setSymbiont(symbiont, 0.0)
+        symbionts.append(symbiont)
+    return symbionts
+
+################################################################################
+def benchEventList(size: int, repeat: int) -> dict[str, float]:
+    ''' times one remove + insert on an event list holding size events '''
+    rng   = numpy.random.default_rng(0)
+    event_list = EventList()
+    for t in rng.exponential(13.0, size): event_list.insertEvent(Event(t, EventType.END_G0, None))
+    increments = rng.exponential(13.0, 1 << 16).tolist()
+    position = [0]
+
+    def hold() -> None:
+        event = event_list.getNextEvent()
+        position[0] = (position[0] + 1) & 0xFFFF
+        event_list.insertEvent(Event(event.getTime() + increments[position[0]], \
+                                     EventType.END_G0, None))
+    return timePerCall(hold, 20000, repeat)
+
+################################################################################
+def benchFindOpenCell(input_csv: str, side: int, fill: float, repeat: int) -> dict[str, float]:
+    ''' times Symbiont.findOpenCell on a side x side sponge '''
+    setUpSponge(input_csv, side, side, fill)
+    return timePerCall(Symbiont.findOpenCell, max(1, 200000 // (side * side)), repeat)
+
+################################################################################
+def benchCheckForOpenAdjacentCell(input_csv: str, fill: float, repeat: int) -> dict[str, float]:
+    ''' times Symbiont._checkForOpenAdjacentCell for symbionts away from the
+        top and bottom rows of a 50 x 50 sponge '''
+    symbionts = [s for s in setUpSponge(input_csv, 50, 50, fill) \
+                 if 0 < s._cell.getRowCol()[0] < 49]
+    position = [0]
+
+    def check() -> None:
+        position[0] = (position[0] + 1) % len(symbionts)
+        symbionts[position[0]]._checkForOpenAdjacentCell()
+    return timePerCall(check, 20000, repeat)
+
+################################################################################
+def benchFuzz(repeat: int) -> dict[str, float]:
+    ''' times RNG.fuzz (as used for G0 lengths) '''
+    RNG.initializeStreams()
+    return timePerCall(lambda: RNG.fuzz(13.0, 0.10, Stream.END_G0), 20000, repeat)
+
+################################################################################
+def benchCSVOutput(input_csv: str, repeat: int) -> dict[str, dict[str, float]]:
+    ''' times Symbiont.csvOutputOnExit (to a null sink) and
+        Symbiont.formatCSVRecord '''
+    symbionts = setUpSponge(input_csv, 50, 50, 0.5)
+    OutputWriter.start()
+    sink = NullSink()
+    Symbiont.openCSVSink(sink)
+    position = [0]
+
+    def output() -> None:
+        position[0] = (position[0] + 1) % len(symbionts)
+        symbionts[position[0]].csvOutputOnExit(10.0, SymbiontState.STILL_IN_RESIDENCE)
+    results = {'Symbiont.csvOutputOnExit': timePerCall(output, 20000, repeat)}
+    OutputWriter.finish()
+
+    # a representative record, as built by csvOutputOnExit
+    memory = []
+    sink.write = memory.append
+    OutputWriter.start(threaded = False)
+    Symbiont.openCSVSink(sink)
+    symbionts[0].csvOutputOnExit(10.0, SymbiontState.STILL_IN_RESIDENCE)
+    OutputWriter.finish()
+    record = memory[0]
+    results['Symbiont.formatCSVRecord'] = \
+        timePerCall(lambda: Symbiont.formatCSVRecord(record), 20000, repeat)
+    return results
+
+################################################################################
+def runAll(input_csv: str, repeat: int = 5) -> dict[str, dict[str, float]]:
+    ''' runs all micro-benchmarks
+    Returns:
+        dict mapping benchmark name to its timings (see timePerCall)
+    '''
+    results = {}
+    for size in (2500, 250000):
+        results[f'EventList.hold[{size}]'] = benchEventList(size, repeat)
+    for side, fill in ((50, 0.5), (50, 0.95), (50, 0.999), (200, 0.95)):
+        results[f'Symbiont.findOpenCell[{side}x{side},fill={fill}]'] = \
+            benchFindOpenCell(input_csv, side, fill, repeat)
+    for fill in (0.5, 0.95):
+        results[f'Symbiont._checkForOpenAdjacentCell[fill={fill}]'] = \
+            benchCheckForOpenAdjacentCell(input_csv, fill, repeat)
+    results['RNG.fuzz'] = benchFuzz(repeat)
+    results.update(benchCSVOutput(input_csv, repeat))
+    return results
+
+################################################################################
+def printResults(results: dict[str, dict[str, float]]) -> None:
+    print(f"{'benchmark':<52}{'min (us)':>12}{'median (us)':>14}")
+    for name, timing in results.items():
+        print(f"{name:<52}{timing['min']*1e6:>12.3f}{timing['median']*1e6:>14.3f}")
+
+################################################################################
+def main() -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description = "micro-benchmarks of the hot paths")
+    parser.add_argument("--input", default = os.path.join(ROOT, "input.csv"), \
+        help = "input CSV file giving the clade parameters (default: input.csv)")
+    parser.add_argument("--repeat", type = int, default = 5, \
+        help = "number of timed batches per benchmark (default: 5)")
+    args = parser.parse_args()
+    printResults(runAll(args.input, args.repeat))
+
+##########################
+if __name__ == "__main__":
+    main()
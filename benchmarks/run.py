@@ -0,0 +1,81 @@
+import argparse
+import sys
+
+import history
+import micro
+import scaling
+
+################################################################################
+# Driver for the benchmark suite: runs the micro-benchmarks (micro.py) and/or
+# the end-to-end scaling runs (scaling.py), optionally saving the results in
+# the JSON history (history.py), and compares history entries, flagging
+# regressions beyond a threshold (exit status 1 if there are any):
+#
+#   python benchmarks/run.py micro --save --label before-change
+#   python benchmarks/run.py all --grids 50,100,200 --save
+#   python benchmarks/run.py compare [--baseline before-change] [--threshold 0.1]
+#   python benchmarks/run.py list
+#
+# Timings depend on the machine and its load: compare entries recorded on the
+# same (otherwise idle) machine.
+################################################################################
+
+################################################################################
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "run and compare benchmarks")
+    parser.add_argument("--history", default = history.DEFAULT_PATH, \
+        help = "JSON history file (default: benchmarks/history.json)")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    for name, text in (("micro", "run the micro-benchmarks"), \
+                       ("scaling", "run the end-to-end scaling runs"), \
+                       ("all", "run both")):
+        command = commands.add_parser(name, help = text)
+        command.add_argument("--save", action = "store_true", \
+            help = "append the results to the history")
+        command.add_argument("--label", default = None, \
+            help = "label of the history entry (e.g., a branch name)")
+        command.add_argument("--repeat", type = int, default = 5, \
+            help = "timed batches per micro-benchmark (default: 5)")
+        scaling.addArguments(command)
+
+    command = commands.add_parser("compare", help = "compare two history entries")
+    command.add_argument("--baseline", default = "-2", \
+        help = "baseline entry: index, label, or commit (default: -2)")
+    command.add_argument("--current", default = "-1", \
+        help = "current entry: index, label, or commit (default: -1, the latest)")
+    command.add_argument("--threshold", type = float, default = 0.10, \
+        help = "relative slowdown flagged as a regression (default: 0.10)")
+
+    commands.add_parser("list", help = "list the history entries")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "list":
+            for index, entry in enumerate(history.load(args.history)):
+                print(f"{index:>4}  {history.describe(entry)}")
+            return
+        if args.command == "compare":
+            entries = history.load(args.history)
+            regressions = history.printComparison(history.findEntry(entries, args.baseline), \
+                history.findEntry(entries, args.current), args.threshold)
+            sys.exit(1 if regressions > 0 else 0)
+
+        results = {}
+        if args.command in ("micro", "all"):
+            timings = micro.runAll(args.input, args.repeat)
+            micro.printResults(timings)
+            results.update({name: timing['min'] for name, timing in timings.items()})
+        if args.command in ("scaling", "all"):
+            timings = scaling.runFromArguments(args)
+            results.update({name: timing['cpu'] for name, timing in timings.items()})
+    except ValueError as err:
+        parser.error(str(err))
+
+    if args.save:
+        entry = history.append(results, args.label, args.history)
+        print(f"saved: {history.describe(entry)}")
+
+##########################
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import copy
+import gc
+import os.path
+import sys
+import tempfile
+import time
+
+################################################################################
+# End-to-end scaling runs: the simulation is run (in process, without the
+# result cache) for a few simulated days while varying one factor at a time
+# around a base configuration (by default the input CSV on a 50 x 50 sponge):
+#
+#   grid      side of the (square) sponge, with the initial symbionts scaled
+#             to keep the input CSV's initial density
+#   arrival   AVG_TIME_BETWEEN_ARRIVALS
+#   clades    number of clades (copies of the input CSV's clades, in turn,
+#             in equal proportions)
+#   output    none (null sink), summary (exit statistics), csv or csv.gz
+#             (per-symbiont CSV file, in a temporary directory)
+#
+# Run from the command line (or via benchmarks/run.py scaling):
+#
+#   python benchmarks/scaling.py [--grids 50,100,200,500,1000] [--days 10]
+#
+# Run time grows quickly with the grid (initial placement alone searches the
+# whole grid per symbiont), so larger grids are skipped once a grid run has
+# taken longer than --budget seconds.
+################################################################################
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from parser import Parser
+from api import simulate
+
+OUTPUTS : tuple[str] = ('none', 'summary', 'csv', 'csv.gz')
+
+################################################################################
+def scaledConfig(base: dict, side: int, arrival: float, clades: int, \
+                 days: float) -> dict:
+    ''' returns a copy of the base configuration (see Parser.readConfig) with
+        a side x side sponge, the given time between arrivals and number of
+        clades, and MAX_SIMULATED_TIME days '''
+    config = copy.deepcopy(base)
+    parameters = config['parameters']
+    density = parameters['NUM_INITIAL_SYMBIONTS'] / \
+              (parameters['NUM_ROWS'] * parameters['NUM_COLS'])
+    parameters.update({'NUM_ROWS': side, 'NUM_COLS': side, \
+        'NUM_INITIAL_SYMBIONTS': int(round(density * side * side)), \
+        'AVG_TIME_BETWEEN_ARRIVALS': arrival, 'MAX_SIMULATED_TIME': days, \
+        'NUM_CLADES': clades, 'CLADE_PROPORTIONS': tuple([1 / clades] * clades), \
+        'PRINT_PARAMETER_VALUES': False, 'WRITE_LOGGING_INFO': False, \
+        'WRITE_TELEMETRY_INFO': False})
+    config['clades'] = [dict(base['clades'][c % len(base['clades'])], CLADE_NUMBER = c + 1) \
+                        for c in range(clades)]
+    return config
+
+################################################################################
+def timeRun(config: dict, output: str, directory: str) -> dict[str, float]:
+    ''' runs one configuration with the given output setting (see OUTPUTS)
+    Returns:
+        dict with the 'wall' and 'cpu' seconds of the run
+    '''
+    overrides = {'WRITE_SUMMARY_INFO': output == 'summary', 'SUMMARY_FILENAME': ""}
+    sink = 'null'
+    if output.startswith('csv'):
+        sink = 'file'
+        overrides.update({'CSV_FILENAME': os.path.join(directory, "perSymbiont." + output), \
+                          'POPULATION_FILENAME': os.path.join(directory, "population.txt")})
+    gc.collect()
+    wall, cpu = time.perf_counter(), time.process_time()
+    simulate(config, overrides, exit_records = output.startswith('csv'), sink = sink)
+    return {'wall': time.perf_counter() - wall, 'cpu': time.process_time() - cpu}
+
+################################################################################
+def runAll(input_csv: str, grids: list[int], arrivals: list[float], \
+           clades: list[int], outputs: list[str], days: float = 10.0, \
+           budget: float = 300.0, verbose: bool = True) -> dict[str, dict[str, float]]:
+    ''' runs the scaling matrix: each factor varied on its own, the others at
+        their first listed value; grids larger than one whose run took longer
+        than budget seconds are skipped
+    Returns:
+        dict mapping run name (e.g., 'scaling[grid=200,arrival=0.0833,clades=2,
+        output=none]') to its timings (see timeRun)
+    '''
+    base = Parser.readConfig(input_csv)
+    points = [(g, arrivals[0], clades[0], outputs[0]) for g in grids] + \
+             [(grids[0], a, clades[0], outputs[0]) for a in arrivals] + \
+             [(grids[0], arrivals[0], k, outputs[0]) for k in clades] + \
+             [(grids[0], arrivals[0], clades[0], o) for o in outputs]
+    results, too_slow = {}, None
+    with tempfile.TemporaryDirectory() as directory:
+        for side, arrival, num_clades, output in dict.fromkeys(points):
+            if too_slow is not None and side > too_slow:
+                if verbose: print(f"skipping grid={side} (grid={too_slow} took over {budget} s)")
+                continue
+            name = f"scaling[grid={side},arrival={arrival:.4g},clades={num_clades}," + \
+                   f"output={output}]"
+            config = scaledConfig(base, side, arrival, num_clades, days)
+            results[name] = timeRun(config, output, directory)
+            if results[name]['wall'] > budget:
+                too_slow = side if too_slow is None else min(too_slow, side)
+            if verbose:
+                print(f"{name:<60}{results[name]['wall']:>10.2f} s wall" + \
+                      f"{results[name]['cpu']:>10.2f} s cpu", flush = True)
+    return results
+
+################################################################################
+def parseList(text: str, convert: 'callable') -> list:
+    ''' parses a comma-separated list, e.g., "1/12,1/48" '''
+    return [convert(Parser.safeEval(item)) if convert is not str else item.strip() \
+            for item in text.split(',')]
+
+################################################################################
+def addArguments(parser: 'argparse.ArgumentParser') -> None:
+    ''' adds the scaling-run options to an argument parser '''
+    parser.add_argument("--input", default = os.path.join(ROOT, "input.csv"), \
+        help = "input CSV file of the base configuration (default: input.csv)")
+    parser.add_argument("--grids", default = "50,100,200,500,1000", \
+        help = "sponge sides to run (default: 50,100,200,500,1000)")
+    parser.add_argument("--arrivals", default = "1/12,1/48,1/192", \
+        help = "AVG_TIME_BETWEEN_ARRIVALS values (default: 1/12,1/48,1/192)")
+    parser.add_argument("--clades", default = "2,1,4,8", \
+        help = "numbers of clades (default: 2,1,4,8)")
+    parser.add_argument("--outputs", default = ",".join(OUTPUTS), \
+        help = f"output settings (default: {','.join(OUTPUTS)})")
+    parser.add_argument("--days", type = float, default = 10.0, \
+        help = "simulated days per run (default: 10)")
+    parser.add_argument("--budget", type = float, default = 300.0, \
+        help = "skip larger grids once a run takes longer than this many " + \
+        "seconds (default: 300)")
+
+def runFromArguments(args: 'argparse.Namespace') -> dict[str, dict[str, float]]:
+    outputs = parseList(args.outputs, str)
+    for output in outputs:
+        if output not in OUTPUTS:
+            raise ValueError(f"Error in scaling: unknown output setting {output}")
+    return runAll(args.input, parseList(args.grids, int), parseList(args.arrivals, float), \
+                  parseList(args.clades, int), outputs, args.days, args.budget)
+
+################################################################################
+def main() -> None:
+    import argparse
+    parser = argparse.ArgumentParser(description = "end-to-end scaling runs")
+    addArguments(parser)
+    args = parser.parse_args()
+    try:
+        runFromArguments(args)
+    except ValueError as err:
+        parser.error(str(err))
+
+##########################
+if __name__ == "__main__":
+    main()
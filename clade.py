@@ -190,6 +190,38 @@ class Clade:
     def setDeleteriousShape(self, value: float)             -> None: self._deleterious_shape              = value
     def setDeleteriousScale(self, value: float)             -> None: self._deleterious_scale              = value
 
+    # table mapping each clade-level parameter name used in the input CSV to
+    # the corresponding setter above (used by parser.py, which calls
+    # setter(clade, value))
+    CSV_SETTERS : dict[str, 'callable'] = {
+        'CLADE_NUMBER'                   : setCladeNumber,
+        'RESIDENCE_FUZZ'                 : setResidenceFuzz,
+        'G0_FUZZ'                        : setG0Fuzz,
+        'G1SG2M_FUZZ'                    : setG1SG2MFuzz,
+        'PHOTOSYNTHETIC_PRODUCTION_RATE' : setPhotosyntheticProductionRate,
+        'MITOTIC_COST_RATE'              : setMitoticCostRate,
+        'PPR_FUZZ'                       : setPPRFuzz,
+        'MCR_FUZZ'                       : setMCRFuzz,
+        'ARRIVAL_AFFINITY_PROB'          : setArrivalAffinityProb,
+        'DIVISION_AFFINITY_PROB'         : setDivisionAffinityProb,
+        'AVG_RESIDENCE_TIME'             : setAvgResidenceTime,
+        'G0_LENGTH'                      : setG0Length,
+        'G1SG2M_LENGTH'                  : setG1SG2MLength,
+        'G0_ESCAPE_PROB'                 : setG0EscapeProb,
+        'G1SG2M_ESCAPE_PROB'             : setG1SG2MEscapeProb,
+        'PARENT_EVICTION_PROB'           : setParentEvictionProb,
+        'PHOTOSYNTHETIC_REDUCTION'       : setPhotosyntheticReduction,
+        'INITIAL_SURPLUS_SHAPE'          : setInitialSurplusShape,
+        'INITIAL_SURPLUS_SCALE'          : setInitialSurplusScale,
+        'MAX_INITIAL_SURPLUS'            : setMaxInitialSurplus,
+        'PHENOTYPIC_MUTATION_PROB'       : setPhenotypicMutationProb,
+        'DELETERIOUS_PROB'               : setDeleteriousProb,
+        'BENEFICIAL_SHAPE'               : setBeneficialShape,
+        'BENEFICIAL_SCALE'               : setBeneficialScale,
+        'DELETERIOUS_SHAPE'              : setDeleteriousShape,
+        'DELETERIOUS_SCALE'              : setDeleteriousScale,
+    }
+
     ############################################################################
     ''' simple getter/accessor methods '''
     def getCladeNumber(self)             -> int:     return self._clade_number
@@ -250,3 +282,57 @@ class Clade:
         string += f"\t_deleterious_shape              : {self._deleterious_shape}\n"
         string += f"\t_deleterious_scale              : {self._deleterious_scale}"
         return string
+
+################################################################################
+class CladeConstants:
+    ''' class to hold the values of one clade that the symbionts' hot paths
+        use on (nearly) every event, computed once per run (see
+        Symbiont.computeCladeConstants) rather than with Clade getters per
+        event: the means and fuzz standard deviations (mean * fuzz) / 2 (see
+        RNG.fuzz) of the MCR and of the residence, G0, and G1SG2M times, the
+        escape and parent-eviction probabilities, the initial surplus gamma
+        parameters, and the north-to-south production gradient (see
+        Symbiont._computeProductionRate) -- as a table of the arrival PPR, and
+        of its fuzz standard deviation, by row.  The values are computed with
+        the same floating-point operations as before, so that results are
+        unchanged.  Attributes are public but must be treated as read-only.
+    '''
+    __slots__ = ('clade_number', 'mcr', 'mcr_sd', 'residence_time', 'residence_sd', \
+                 'g0_length', 'g0_sd', 'g1sg2m_length', 'g1sg2m_sd', \
+                 'g0_escape_prob', 'g1sg2m_escape_prob', 'parent_eviction_prob', \
+                 'initial_surplus_shape', 'initial_surplus_scale', 'max_initial_surplus', \
+                 'gradient', 'row_denominator', 'arrival_rates', 'arrival_rate_sds')
+
+    ############################################################################
+    def __init__(self, clade: Clade, num_rows: int) -> None:
+        ''' initializer for a CladeConstants object
+        Parameters:
+            clade: the Clade object whose values to hold
+            num_rows: number of rows in the sponge
+        '''
+        self.clade_number          : int   = clade.getCladeNumber()
+        self.mcr                   : float = float(clade.getMCR())
+        self.mcr_sd                : float = (self.mcr * float(clade.getMCRFuzz())) / 2
+        self.residence_time        : float = clade.getAvgResidenceTime()
+        self.residence_sd          : float = (self.residence_time * clade.getResidenceFuzz()) / 2
+        self.g0_length             : float = clade.getG0Length()
+        self.g0_sd                 : float = (self.g0_length * clade.getG0Fuzz()) / 2
+        self.g1sg2m_length         : float = clade.getG1SG2MLength()
+        self.g1sg2m_sd             : float = (self.g1sg2m_length * clade.getG1SG2MFuzz()) / 2
+        self.g0_escape_prob        : float = clade.getG0EscapeProb()
+        self.g1sg2m_escape_prob    : float = clade.getG1SG2MEscapeProb()
+        self.parent_eviction_prob  : float = clade.getParentEvictionProb()
+        self.initial_surplus_shape : float = clade.getInitialSurplusShape()
+        self.initial_surplus_scale : float = clade.getInitialSurplusScale()
+        self.max_initial_surplus   : float = clade.getMaxInitialSurplus()
+
+        # production rate at row x: rho + gradient * (x * rho / row_denominator)
+        # (a single-row sponge has no gradient: its only row is 0)
+        k = clade.getPhotosyntheticReduction()
+        self.gradient        : float = float(1-k)/k
+        self.row_denominator : float = float(num_rows-1) if num_rows > 1 else 1.0
+        rho = clade.getPPR()
+        self.arrival_rates    : list[float] = \
+            [rho + self.gradient * (row*rho/self.row_denominator) for row in range(num_rows)]
+        self.arrival_rate_sds : list[float] = \
+            [(rate * clade.getPPRFuzz()) / 2 for rate in self.arrival_rates]
@@ -0,0 +1,117 @@
+import gzip
+import io
+import lzma
+import os.path
+
+try:
+    import zstandard  # optional: https://pypi.org/project/zstandard/
+except ImportError:
+    zstandard = None
+
+################################################################################
+class CompressedIO:
+    ''' Class to open simulation output (and input) files, transparently
+        compressing/decompressing based on the file extension:
+            .gz           gzip
+            .xz           xz (LZMA)
+            .zst / .zstd  zstd (requires the optional zstandard package)
+        Any other extension is written as plain text.  Streams are wrapped in
+        large buffers so the compressor is fed big blocks (and so that the
+        writer thread makes few, large system calls).
+    '''
+
+    # class-level constants
+    BUFFER_SIZE : int = 1 << 20   # 1 MiB blocks handed to the compressor / disk
+
+    # default compression levels, chosen for throughput rather than ratio
+    # (e.g., gzip's own default of 9 is several times slower than 6 for only
+    # a few percent smaller output on these files)
+    DEFAULT_LEVELS : dict[str, int] = {'gzip': 6, 'xz': 3, 'zstd': 3}
+    LEVEL_RANGES   : dict[str, tuple[int, int]] = \
+        {'gzip': (1, 9), 'xz': (0, 9), 'zstd': (1, 22)}
+
+    # class-level variables
+    compress_level : int = None   # set via --compress-level; None: use defaults
+
+    ############################################################################
+    @staticmethod
+    def compressionFor(filename: str) -> str or None:
+        ''' static method to determine the compression format from a filename
+        Parameters:
+            filename: name of the file (str)
+        Returns:
+            one of 'gzip', 'xz', 'zstd', or None if not compressed
+        '''
+        ext = os.path.splitext(filename)[1].lower()
+        return {'.gz': 'gzip', '.xz': 'xz', '.zst': 'zstd', '.zstd': 'zstd'}.get(ext)
+
+    ############################################################################
+    @classmethod
+    def _level(cls, compression: str) -> int:
+        ''' returns the compression level to use for the given format
+        Raises:
+            ValueError, if the requested level is out of range for the format
+        '''
+        if cls.compress_level is None: return cls.DEFAULT_LEVELS[compression]
+        low, high = cls.LEVEL_RANGES[compression]
+        if cls.compress_level < low or cls.compress_level > high:
+            raise ValueError(f"Error in CompressedIO: {compression} compress level " + \
+                             f"must be in [{low},{high}], not {cls.compress_level}")
+        return cls.compress_level
+
+    ############################################################################
+    @classmethod
+    def openForWriting(cls, filename: str) -> io.TextIOBase:
+        ''' class-level method to open a text file for writing, compressing
+            according to its extension
+        Parameters:
+            filename: name of the file to be written (str)
+        Returns:
+            a writable text file object
+        Raises:
+            RuntimeError, if zstd output is requested but zstandard is missing
+        '''
+        compression = cls.compressionFor(filename)
+        if compression is None:
+            return open(filename, "w", buffering = cls.BUFFER_SIZE)
+
+        level = cls._level(compression)
+        if compression == 'gzip':
+            binary = gzip.GzipFile(filename, "wb", compresslevel = level)
+        elif compression == 'xz':
+            binary = lzma.LZMAFile(filename, "wb", preset = level)
+        else:
+            if zstandard is None:
+                raise RuntimeError(f"Error in CompressedIO: writing {filename} " + \
+                                   "requires the zstandard package")
+            raw    = open(filename, "wb")
+            # threads = -1: compress using as many threads as there are cores
+            compressor = zstandard.ZstdCompressor(level = level, threads = -1)
+            binary = compressor.stream_writer(raw, write_size = cls.BUFFER_SIZE, \
+                                              closefd = True)
+        buffered = io.BufferedWriter(binary, buffer_size = cls.BUFFER_SIZE)
+        return io.TextIOWrapper(buffered)
+
+    ############################################################################
+    @classmethod
+    def openForReading(cls, filename: str) -> io.TextIOBase:
+        ''' class-level method to open a text file for reading, decompressing
+            according to its extension
+        Parameters:
+            filename: name of the file to be read (str)
+        Returns:
+            a readable text file object
+        '''
+        compression = cls.compressionFor(filename)
+        if compression is None: return open(filename, "r")
+        if compression == 'gzip':
+            binary = gzip.open(filename, "rb")
+        elif compression == 'xz':
+            binary = lzma.open(filename, "rb")
+        else:
+            if zstandard is None:
+                raise RuntimeError(f"Error in CompressedIO: reading {filename} " + \
+                                   "requires the zstandard package")
+            binary = zstandard.ZstdDecompressor().stream_reader(open(filename, "rb"), \
+                                                                closefd = True)
+        return io.TextIOWrapper(io.BufferedReader(binary, buffer_size = cls.BUFFER_SIZE))
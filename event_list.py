@@ -1,5 +1,5 @@
 from enum import Enum
-from heapq import heappush, heappop
+from heapq import heappush, heappop, heappushpop
 
 ################################################################################
 class EventType(Enum):
@@ -90,6 +90,19 @@ class EventList:
         if len(self._heap) > 0: event = heappop(self._heap)
         return event   # empty list returns None
 
+    ##############################################
+    def exchangeEvent(self, event: 'Event') -> 'Event':
+        ''' inserts an event and returns the next event to occur, i.e., the
+            earlier of the given event and the first in the event list (used
+            when the caller holds an event taken from the list while others
+            may have been inserted since -- see Simulation.runUntil)
+        Parameters:
+            event: an Event object
+        Returns:
+            the Event object to occur next (taken from the list)
+        '''
+        return heappushpop(self._heap, event)
+
     ##############################################
     def insertEvent(self, event: 'Event') -> None:
         ''' inserts a new event in order of event time into the event list
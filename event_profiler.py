@@ -0,0 +1,129 @@
+from time import perf_counter_ns
+
+from event_list import EventType
+from symbiont import Symbiont, SymbiontState
+
+################################################################################
+class LatencyHistogram:
+    ''' Class to accumulate latencies (in ns) in log-spaced buckets: four
+        buckets per power of two, so that each bucket spans at most 25% of
+        its lower bound (as in HDR histograms) '''
+
+    SUB_BUCKETS : int = 4                 # per power of two
+    NUM_BUCKETS : int = 64 * SUB_BUCKETS  # enough for any 64-bit latency
+
+    __slots__ = ('_counts', '_count', '_total')
+
+    ############################################################################
+    def __init__(self) -> None:
+        self._counts = [0] * self.NUM_BUCKETS
+        self._count  = 0
+        self._total  = 0     # ns
+
+    ############################################################################
+    @staticmethod
+    def bucket(ns: int) -> int:
+        ''' returns the index of the bucket holding a latency of ns '''
+        bits = ns.bit_length()
+        if bits <= 2: return ns
+        return (bits - 2) * 4 + ((ns >> (bits - 3)) & 3)
+
+    @staticmethod
+    def lowerBound(index: int) -> int:
+        ''' returns the smallest latency (ns) in the bucket of the given index '''
+        if index < 4: return index
+        bits = index // 4 + 2
+        return (4 + index % 4) << (bits - 3)
+
+    ############################################################################
+    def add(self, ns: int) -> None:
+        self._counts[self.bucket(ns)] += 1
+        self._count += 1
+        self._total += ns
+
+    ############################################################################
+    def getCount(self) -> int: return self._count
+    def getTotal(self) -> int: return self._total   # ns
+
+    def getQuantile(self, p: float) -> float:
+        ''' returns an estimate of the p quantile (ns): the midpoint of the
+            bucket holding it (nan if empty) '''
+        if self._count == 0: return float('nan')
+        rank, seen = p * self._count, 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank and count > 0:
+                return (self.lowerBound(index) + self.lowerBound(index + 1)) / 2
+        return float(self.lowerBound(self.NUM_BUCKETS - 1))
+
+################################################################################
+class EventProfiler:
+    ''' Class to implement opt-in profiling of the simulation's event
+        handlers (see --profile-events in simulation.py): each handled event
+        is timed with perf_counter_ns, and the latencies are accumulated, per
+        handler branch, in log-bucketed histograms -- one branch per event
+        type, with END_G1SG2M broken down by division outcome.  When
+        profiling is disabled the simulation holds no hook at all: the event
+        handlers are wrapped with timing handlers (see wrapHandlers) only
+        when it is enabled.
+    '''
+
+    # class-level variables
+    _histograms : dict[str, LatencyHistogram] = {}   # branch name -> histogram
+
+    ############################################################################
+    @classmethod
+    def wrapHandlers(cls, handlers: dict) -> dict:
+        ''' class-level method to reset the histograms and return a copy of
+            the simulation's event-handler table (see Simulation.runUntil) in
+            which each handler is timed '''
+        cls._histograms = {}
+
+        def timed(event_type: EventType, handler: 'callable') -> 'callable':
+            histogram = cls._histograms.setdefault(event_type.name, LatencyHistogram())
+            add = histogram.add
+            def handle(event_type: EventType, symbiont: Symbiont, trace: 'callable') -> None:
+                start = perf_counter_ns()
+                handler(event_type, symbiont, trace)
+                add(perf_counter_ns() - start)
+            return handle
+
+        def timedDivision(event_type: EventType, handler: 'callable') -> 'callable':
+            # one histogram per division outcome (see Symbiont.endOfG1SG2M)
+            adds = {}
+            for outcome in Symbiont.DIVISION_OUTCOMES:
+                histogram = LatencyHistogram()
+                cls._histograms[f"{event_type.name}:{outcome.name}"] = histogram
+                adds[outcome] = histogram.add
+            def handle(event_type: EventType, symbiont: Symbiont, trace: 'callable') -> None:
+                start = perf_counter_ns()
+                handler(event_type, symbiont, trace)
+                elapsed = perf_counter_ns() - start
+                adds[Symbiont.getLastDivisionOutcome()](elapsed)
+            return handle
+
+        return {event_type: (timedDivision if event_type == EventType.END_G1SG2M \
+                             else timed)(event_type, handler) \
+                for event_type, handler in handlers.items()}
+
+    ############################################################################
+    @classmethod
+    def getHistograms(cls) -> dict[str, LatencyHistogram]:
+        ''' class-level method returning the histograms, by branch name '''
+        return dict(cls._histograms)
+
+    ############################################################################
+    @classmethod
+    def formatReport(cls) -> str:
+        ''' class-level method returning the report: per branch (with any
+            events), the count, total time, mean, p50, and p99 latency '''
+        lines = [f"{'branch':<36}{'count':>10}{'total (ms)':>12}{'mean (us)':>11}" + \
+                 f"{'p50 (us)':>10}{'p99 (us)':>10}"]
+        for name, histogram in cls._histograms.items():
+            count = histogram.getCount()
+            if count == 0: continue
+            lines.append(f"{name:<36}{count:>10}{histogram.getTotal() / 1e6:>12.1f}" + \
+                         f"{histogram.getTotal() / count / 1e3:>11.2f}" + \
+                         f"{histogram.getQuantile(0.50) / 1e3:>10.2f}" + \
+                         f"{histogram.getQuantile(0.99) / 1e3:>10.2f}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,203 @@
+import math
+import mmap
+import struct
+import sys
+
+from event_list import EventType
+from symbiont import SymbiontState
+from compressed_io import CompressedIO
+
+################################################################################
+class TraceRole:
+    ''' identifies the role a symbiont plays in a trace record '''
+    PRIMARY = 0   # the symbiont driving the event (None for rejected arrivals)
+    CHILD   = 1   # the child resulting from an END_G1SG2M event
+    INITIAL = 2   # a symbiont placed in the sponge at t=0
+
+################################################################################
+class EventTrace:
+    ''' Class to implement structured, binary event tracing for the simulation.
+        Each traced (event, symbiont) pair is written as one fixed-width record
+            time, agent ID, surplus, residence time, clade, event type,
+            outcome, role
+        into a memory-mapped file, so tracing does no formatting inside the
+        event loop.  When tracing is disabled the simulation holds no hook at
+        all (see Simulation.run), so nothing is evaluated per event.  The
+        decode() method renders a trace file as text, in the layout of the
+        log previously produced by logging (run: python event_trace.py
+        trace_file [out_file]), but only with the traced fields: each symbiont
+        is a one-line summary rather than the full Symbiont.__str__ dump of
+        the old log, which the trace does not record.
+    '''
+
+    MAGIC   : bytes         = b'ABMTRACE'
+    VERSION : int           = 1
+    HEADER  : struct.Struct = struct.Struct('<8sII')   # magic, version, record size
+    #   time, agent ID, surplus, residence time, clade, event type, outcome, role
+    RECORD  : struct.Struct = struct.Struct('<dqddhbbb3x')
+    CHUNK_RECORDS : int     = 1 << 16   # file grows by this many records at a time
+
+    # class-level variables
+    _file      : 'io.BufferedRandom' = None
+    _mmap      : mmap.mmap           = None
+    _offset    : int                 = 0
+    _capacity  : int                 = 0
+    _num_records : int               = 0
+
+    ############################################################################
+    @classmethod
+    def open(cls, filename: str) -> None:
+        ''' class-level method to create the memory-mapped trace file
+        Parameters:
+            filename: name of the binary trace file to be written
+        Raises:
+            ValueError, if the filename has a compression extension (the trace
+                is memory-mapped; compress the decoded text instead)
+        '''
+        if CompressedIO.compressionFor(filename) is not None:
+            raise ValueError(f"Error in EventTrace: trace file {filename} cannot be " + \
+                             "compressed; compress the output of decode() instead")
+        cls._file = open(filename, "w+b")
+        cls._file.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, cls.RECORD.size))
+        cls._offset   = cls.HEADER.size
+        cls._capacity = cls.HEADER.size
+        cls._num_records = 0
+        cls._mmap = None
+        cls._grow()
+
+    ############################################################################
+    @classmethod
+    def _grow(cls) -> None:
+        ''' extends the trace file by CHUNK_RECORDS records and remaps it '''
+        if cls._mmap is not None: cls._mmap.close()
+        cls._capacity += cls.CHUNK_RECORDS * cls.RECORD.size
+        cls._file.truncate(cls._capacity)
+        cls._mmap = mmap.mmap(cls._file.fileno(), cls._capacity)
+
+    ############################################################################
+    @classmethod
+    def record(cls, time: float, event_type: EventType, symbiont: 'Symbiont', \
+               outcome: SymbiontState = None, role: int = TraceRole.PRIMARY, \
+               exiting: bool = False) -> None:
+        ''' class-level method to append one record to the trace
+        Parameters:
+            time: current simulation time (float)
+            event_type: the EventType being handled
+            symbiont: the Symbiont involved (or None, e.g., rejected arrival)
+            outcome: resulting SymbiontState, if any (e.g., exit status)
+            role: one of the TraceRole values
+            exiting: True if the symbiont leaves the sponge at this event, in
+                which case its residence time is recorded
+        '''
+        if cls._offset + cls.RECORD.size > cls._capacity: cls._grow()
+        if symbiont is None:
+            agent_id, clade, surplus, residence = -1, -1, math.nan, math.nan
+        else:
+            agent_id  = symbiont.getID()
+            clade     = symbiont.getCladeNumber()
+            surplus   = symbiont.getSurplus()
+            residence = time - symbiont.getArrivalTime() if exiting else math.nan
+        cls.RECORD.pack_into(cls._mmap, cls._offset, time, agent_id, surplus, \
+            residence, clade, event_type.value, \
+            -1 if outcome is None else outcome.value, role)
+        cls._offset += cls.RECORD.size
+        cls._num_records += 1
+
+    ############################################################################
+    @classmethod
+    def close(cls) -> None:
+        ''' class-level method to flush the trace and trim the unused tail '''
+        if cls._file is None: return
+        cls._mmap.flush()
+        cls._mmap.close()
+        cls._file.truncate(cls._offset)
+        cls._file.close()
+        cls._file = None
+        cls._mmap = None
+
+    ############################################################################
+    @classmethod
+    def readRecords(cls, filename: str) -> 'generator':
+        ''' class-level generator yielding the unpacked records of a trace file
+        Parameters:
+            filename: name of the binary trace file
+        Yields:
+            tuples of (time, agent ID, surplus, residence time, clade,
+                       event type, outcome, role)
+        Raises:
+            ValueError, if the file is not a trace file of this version
+        '''
+        with open(filename, "rb") as file:
+            magic, version, size = cls.HEADER.unpack(file.read(cls.HEADER.size))
+            if magic != cls.MAGIC or version != cls.VERSION or size != cls.RECORD.size:
+                raise ValueError(f"Error in EventTrace: {filename} is not a " + \
+                                 f"version {cls.VERSION} trace file")
+            while True:
+                data = file.read(size * 4096)
+                if len(data) == 0: break
+                yield from cls.RECORD.iter_unpack(data)
+
+    ############################################################################
+    @staticmethod
+    def _agentLine(agent_id: int, clade: int, surplus: float) -> str:
+        ''' text line describing a traced symbiont '''
+        if agent_id < 0: return "None"
+        return f"Symbiont {agent_id}: clade {clade}, surplus {surplus}"
+
+    ############################################################################
+    @classmethod
+    def decode(cls, filename: str, out: 'io.TextIOBase') -> None:
+        ''' class-level method to render a binary trace in the text log format
+            (event headers, end-of-G1SG2M status lines, residence-time lines,
+            and separators); symbionts are rendered as a one-line summary of
+            the traced fields rather than the full Symbiont.__str__ dump
+        Parameters:
+            filename: name of the binary trace file
+            out: text file object to write to
+        '''
+        names = {EventType.ARRIVAL.value: 'ARRIVAL', EventType.END_G0.value: 'END G0', \
+                 EventType.END_G1SG2M.value: 'END G1SG2M', \
+                 EventType.DIGESTION.value: 'DIGESTION', \
+                 EventType.ESCAPE.value: 'ESCAPE', EventType.DENOUEMENT.value: 'DENOUEMENT'}
+        separator = '>' * 59 + '\n'
+        parent = None
+        for rec in cls.readRecords(filename):
+            time, agent_id, surplus, residence, clade, event_type, outcome, role = rec
+            if role == TraceRole.INITIAL:
+                out.write(cls._agentLine(agent_id, clade, surplus) + '\n')
+            elif event_type == EventType.END_G1SG2M.value and role == TraceRole.PRIMARY:
+                parent = rec  # wait for the corresponding child record
+            elif role == TraceRole.CHILD:
+                status = SymbiontState(outcome).name
+                out.write(f'END G1SG2M @ t={parent[0]:f}\n')
+                out.write(f'status @ end of G1SG2M={status}\n')
+                out.write(cls._agentLine(parent[1], parent[4], parent[2]) + '\n')
+                out.write(cls._agentLine(agent_id, clade, surplus) + '\n')
+                out.write(f'\t{status}\n')
+                if not math.isnan(parent[3]):
+                    out.write(f'RT = {parent[3]} ({parent[4]})\n')
+                elif not math.isnan(residence) and \
+                     outcome != SymbiontState.CHILD_INFECTS_OUTSIDE.value:
+                    # (the text log never reported RT for a child infecting outside)
+                    out.write(f'RT = {residence} ({clade})\n')
+                out.write(separator)
+                parent = None
+            else:
+                out.write(f'{names[event_type]} @ t={time:f}\n')
+                out.write(cls._agentLine(agent_id, clade, surplus) + '\n')
+                if not math.isnan(residence):
+                    out.write(f'RT = {residence} ({clade})\n')
+                out.write(separator)
+
+##########################
+if __name__ == "__main__":
+    # render a binary trace file as text:
+    #   python event_trace.py trace_file [out_file (may end in .gz/.xz/.zst)]
+    if len(sys.argv) < 2:
+        print(f"python {sys.argv[0]} trace_file [out_file (default: stdout)]")
+        sys.exit(1)
+    if len(sys.argv) > 2:
+        with CompressedIO.openForWriting(sys.argv[2]) as out_file:
+            EventTrace.decode(sys.argv[1], out_file)
+    else:
+        EventTrace.decode(sys.argv[1], sys.stdout)
@@ -0,0 +1,448 @@
+import math
+from bisect import bisect_right
+
+import numpy
+
+from compressed_io import CompressedIO
+
+################################################################################
+class RunningStats:
+    ''' Class to compute the count, mean, variance, min and max of a stream of
+        values in a single pass, using Welford's online algorithm.
+    '''
+    __slots__ = ('_count', '_mean', '_m2', '_min', '_max')
+
+    def __init__(self) -> None:
+        ''' initializer for an (empty) RunningStats object '''
+        self._count : int   = 0
+        self._mean  : float = 0.0
+        self._m2    : float = 0.0    # sum of squared deviations from the mean
+        self._min   : float = math.inf
+        self._max   : float = -math.inf
+
+    ############################################################################
+    def add(self, value: float) -> None:
+        ''' adds a single value to the running statistics
+        Parameters:
+            value: the value to add (float)
+        '''
+        self._count += 1
+        delta = value - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (value - self._mean)
+        if value < self._min: self._min = value
+        if value > self._max: self._max = value
+
+    ############################################################################
+    def merge(self, other: 'RunningStats') -> None:
+        ''' combines another RunningStats into this one, as if all of its
+            values had been added here (Chan et al.'s parallel algorithm)
+        Parameters:
+            other: the RunningStats object to combine
+        '''
+        if other._count == 0: return
+        total = self._count + other._count
+        delta = other._mean - self._mean
+        self._mean += delta * other._count / total
+        self._m2   += other._m2 + delta * delta * self._count * other._count / total
+        self._count = total
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+
+    ############################################################################
+    ''' simple getter/accessor methods '''
+    def getCount(self) -> int:   return self._count
+    def getMean(self)  -> float: return self._mean if self._count > 0 else math.nan
+    def getMin(self)   -> float: return self._min  if self._count > 0 else math.nan
+    def getMax(self)   -> float: return self._max  if self._count > 0 else math.nan
+
+    def getVariance(self) -> float:
+        ''' returns the (unbiased) sample variance, or nan if fewer than 2 values '''
+        return self._m2 / (self._count - 1) if self._count > 1 else math.nan
+
+    def getStdDev(self) -> float:
+        ''' returns the sample standard deviation, or nan if fewer than 2 values '''
+        return math.sqrt(self.getVariance()) if self._count > 1 else math.nan
+
+################################################################################
+class P2Quantiles:
+    ''' Class to estimate several quantiles of a stream of values in constant
+        memory, using the P-squared algorithm of Jain & Chlamtac (1985), in its
+        extended form for multiple quantiles (Raatikainen, 1987): for
+        quantiles p1 < ... < pm, 2m+3 markers track the minimum, each p_i,
+        the midpoints between consecutive p_i (and 0 and 1), and the maximum,
+        and marker heights are adjusted with piecewise-parabolic
+        interpolation as values arrive.  (Sharing the markers among all of the
+        quantiles makes each update cheaper than separate estimators.)
+    '''
+    __slots__ = ('_quantiles', '_probabilities', '_heights', '_positions', '_count')
+
+    def __init__(self, quantiles: tuple[float]) -> None:
+        ''' initializer for a P2Quantiles object
+        Parameters:
+            quantiles: increasing quantiles to estimate, each in (0,1)
+                (e.g., (0.1, 0.5, 0.9))
+        '''
+        probabilities = [0.0]
+        previous = 0.0
+        for p in quantiles:
+            probabilities += [(previous + p) / 2, p]
+            previous = p
+        probabilities += [(previous + 1) / 2, 1.0]
+        self._quantiles     : tuple[float] = tuple(quantiles)
+        self._probabilities : list[float]  = probabilities   # of each marker
+        self._heights       : list[float]  = []    # first values, then markers
+        self._positions     : list[int]    = list(range(1, len(probabilities) + 1))
+        self._count         : int          = 0
+
+    ############################################################################
+    def add(self, value: float) -> None:
+        ''' adds a single value to the quantile estimates
+        Parameters:
+            value: the value to add (float)
+        '''
+        q = self._heights
+        probabilities = self._probabilities
+        num_markers = len(probabilities)
+        self._count += 1
+        if self._count <= num_markers:
+            # the first values simply initialize the markers
+            q.append(value)
+            if self._count == num_markers: q.sort()
+            return
+
+        # find the first marker above the value, adjusting the extreme markers
+        last = num_markers - 1
+        if value < q[0]:
+            q[0] = value
+            first = 1
+        elif value >= q[last]:
+            q[last] = value
+            first = last
+        else:
+            first = bisect_right(q, value, 1, last)
+
+        n = self._positions
+        for i in range(first, num_markers): n[i] += 1
+
+        # adjust the heights of the interior markers, if necessary; the
+        # desired position of marker i is 1 + (count - 1) * probability_i
+        scale = self._count - 1
+        for i in range(1, last):
+            d = 1 + scale * probabilities[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = self._parabolic(i, d)
+                if not (q[i - 1] < height < q[i + 1]):
+                    height = self._linear(i, d)
+                q[i]  = height
+                n[i] += d
+
+    ############################################################################
+    def _parabolic(self, i: int, d: int) -> float:
+        ''' piecewise-parabolic (P-squared) prediction of marker i's new height '''
+        q, n = self._heights, self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * \
+            ((n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) + \
+             (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    ############################################################################
+    def _linear(self, i: int, d: int) -> float:
+        ''' linear prediction of marker i's new height '''
+        q, n = self._heights, self._positions
+        return q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+    ############################################################################
+    def _cdfPoints(self) -> tuple[list[float], list[float]]:
+        ''' returns (heights, positions) points of this estimator's piecewise-
+            linear approximation of the (unnormalized) distribution function '''
+        if self._count < len(self._probabilities):
+            return (sorted(self._heights), list(range(1, self._count + 1)))
+        return (self._heights, self._positions)
+
+    ############################################################################
+    def getQuantiles(self) -> list[float]:
+        ''' returns the current quantile estimates, or nans if no values have
+            been added '''
+        return P2Quantiles.mergedQuantiles([self])
+
+    ############################################################################
+    @staticmethod
+    def mergedQuantiles(estimators: list['P2Quantiles']) -> list[float]:
+        ''' static method to estimate the quantiles of the combined values of
+            several estimators (with the same quantiles), e.g., to combine
+            time windows, by summing their piecewise-linear distribution
+            functions and inverting; for a single estimator, this returns its
+            own marker heights
+        Parameters:
+            estimators: list of P2Quantiles objects
+        Returns:
+            list of quantile estimates (nans if no values have been added)
+        '''
+        quantiles = estimators[0]._quantiles
+        estimators = [e for e in estimators if e._count > 0]
+        if len(estimators) == 0: return [math.nan] * len(quantiles)
+        if len(estimators) == 1 and estimators[0]._count >= len(estimators[0]._probabilities):
+            return [estimators[0]._heights[2*j + 2] for j in range(len(quantiles))]
+
+        points = [e._cdfPoints() for e in estimators]
+        grid   = numpy.unique(numpy.concatenate([heights for heights, positions in points]))
+        ranks  = numpy.zeros(len(grid))
+        for heights, positions in points:
+            ranks += numpy.interp(grid, heights, positions, left = 0, right = positions[-1])
+        total  = sum([e._count for e in estimators])
+        return [float(numpy.interp(1 + p * (total - 1), ranks, grid)) for p in quantiles]
+
+################################################################################
+class CountQuantiles:
+    ''' Class to compute exact quantiles of a stream of integer counts (e.g.,
+        numbers of divisions), which take few distinct values, from a
+        histogram -- P-squared estimates, interpolating between markers, are
+        fractional and biased for such values.  Same interface as P2Quantiles;
+        quantiles are those of numpy.quantile (linear interpolation between
+        order statistics, at rank 1 + p * (count - 1)).
+    '''
+    __slots__ = ('_quantiles', '_histogram', '_count')
+
+    def __init__(self, quantiles: tuple[float]) -> None:
+        ''' initializer for a CountQuantiles object
+        Parameters:
+            quantiles: increasing quantiles to compute, each in (0,1)
+        '''
+        self._quantiles : tuple[float]   = tuple(quantiles)
+        self._histogram : dict[int, int] = {}   # value -> number of occurrences
+        self._count     : int            = 0
+
+    ############################################################################
+    def add(self, value: int) -> None:
+        ''' adds a single value (an int) to the histogram '''
+        self._histogram[value] = self._histogram.get(value, 0) + 1
+        self._count += 1
+
+    ############################################################################
+    def getQuantiles(self) -> list[float]:
+        ''' returns the current quantiles, or nans if no values have been added '''
+        return CountQuantiles.mergedQuantiles([self])
+
+    ############################################################################
+    @staticmethod
+    def mergedQuantiles(estimators: list['CountQuantiles']) -> list[float]:
+        ''' static method returning the exact quantiles of the combined values
+            of several CountQuantiles objects (with the same quantiles)
+        Parameters:
+            estimators: list of CountQuantiles objects
+        Returns:
+            list of quantiles (nans if no values have been added)
+        '''
+        quantiles = estimators[0]._quantiles
+        histogram = {}
+        for estimator in estimators:
+            for value, count in estimator._histogram.items():
+                histogram[value] = histogram.get(value, 0) + count
+        total = sum(histogram.values())
+        if total == 0: return [math.nan] * len(quantiles)
+        values = sorted(histogram)
+        ends   = numpy.cumsum([histogram[value] for value in values])  # last rank of each value
+
+        def orderStatistic(rank: int) -> float:
+            ''' the rank-th (0-based) smallest value '''
+            return float(values[bisect_right(ends, rank)])
+
+        results = []
+        for p in quantiles:
+            position = p * (total - 1)
+            below = int(math.floor(position))
+            low = orderStatistic(below)
+            high = orderStatistic(min(below + 1, total - 1))
+            results.append(low + (position - below) * (high - low))
+        return results
+
+################################################################################
+class MetricSummary:
+    ''' Class combining RunningStats with P-squared estimates of a few
+        quantiles for a single metric (or, for integer counts, exact
+        quantiles -- see CountQuantiles)
+    '''
+    __slots__ = ('_stats', '_quantiles')
+
+    QUANTILES : tuple[float] = (0.1, 0.5, 0.9)
+
+    def __init__(self, counts: bool = False) -> None:
+        ''' initializer for an (empty) MetricSummary object
+        Parameters:
+            counts: True if the metric's values are integer counts
+        '''
+        self._stats     : RunningStats = RunningStats()
+        self._quantiles : P2Quantiles or CountQuantiles = \
+            CountQuantiles(self.QUANTILES) if counts else P2Quantiles(self.QUANTILES)
+
+    def add(self, value: float) -> None:
+        ''' adds a single value to the summary '''
+        self._stats.add(value)
+        self._quantiles.add(value)
+
+    def getCount(self) -> int: return self._stats.getCount()
+
+    @staticmethod
+    def combinedValues(summaries: list['MetricSummary']) -> list[float]:
+        ''' static method returning [mean, sd, min, quantiles..., max] of the
+            combined values of one or more summaries (exact except for the
+            P-squared quantiles -- see P2Quantiles.mergedQuantiles) '''
+        stats = RunningStats()
+        for summary in summaries: stats.merge(summary._stats)
+        quantiles = type(summaries[0]._quantiles).mergedQuantiles( \
+                        [s._quantiles for s in summaries])
+        return [stats.getMean(), stats.getStdDev(), stats.getMin()] + \
+               quantiles + [stats.getMax()]
+
+################################################################################
+class ExitStatistics:
+    ''' Class to aggregate, as the simulation executes, per-clade statistics of
+        exiting symbionts -- residence time, number of divisions, and surplus at
+        arrival and at exit -- broken down by exit status and by window of
+        exit time, so that production runs need not write the (very large)
+        per-symbiont CSV file.  Each (clade, exit status, window) combination
+        keeps a count plus mean/sd/min/max and P-squared quantile estimates of
+        each metric (exact quantiles for the number of divisions, a count).
+        Per-clade, per-exit-status totals over all windows and per-clade
+        totals over all exit statuses are computed when the summary is
+        written, by combining those (exactly, except for the P-squared
+        quantiles), so each exit updates only one set of statistics.  The
+        per-clade totals (exit status ALL) leave out the symbionts still in
+        residence at the end of the run, whose residence times are cut off
+        there; those are reported in their own STILL_IN_RESIDENCE rows.
+    '''
+
+    METRICS       : tuple[str] = ('resTime', 'divs', 'arrSurplus', 'exitSurplus')
+    COUNT_METRICS : tuple[str] = ('divs',)   # integer-valued (see CountQuantiles)
+    ALL           : str        = 'ALL'
+    CENSORED      : str        = 'STILL_IN_RESIDENCE'   # left out of the ALL rows
+
+    # class-level variables
+    _enabled    : bool                              = False
+    _window     : float                             = 0.0
+    _max_time   : float                             = 0.0
+    _num_windows : int                              = 0
+    _summaries  : dict[tuple, list[MetricSummary]]  = {}
+    _extra_rows : list[tuple[str, str]]             = []
+
+    ############################################################################
+    @classmethod
+    def initialize(cls, window: float, max_time: float) -> None:
+        ''' class-level method to enable and reset the aggregator
+        Parameters:
+            window: length (in days) of each exit-time window; 0 for no windows
+            max_time: maximum simulated time (in days)
+        '''
+        cls._enabled   = True
+        cls._window    = window
+        cls._max_time  = max_time
+        cls._num_windows = max(math.ceil(max_time / window), 1) if window > 0 else 0
+        cls._summaries = {}
+        cls._extra_rows = []
+
+    ############################################################################
+    @classmethod
+    def isEnabled(cls) -> bool: return cls._enabled
+
+    ############################################################################
+    @classmethod
+    def addExit(cls, clade_number: int, exit_status: 'SymbiontState', exit_time: float, \
+                residence_time: float, num_divisions: int, surplus_on_arrival: float, \
+                surplus_at_exit: float) -> None:
+        ''' class-level method to add one exiting symbiont to the statistics
+        Parameters:
+            clade_number: the (0-based) clade number of the symbiont
+            exit_status: the exit status (one from SymbiontState enumeration)
+            exit_time: the simulation time of exit (float)
+            residence_time: time spent in the sponge (float)
+            num_divisions: number of successful divisions (int)
+            surplus_on_arrival: photosynthate surplus at arrival (float)
+            surplus_at_exit: photosynthate surplus at exit (float)
+        '''
+        # (symbionts still in residence exit at exactly max_time: they go in
+        # the last window, rather than in a zero-width one of their own)
+        window = min(int(exit_time // cls._window), cls._num_windows - 1) \
+                 if cls._window > 0 else cls.ALL
+        key = (clade_number, exit_status.name, window)
+        summaries = cls._summaries.get(key)
+        if summaries is None:
+            summaries = [MetricSummary(m in cls.COUNT_METRICS) for m in cls.METRICS]
+            cls._summaries[key] = summaries
+        summaries[0].add(residence_time)
+        summaries[1].add(num_divisions)
+        summaries[2].add(surplus_on_arrival)
+        summaries[3].add(surplus_at_exit)
+
+    ############################################################################
+    @classmethod
+    def addSummaryLine(cls, name: str, value: str) -> None:
+        ''' class-level method to append a "# name: value" line to the summary
+            file (e.g., for run-level information)
+        '''
+        cls._extra_rows.append((name, value))
+
+    ############################################################################
+    @classmethod
+    def getSummaryRows(cls) -> list[list]:
+        ''' class-level method returning the summary table (header first) as a
+            list of rows: for each clade, for each exit status, one row per
+            window then (if windowed) the total over all windows; then the
+            total over all exit statuses but STILL_IN_RESIDENCE (if any) '''
+        columns = ['clade', 'exitStatus', 'windowStart', 'windowEnd', 'count']
+        for metric in cls.METRICS:
+            columns += [f'{metric}{stat}' for stat in \
+                ['Mean', 'SD', 'Min'] + [f'P{int(p*100)}' for p in MetricSummary.QUANTILES] + ['Max']]
+        rows = [columns]
+
+        def row(clade, status, start, end, groups):
+            ''' one row, combining the given lists of per-metric summaries '''
+            values = [clade, status, float(start), float(end), \
+                      sum([summaries[0].getCount() for summaries in groups])]
+            for m in range(len(cls.METRICS)):
+                values += [float(v) for v in \
+                           MetricSummary.combinedValues([summaries[m] for summaries in groups])]
+            return values
+
+        keys = sorted(cls._summaries, key = lambda key: (key[0], key[1], \
+                      key[2] if key[2] != cls.ALL else -1))
+        for clade in sorted(set([key[0] for key in keys])):
+            clade_keys = [key for key in keys if key[0] == clade]
+            for status in sorted(set([key[1] for key in clade_keys])):
+                status_keys = [key for key in clade_keys if key[1] == status]
+                if cls._window > 0:
+                    for key in status_keys:
+                        start = key[2] * cls._window
+                        end   = min((key[2] + 1) * cls._window, cls._max_time)
+                        rows.append(row(clade, status, start, end, [cls._summaries[key]]))
+                rows.append(row(clade, status, 0, cls._max_time, \
+                                [cls._summaries[key] for key in status_keys]))
+            exited_keys = [key for key in clade_keys if key[1] != cls.CENSORED]
+            if len(exited_keys) > 0:
+                rows.append(row(clade, cls.ALL, 0, cls._max_time, \
+                                [cls._summaries[key] for key in exited_keys]))
+        return rows
+
+    ############################################################################
+    @classmethod
+    def formatSummary(cls) -> str:
+        ''' class-level method returning the contents of the summary file:
+            any "# name: value" lines, then the summary table as CSV '''
+        lines = [f"# {name}: {value}\n" for name, value in cls._extra_rows]
+        for row in cls.getSummaryRows():
+            lines.append(','.join([str(value) for value in row]) + '\n')
+        return ''.join(lines)
+
+    ############################################################################
+    @classmethod
+    def writeSummary(cls, filename: str, text: str = None) -> None:
+        ''' class-level method to write the summary table as a (compact) CSV
+            file (compressed according to the file extension)
+        Parameters:
+            filename: name of the summary file to be written
+            text: previously formatted summary (e.g., from the result cache);
+                default: the current statistics (see formatSummary)
+        '''
+        if text is None: text = cls.formatSummary()
+        with CompressedIO.openForWriting(filename) as file:
+            file.write(text)
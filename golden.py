@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import os
+import os.path
+import sys
+import tempfile
+import zlib
+
+import numpy
+
+from event_list import EventType
+from event_trace import EventTrace
+from symbiont import SymbiontState
+
+################################################################################
+# Bit-reproducibility harness: runs fixed configurations (the input CSV with
+# fixed seeds, horizontal and vertical initial placement, and phenotypic
+# mutation on) for a fixed number of days and compares digests of their
+# outputs with golden digests recorded earlier:
+#
+#   python golden.py record     (after an intended change to the results)
+#   python golden.py check      (after any other change; exit status 1 if any
+#                                case differs)
+#
+# The golden directory holds digests.json -- for each case, SHA-256 digests of
+# the population file, per-symbiont CSV file, exit-statistics summary, and the
+# event sequence (the binary event trace; see event_trace.py) -- and, per case,
+# a compressed copy of the event sequence (time, event type, symbiont ID,
+# outcome, role, and a checksum of the full trace record), so that a run that
+# diverges can be located at its first divergent event.
+################################################################################
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DIRECTORY = os.path.join(ROOT, "golden")
+DEFAULT_DAYS = 20
+
+# case name -> (simulation-level overrides, clade-level overrides), all on top
+# of the input CSV
+CASES : dict[str, tuple[dict, dict]] = { \
+    'default':    ({}, {}), \
+    'seed42':     ({'INITIAL_SEED': 42}, {}), \
+    'horizontal': ({'INITIAL_PLACEMENT': 'horizontal'}, {}), \
+    'vertical':   ({'INITIAL_PLACEMENT': 'vertical'}, {}), \
+    'mutation':   ({}, {1: {'PHENOTYPIC_MUTATION_PROB': 0.05}, \
+                        2: {'PHENOTYPIC_MUTATION_PROB': 0.05}}), \
+    'empty':      ({'NUM_INITIAL_SYMBIONTS': 0}, {})}   # (arrivals into an empty list)
+
+# layout of the binary trace records (see EventTrace.RECORD)
+TRACE_DTYPE = numpy.dtype([('time', '<f8'), ('id', '<i8'), ('surplus', '<f8'), \
+    ('residence', '<f8'), ('clade', '<i2'), ('type', 'i1'), ('outcome', 'i1'), \
+    ('role', 'i1'), ('pad', 'V3')])
+EVENT_FIELDS : tuple[str] = ('time', 'id', 'type', 'outcome', 'role', 'checksum')
+
+################################################################################
+def fileDigest(filename: str) -> str or None:
+    ''' returns the SHA-256 hex digest of a file (None if it does not exist) '''
+    if not os.path.exists(filename): return None
+    sha = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b''): sha.update(block)
+    return sha.hexdigest()
+
+################################################################################
+def readEvents(trace_filename: str) -> dict[str, numpy.ndarray]:
+    ''' returns the event sequence of a binary trace file as arrays (see
+        EVENT_FIELDS), with a CRC-32 checksum of each full record '''
+    with open(trace_filename, "rb") as file:
+        data = file.read()[EventTrace.HEADER.size:]
+    assert(TRACE_DTYPE.itemsize == EventTrace.RECORD.size)
+    records = numpy.frombuffer(data, dtype = TRACE_DTYPE)
+    size = TRACE_DTYPE.itemsize
+    events = {field: records[field].copy() for field in EVENT_FIELDS[:-1]}
+    events['checksum'] = numpy.array([zlib.crc32(data[i:i + size]) \
+                                      for i in range(0, len(data), size)], dtype = numpy.uint32)
+    return events
+
+################################################################################
+def runCase(name: str, input_csv: str, days: float, directory: str) \
+        -> tuple[dict[str, str], dict[str, numpy.ndarray]]:
+    ''' runs one case, writing its outputs into directory
+    Returns:
+        tuple of (dict of digests, event sequence -- see readEvents)
+    '''
+    # imported here so that the tool starts (e.g., for -h) without numpy work
+    from simulation import Simulation
+    overrides, clade_overrides = CASES[name]
+    files = {'population': os.path.join(directory, f"{name}.population.txt"), \
+             'csv':        os.path.join(directory, f"{name}.perSymbiont.csv"), \
+             'summary':    os.path.join(directory, f"{name}.exitSummary.csv"), \
+             'events':     os.path.join(directory, f"{name}.trace")}
+    overrides = dict(overrides, MAX_SIMULATED_TIME = days, \
+        POPULATION_FILENAME = files['population'], \
+        WRITE_CSV_INFO = True, CSV_FILENAME = files['csv'], \
+        WRITE_SUMMARY_INFO = True, SUMMARY_FILENAME = files['summary'], \
+        WRITE_LOGGING_INFO = True, LOG_FILENAME = files['events'], \
+        WRITE_TELEMETRY_INFO = False, PRINT_PARAMETER_VALUES = False)
+    Simulation.run(input_csv, overrides, clade_overrides, use_cache = False)
+    digests = {key: fileDigest(filename) for key, filename in files.items()}
+    return digests, readEvents(files['events'])
+
+################################################################################
+def describeEvent(events: dict[str, numpy.ndarray], index: int) -> str:
+    ''' returns a description of event index of an event sequence '''
+    if index >= len(events['time']): return "(none: the sequence has ended)"
+    event_type = EventType(int(events['type'][index])).name
+    outcome = int(events['outcome'][index])
+    outcome = f", outcome {SymbiontState(outcome).name}" if outcome >= 0 else ""
+    return f"t={float(events['time'][index])!r} {event_type} symbiont " + \
+           f"{int(events['id'][index])}{outcome}"
+
+################################################################################
+def firstDivergence(expected: dict[str, numpy.ndarray], \
+                    actual: dict[str, numpy.ndarray]) -> int or None:
+    ''' returns the index of the first event that differs (in any field, or
+        by one sequence ending early), or None if the sequences are identical '''
+    length = min(len(expected['time']), len(actual['time']))
+    differs = numpy.zeros(length, dtype = bool)
+    for field in EVENT_FIELDS:
+        differs |= expected[field][:length] != actual[field][:length]
+    if differs.any(): return int(numpy.argmax(differs))
+    if len(expected['time']) != len(actual['time']): return length
+    return None
+
+################################################################################
+def record(input_csv: str, days: float, directory: str, cases: list[str]) -> None:
+    ''' runs the given cases and stores their digests and event sequences as
+        the golden ones '''
+    os.makedirs(directory, exist_ok = True)
+    digests_filename = os.path.join(directory, "digests.json")
+    golden = {'days': days, 'input': os.path.basename(input_csv), 'cases': {}}
+    if os.path.exists(digests_filename):
+        with open(digests_filename) as file: previous = json.load(file)
+        if previous.get('days') == days: golden['cases'] = previous['cases']
+    with tempfile.TemporaryDirectory() as scratch:
+        for name in cases:
+            digests, events = runCase(name, input_csv, days, scratch)
+            golden['cases'][name] = dict(digests, num_events = len(events['time']))
+            numpy.savez_compressed(os.path.join(directory, f"{name}.npz"), **events)
+            print(f"recorded {name}: {len(events['time'])} events")
+    with open(digests_filename, "w") as file:
+        json.dump(golden, file, indent = 1, sort_keys = True)
+
+################################################################################
+def check(input_csv: str, directory: str, cases: list[str]) -> int:
+    ''' runs the given cases and compares them with the golden digests,
+        reporting the first divergent event of any case that differs
+    Returns:
+        the number of cases that differ
+    Raises:
+        ValueError, if there are no golden digests for a case
+    '''
+    with open(os.path.join(directory, "digests.json")) as file:
+        golden = json.load(file)
+    num_differ = 0
+    with tempfile.TemporaryDirectory() as scratch:
+        for name in cases:
+            if name not in golden['cases']:
+                raise ValueError(f"Error in golden: no golden digests for case {name}")
+            expected = golden['cases'][name]
+            digests, events = runCase(name, input_csv, golden['days'], scratch)
+            differing = [key for key in digests if digests[key] != expected.get(key)]
+            if not differing:
+                print(f"{name:<12} OK")
+                continue
+            num_differ += 1
+            print(f"{name:<12} DIFFERS: {', '.join(differing)}")
+            events_filename = os.path.join(directory, f"{name}.npz")
+            if not os.path.exists(events_filename): continue
+            with numpy.load(events_filename) as stored:
+                golden_events = {field: stored[field] for field in EVENT_FIELDS}
+            index = firstDivergence(golden_events, events)
+            if index is None:
+                print("    event sequence identical; only the output files differ")
+                continue
+            print(f"    first divergent event: #{index} of {len(golden_events['time'])}")
+            print(f"    expected: {describeEvent(golden_events, index)}")
+            print(f"    actual:   {describeEvent(events, index)}")
+            if index > 0:
+                print(f"    (previous event: {describeEvent(events, index - 1)})")
+    return num_differ
+
+################################################################################
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "record or check golden " + \
+        "(bit-reproducibility) digests of fixed simulation runs")
+    parser.add_argument("command", choices = ("record", "check"))
+    parser.add_argument("--input", default = os.path.join(ROOT, "input.csv"), \
+        help = "input CSV file of the cases (default: input.csv)")
+    parser.add_argument("--dir", default = DEFAULT_DIRECTORY, \
+        help = "directory of the golden digests (default: golden)")
+    parser.add_argument("--days", type = float, default = DEFAULT_DAYS, \
+        help = f"simulated days per case, for record (default: {DEFAULT_DAYS})")
+    parser.add_argument("--case", action = "append", default = [], dest = "cases", \
+        choices = list(CASES), help = "case to run (may be repeated; default: all)")
+    args = parser.parse_args()
+    cases = args.cases or list(CASES)
+
+    if args.command == "record":
+        record(args.input, args.days, args.dir, cases)
+        return
+    try:
+        num_differ = check(args.input, args.dir, cases)
+    except (OSError, ValueError) as err:
+        parser.error(str(err))
+    print(f"{num_differ} of {len(cases)} case(s) differ from the golden digests")
+    sys.exit(1 if num_differ > 0 else 0)
+
+##########################
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import copy
+import csv
+import os.path
+
+from parser import Parser
+
+################################################################################
+# Synthetic input generator, for benchmarks and stress tests: builds valid
+# configurations (see Parser.readConfig) -- and writes them as input CSV files
+# in the layout of input.csv -- for any grid size, number of clades, arrival
+# rate, placement of the initial symbionts, and regime:
+#
+#   default     the clade-level values of the template's first clade
+#   division    division-heavy: production well above the host cell demand,
+#               cheap mitosis, and short G0, so that symbionts divide often
+#               and the sponge fills (mitosis, eviction, and open-cell search
+#               dominate)
+#   digestion   digestion-heavy: production below the host cell demand and
+#               rare escape, so that most symbionts are digested (arrivals
+#               and exits dominate)
+#
+# Simulation-level values not set here come from the template (input.csv by
+# default), so that the parameter names always match those the Parser and the
+# Clade setters (Clade.CSV_SETTERS) expect.  The clades of a configuration
+# differ only in their production rate, spread evenly over +/- spread/2
+# around the regime's, and arrive in equal proportions.  E.g.,
+#
+#   python input_generator.py stress.csv --grid 200 --clades 100 --regime division
+#
+# or, in memory,
+#
+#   config = generateConfig(rows = 200, num_clades = 100, regime = 'division')
+#   api.simulate(config)
+################################################################################
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE = os.path.join(ROOT, "input.csv")
+
+# regime name -> clade-level values, on top of the template's first clade
+REGIMES : dict[str, dict[str, object]] = { \
+    'default':   {}, \
+    'division':  {'PHOTOSYNTHETIC_PRODUCTION_RATE': 1.5, 'MITOTIC_COST_RATE': 5.0, \
+                  'G0_LENGTH': 2.0, 'G1SG2M_LENGTH': 1/24}, \
+    'digestion': {'PHOTOSYNTHETIC_PRODUCTION_RATE': 0.9, 'MITOTIC_COST_RATE': 35.0, \
+                  'G0_ESCAPE_PROB': 0.1, 'G1SG2M_ESCAPE_PROB': 0.1}}
+
+PLACEMENTS : tuple[str] = ('random', 'horizontal', 'vertical')
+
+################################################################################
+def generateConfig(rows: int = 50, cols: int = None, num_clades: int = 2, \
+                   arrival: float = 1/12, regime: str = 'default', \
+                   placement: str = 'random', density: float = None, \
+                   days: float = None, seed: int = None, spread: float = 0.05, \
+                   template: str = TEMPLATE) -> dict:
+    ''' returns a configuration (see Parser.readConfig)
+    Parameters:
+        rows, cols: size of the sponge (cols defaults to rows)
+        num_clades: number of clades (1 or more)
+        arrival: AVG_TIME_BETWEEN_ARRIVALS (days)
+        regime: one of REGIMES
+        placement: INITIAL_PLACEMENT, one of PLACEMENTS
+        density: initial symbionts per cell, in [0, 1] (default: the
+            template's initial density)
+        days: MAX_SIMULATED_TIME (default: the template's)
+        seed: INITIAL_SEED (default: the template's)
+        spread: relative range of the clades' production rates
+        template: input CSV file of the other values (default: input.csv)
+    Raises:
+        ValueError, for an invalid argument (or template)
+    '''
+    cols = rows if cols is None else cols
+    if rows < 1 or cols < 1:
+        raise ValueError(f"Error in input_generator: invalid grid {rows} x {cols}")
+    if num_clades < 1:
+        raise ValueError(f"Error in input_generator: invalid number of clades {num_clades}")
+    if arrival <= 0:
+        raise ValueError(f"Error in input_generator: invalid time between arrivals {arrival}")
+    if regime not in REGIMES:
+        raise ValueError(f"Error in input_generator: unknown regime {regime}")
+    if placement not in PLACEMENTS:
+        raise ValueError(f"Error in input_generator: unknown placement {placement}")
+    if density is not None and not 0 <= density <= 1:
+        raise ValueError(f"Error in input_generator: invalid density {density}")
+
+    base = Parser.readConfig(template)
+    parameters = copy.deepcopy(base['parameters'])
+    if density is None:
+        density = parameters['NUM_INITIAL_SYMBIONTS'] / \
+                  (parameters['NUM_ROWS'] * parameters['NUM_COLS'])
+    parameters.update({'NUM_ROWS': rows, 'NUM_COLS': cols, \
+        'NUM_INITIAL_SYMBIONTS': min(int(round(density * rows * cols)), rows * cols), \
+        'INITIAL_PLACEMENT': placement, 'AVG_TIME_BETWEEN_ARRIVALS': arrival, \
+        'NUM_CLADES': num_clades, 'CLADE_PROPORTIONS': tuple([1 / num_clades] * num_clades)})
+    if days is not None: parameters['MAX_SIMULATED_TIME'] = days
+    if seed is not None: parameters['INITIAL_SEED'] = seed
+
+    clade = dict(base['clades'][0], **REGIMES[regime])
+    ppr = clade['PHOTOSYNTHETIC_PRODUCTION_RATE']
+    clades = []
+    for c in range(num_clades):
+        offset = c / (num_clades - 1) - 0.5 if num_clades > 1 else 0.0
+        clades.append(dict(clade, CLADE_NUMBER = c + 1, \
+                           PHOTOSYNTHETIC_PRODUCTION_RATE = ppr * (1 + spread * offset)))
+    return {'parameters': parameters, 'clades': clades}
+
+################################################################################
+def formatValue(value: object) -> str:
+    ''' returns a parameter value as written in an input CSV file (read back
+        to the same value by Parser.convertValue) '''
+    if isinstance(value, (tuple, list)):
+        return "(" + ",".join(formatValue(v) for v in value) + \
+               ("," if len(value) == 1 else "") + ")"
+    if isinstance(value, float): return repr(value)
+    return str(value)
+
+################################################################################
+def readDescriptions(template: str = TEMPLATE) -> dict[str, str]:
+    ''' returns the description (third column) of each parameter in an input
+        CSV file (empty if the file does not exist) '''
+    descriptions = {}
+    if not os.path.exists(template): return descriptions
+    with open(template, newline = '') as csv_file:
+        for row in csv.reader(csv_file):
+            if len(row) >= 3 and row[0] != "" and not row[0].startswith('#'):
+                descriptions.setdefault(row[0], row[2])
+    return descriptions
+
+################################################################################
+def writeInputCSV(config: dict, filename: str, template: str = TEMPLATE) -> None:
+    ''' writes a configuration (see Parser.readConfig) as an input CSV file,
+        in the layout of input.csv (with the template's descriptions) '''
+    descriptions = readDescriptions(template)
+    with open(filename, "w", newline = '') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["Parameter Name", "Parameter Value", "Full Description"])
+        writer.writerow(["# >>> Simulation-level Parameter Values <<<", "", \
+                         "(Note: rows beginning with # are ignored)"])
+        for name, value in config['parameters'].items():
+            writer.writerow([name, formatValue(value), descriptions.get(name, "")])
+        for c, clade in enumerate(config['clades']):
+            writer.writerow(["", "", ""])
+            writer.writerow([f"# >>> Clade {c + 1} Parameter Values <<<", "", ""])
+            # (CLADE_NUMBER first: it starts a new clade -- see Parser.readConfig)
+            writer.writerow(["CLADE_NUMBER", str(c + 1), descriptions.get("CLADE_NUMBER", "")])
+            for name, value in clade.items():
+                if name == "CLADE_NUMBER": continue
+                writer.writerow([name, formatValue(value), descriptions.get(name, "")])
+
+################################################################################
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "write a synthetic input CSV file")
+    parser.add_argument("output", help = "input CSV file to write")
+    parser.add_argument("--grid", type = int, default = 50, \
+        help = "number of rows of the sponge (default: 50)")
+    parser.add_argument("--cols", type = int, default = None, \
+        help = "number of columns of the sponge (default: as --grid)")
+    parser.add_argument("--clades", type = int, default = 2, \
+        help = "number of clades (default: 2)")
+    parser.add_argument("--arrival", default = "1/12", \
+        help = "average time between arrivals, in days (default: 1/12)")
+    parser.add_argument("--regime", choices = list(REGIMES), default = 'default', \
+        help = "clade-level regime (default: default)")
+    parser.add_argument("--placement", choices = PLACEMENTS, default = 'random', \
+        help = "placement of the initial symbionts (default: random)")
+    parser.add_argument("--density", type = float, default = None, \
+        help = "initial symbionts per cell (default: the template's)")
+    parser.add_argument("--days", default = None, \
+        help = "simulated days (default: the template's)")
+    parser.add_argument("--seed", type = int, default = None, \
+        help = "initial seed (default: the template's)")
+    parser.add_argument("--spread", type = float, default = 0.05, \
+        help = "relative range of the clades' production rates (default: 0.05)")
+    parser.add_argument("--template", default = TEMPLATE, \
+        help = "input CSV file of the other values (default: input.csv)")
+    args = parser.parse_args()
+
+    try:
+        config = generateConfig(args.grid, args.cols, args.clades, \
+            float(Parser.safeEval(args.arrival)), args.regime, args.placement, \
+            args.density, None if args.days is None else Parser.safeEval(args.days), \
+            args.seed, args.spread, args.template)
+        writeInputCSV(config, args.output, args.template)
+    except (OSError, ValueError) as err:
+        parser.error(str(err))
+    parameters = config['parameters']
+    print(f"wrote {args.output}: {parameters['NUM_ROWS']} x {parameters['NUM_COLS']} " + \
+          f"sponge, {parameters['NUM_INITIAL_SYMBIONTS']} initial symbionts, " + \
+          f"{parameters['NUM_CLADES']} clade(s), {args.regime} regime")
+
+##########################
+if __name__ == "__main__":
+    main()
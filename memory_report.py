@@ -0,0 +1,215 @@
+import gc
+import os.path
+import sys
+import tracemalloc
+
+from event_list import EventType, Event
+from sponge import Cell
+from symbiont import Symbiont
+from compressed_io import CompressedIO
+from telemetry import Telemetry
+
+################################################################################
+class MemoryReport:
+    ''' Class to implement an opt-in memory report for a simulation run (see
+        --memory-report in simulation.py), to find what is responsible for
+        the footprint of large runs: Python allocations are traced with
+        tracemalloc, and every interval simulated days one row is written to
+        a CSV file with
+            - the number of live symbionts, the bytes traced by tracemalloc
+              (current and peak), and the resident set size (current and
+              peak), in MB,
+            - the number and bytes of the live Symbiont objects, of their
+              history lists (cells inhabited, inhabit times, demands, and
+              G0 and G1SG2M times -- with their contents), of the Event
+              objects, and of the Cell objects, found by walking the objects
+              tracked by the garbage collector, and
+            - bytes traced per live symbiont;
+        at the end a report of the top allocation sites (by file and line),
+        and of the sites that grew most since the first row, is printed.
+        Tracing slows the run considerably and each row walks all objects,
+        so the mode is for diagnosis only; when it is disabled the simulation
+        holds no hook at all (see wrapHandlers).
+    '''
+
+    # the Symbiont history lists (see symbiont.py) attributed to symbionts
+    HISTORY_SLOTS : tuple[str] = ('_cells_inhabited', '_inhabit_times', \
+        '_hcds_of_cells_inhabited', '_g0_times', '_g1sg2m_times')
+    TOP_SITES     : int = 10
+    MB            : int = 1 << 20
+
+    # class-level variables
+    _file      : 'io.TextIOBase'        = None
+    _clock     : 'callable'             = None   # returns the current simulated time
+    _num_live  : 'callable'             = None   # returns the number of live symbionts
+    _interval  : float                  = 10.0
+    _next_time : float                  = 0.0
+    _first     : tracemalloc.Snapshot   = None   # snapshot of the first row
+    _last      : tracemalloc.Snapshot   = None   # ... and of the latest
+    _first_time: float                  = 0.0
+    _last_row  : dict[str, float]       = None
+
+    ############################################################################
+    @classmethod
+    def open(cls, filename: str, interval: float, clock: 'callable', \
+             num_live: 'callable') -> None:
+        ''' class-level method to start tracing allocations and create the
+            report file, writing its header (call before the sponge and the
+            initial symbionts are created, so that they are traced)
+        Parameters:
+            filename: name of the CSV file to be written (may be compressed;
+                see CompressedIO)
+            interval: simulated days between rows
+            clock: function returning the current simulated time
+            num_live: function returning the number of live symbionts
+        Raises:
+            ValueError, if interval is not positive
+        '''
+        if interval <= 0:
+            raise ValueError("Error in MemoryReport: the interval must be positive")
+        cls._file      = CompressedIO.openForWriting(filename)
+        cls._clock     = clock
+        cls._num_live  = num_live
+        cls._interval  = interval
+        cls._next_time = 0.0
+        cls._first = cls._last = cls._last_row = None
+        cls._file.write(','.join(cls.columns()) + '\n')
+        tracemalloc.start()
+
+    ############################################################################
+    @staticmethod
+    def columns() -> list[str]:
+        return ['simTime', 'liveSymbionts', 'tracedMB', 'tracedPeakMB', 'rssMB', \
+                'peakRssMB', 'symbionts', 'symbiontMB', 'historyMB', 'events', \
+                'eventMB', 'cells', 'cellMB', 'bytesPerSymbiont']
+
+    ############################################################################
+    @classmethod
+    def wrapHandlers(cls, handlers: dict) -> dict:
+        ''' class-level method returning a copy of the simulation's event-handler
+            table (see Simulation.runUntil) in which each handler also writes
+            a row when one is due '''
+        clock = cls._clock
+
+        def sampling(handler: 'callable') -> 'callable':
+            def handle(event_type: EventType, symbiont: Symbiont, trace: 'callable') -> None:
+                handler(event_type, symbiont, trace)
+                if clock() >= cls._next_time: cls.sample()
+            return handle
+
+        return {event_type: sampling(handler) for event_type, handler in handlers.items()}
+
+    ############################################################################
+    @staticmethod
+    def objectFootprints() -> dict[str, int]:
+        ''' walks the objects tracked by the garbage collector, returning the
+            numbers and bytes (sys.getsizeof) of the Symbiont, Event, and Cell
+            objects and the bytes of the symbionts' history lists '''
+        sizeof = sys.getsizeof
+        counts = {Symbiont: 0, Event: 0, Cell: 0}
+        sizes  = {Symbiont: 0, Event: 0, Cell: 0}
+        history = 0
+        for obj in gc.get_objects():
+            kind = type(obj)
+            if kind not in counts: continue
+            counts[kind] += 1
+            sizes[kind]  += sizeof(obj)
+            if kind is Symbiont:
+                for slot in MemoryReport.HISTORY_SLOTS:
+                    values = getattr(obj, slot, None)
+                    if values is None: continue
+                    history += sizeof(values) + sum(sizeof(value) for value in values)
+        return {'symbionts': counts[Symbiont], 'symbiontBytes': sizes[Symbiont], \
+                'historyBytes': history, 'events': counts[Event], \
+                'eventBytes': sizes[Event], 'cells': counts[Cell], 'cellBytes': sizes[Cell]}
+
+    ############################################################################
+    @staticmethod
+    def peakResidentSetSize() -> int:
+        ''' returns the peak resident set size of this process in bytes (0 if
+            unavailable, e.g., on Windows) '''
+        try:
+            import resource
+        except ImportError:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # bytes vs. KB
+
+    ############################################################################
+    @classmethod
+    def sample(cls) -> None:
+        ''' class-level method to take a snapshot and write one row for the
+            current state '''
+        sim_time = cls._clock()
+        live = cls._num_live()
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        footprints = cls.objectFootprints()
+        rss = Telemetry.residentSetSize()
+        cls._last = tracemalloc.take_snapshot()
+        if cls._first is None: cls._first, cls._first_time = cls._last, sim_time
+
+        row = {'simTime': sim_time, 'liveSymbionts': live, \
+               'tracedMB': traced / cls.MB, 'tracedPeakMB': traced_peak / cls.MB, \
+               'rssMB': rss / cls.MB, \
+               'peakRssMB': max(cls.peakResidentSetSize(), rss) / cls.MB, \
+               'symbionts': footprints['symbionts'], \
+               'symbiontMB': footprints['symbiontBytes'] / cls.MB, \
+               'historyMB': footprints['historyBytes'] / cls.MB, \
+               'events': footprints['events'], 'eventMB': footprints['eventBytes'] / cls.MB, \
+               'cells': footprints['cells'], 'cellMB': footprints['cellBytes'] / cls.MB, \
+               'bytesPerSymbiont': traced / live if live > 0 else 0.0}
+        cls._file.write(','.join(f'{row[c]:.6g}' if isinstance(row[c], float) \
+                                 else str(row[c]) for c in cls.columns()) + '\n')
+        cls._last_row = row
+        while cls._next_time <= sim_time: cls._next_time += cls._interval
+
+    ############################################################################
+    @classmethod
+    def close(cls) -> None:
+        ''' class-level method to write a final row, close the file, and stop
+            tracing '''
+        if cls._file is None: return
+        cls.sample()
+        cls._file.close()
+        cls._file = None
+        tracemalloc.stop()
+
+    ############################################################################
+    @classmethod
+    def formatReport(cls) -> str:
+        ''' class-level method returning the report: the footprint by type as
+            of the last row, the top allocation sites, and the sites that grew
+            most since the first row '''
+        if cls._last_row is None: return ""
+        row = cls._last_row
+        lines = [f"memory at t={row['simTime']:.6g}: {row['liveSymbionts']} live " + \
+                 f"symbionts, {row['tracedMB']:.1f} MB traced (peak " + \
+                 f"{row['tracedPeakMB']:.1f}), RSS {row['rssMB']:.1f} MB (peak " + \
+                 f"{row['peakRssMB']:.1f}), {row['bytesPerSymbiont']:.0f} bytes per symbiont"]
+        for name, count, size in (('Symbiont', row['symbionts'], row['symbiontMB']), \
+                                  ('  history lists', None, row['historyMB']), \
+                                  ('Event', row['events'], row['eventMB']), \
+                                  ('Cell', row['cells'], row['cellMB'])):
+            count = '' if count is None else count
+            lines.append(f"    {name:<18}{count:>10}{size:>10.2f} MB")
+
+        # (allocations by tracemalloc itself, e.g., of earlier snapshots, are
+        # left out)
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+        first, last = cls._first.filter_traces(ignore), cls._last.filter_traces(ignore)
+        lines.append(f"top {cls.TOP_SITES} allocation sites:")
+        for stat in last.statistics('lineno')[:cls.TOP_SITES]:
+            lines.append(f"    {cls.site(stat.traceback):<40}{stat.size / cls.MB:>10.2f} MB" + \
+                         f"{stat.count:>10} blocks")
+        if cls._first is not cls._last:
+            lines.append(f"top {cls.TOP_SITES} sites by growth since " + \
+                         f"t={cls._first_time:.6g}:")
+            for stat in last.compare_to(first, 'lineno')[:cls.TOP_SITES]:
+                lines.append(f"    {cls.site(stat.traceback):<40}" + \
+                             f"{stat.size_diff / cls.MB:>+10.2f} MB{stat.count_diff:>+10} blocks")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def site(traceback: tracemalloc.Traceback) -> str:
+        frame = traceback[0]
+        return f"{os.path.basename(frame.filename)}:{frame.lineno}"
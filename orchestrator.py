@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import os
+import os.path
+import sys
+import time
+
+from parameters import Parameters
+from parser import Parser
+from sweep_queue import SweepQueue
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+################################################################################
+class RunState:
+    ''' Class holding the specification and progress of one run launched by
+        the Orchestrator '''
+
+    __slots__ = ('name', 'input_csv', 'overrides', 'clade_overrides', 'max_time', \
+                 'time_reached', 'attempts', 'status', 'error')
+
+    def __init__(self, name: str, input_csv: str, overrides: dict[str, str], \
+                 clade_overrides: dict[int, dict[str, str]], max_time: float) -> None:
+        self.name            = name
+        self.input_csv       = input_csv
+        self.overrides       = overrides          # NAME -> VALUE (str)
+        self.clade_overrides = clade_overrides    # N -> {NAME: VALUE}
+        self.max_time        = max_time           # MAX_SIMULATED_TIME
+        self.time_reached    = 0.0                # simulated time reached so far
+        self.attempts        = 0
+        self.status          = 'pending'          # running, done, failed
+        self.error           = None
+
+################################################################################
+class Orchestrator:
+    ''' Class to run many simulation runs as parallel subprocesses from one
+        asyncio event loop, in place of one progress bar per run: each run
+        reports the simulated time it has reached through a pipe (see
+        --progress-fd in simulation.py), and a single aggregated status line
+        shows the runs done, running, and failed, the simulated days per
+        second over all runs, and an estimated time to completion.  A run
+        that exceeds the per-run timeout is killed, and a failed or timed-out
+        run is retried up to the given number of times.
+    '''
+
+    RENDER_INTERVAL : float = 0.5   # seconds between status-line updates
+
+    ############################################################################
+    def __init__(self, runs: list[RunState], parallel: int = None, \
+                 timeout: float = None, retries: int = 0, \
+                 log_dir: str = "orchestrator_logs", use_cache: bool = False) -> None:
+        ''' initializer for an Orchestrator
+        Parameters:
+            runs: list of RunState, one per run
+            parallel: maximum number of concurrent runs (default: CPUs)
+            timeout: per-run wall-time limit in seconds (default: none)
+            retries: number of times to retry a failed or timed-out run
+            log_dir: directory for each run's stdout/stderr (<name>.log)
+            use_cache: whether runs use the result cache (see result_cache.py;
+                default: False)
+        '''
+        self._runs      = runs
+        self._parallel  = parallel or os.cpu_count() or 1
+        self._timeout   = timeout
+        self._retries   = retries
+        self._log_dir   = log_dir
+        self._use_cache = use_cache
+        self._start     = None
+
+    ############################################################################
+    def run(self) -> list[RunState]:
+        ''' runs all runs to completion (or failure)
+        Returns:
+            the list of RunState, with final status of each run
+        '''
+        return asyncio.run(self._runAll())
+
+    ############################################################################
+    async def _runAll(self) -> list[RunState]:
+        os.makedirs(self._log_dir, exist_ok = True)
+        self._start = time.monotonic()
+        semaphore   = asyncio.Semaphore(self._parallel)
+
+        async def limited(run: RunState) -> None:
+            async with semaphore: await self._runWithRetries(run)
+
+        renderer = asyncio.create_task(self._renderLoop())
+        try:
+            await asyncio.gather(*[limited(run) for run in self._runs])
+        finally:
+            renderer.cancel()
+            self._render(final = True)
+        return self._runs
+
+    ############################################################################
+    async def _runWithRetries(self, run: RunState) -> None:
+        ''' runs one run, retrying on failure or timeout '''
+        while True:
+            run.attempts    += 1
+            run.status       = 'running'
+            run.time_reached = 0.0
+            run.error = await self._runOnce(run)
+            if run.error is None:
+                run.status, run.time_reached = 'done', run.max_time
+                return
+            if run.attempts > self._retries:
+                run.status = 'failed'
+                return
+
+    ############################################################################
+    async def _runOnce(self, run: RunState) -> str or None:
+        ''' launches one attempt of a run as a subprocess, following its
+            progress through a pipe
+        Returns:
+            None on success, else a str describing the failure
+        '''
+        command = [sys.executable, os.path.join(ROOT, "simulation.py"), \
+                   run.input_csv, "False"]
+        for name, value in run.overrides.items():
+            command += ["--set", f"{name}={value}"]
+        for number, values in run.clade_overrides.items():
+            for name, value in values.items():
+                command += ["--set-clade", f"{number}:{name}={value}"]
+        if self._use_cache: command.append("--cache")
+
+        read_fd, write_fd = os.pipe()
+        command += ["--progress-fd", str(write_fd)]
+        log = open(os.path.join(self._log_dir, f"{run.name}.log"), "ab")
+        try:
+            process = await asyncio.create_subprocess_exec(*command, \
+                stdin = asyncio.subprocess.DEVNULL, stdout = log, \
+                stderr = asyncio.subprocess.STDOUT, pass_fds = (write_fd,))
+        except OSError as err:
+            os.close(read_fd)
+            log.close()
+            return f"could not start: {err}"
+        finally:
+            os.close(write_fd)   # (the child has its own copy)
+
+        # read progress lines until the child closes its end of the pipe
+        loop   = asyncio.get_running_loop()
+        reader = asyncio.StreamReader()
+        transport, protocol = await loop.connect_read_pipe( \
+            lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(read_fd, "rb"))
+
+        async def follow() -> None:
+            async for line in reader:
+                try:    run.time_reached = float(line)
+                except ValueError: pass
+            await process.wait()
+
+        try:
+            await asyncio.wait_for(follow(), self._timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return f"timed out after {self._timeout} s"
+        finally:
+            transport.close()
+            log.close()
+        if process.returncode != 0:
+            return f"exit status {process.returncode} (see {self._log_dir}/{run.name}.log)"
+        return None
+
+    ############################################################################
+    async def _renderLoop(self) -> None:
+        while True:
+            self._render()
+            await asyncio.sleep(self.RENDER_INTERVAL)
+
+    ############################################################################
+    def _render(self, final: bool = False) -> None:
+        ''' writes the aggregated status line (updated in place on a terminal,
+            otherwise at most every few seconds and at the end) '''
+        counts = {'pending': 0, 'running': 0, 'done': 0, 'failed': 0}
+        for run in self._runs: counts[run.status] += 1
+        elapsed   = time.monotonic() - self._start
+        simulated = sum([run.time_reached for run in self._runs])
+        remaining = sum([run.max_time - run.time_reached for run in self._runs \
+                         if run.status in ('pending', 'running')])
+        rate = simulated / elapsed if elapsed > 0 else 0.0
+        eta  = f"{remaining / rate:7.0f} s" if rate > 0 else "      ?  "
+        line = f"runs done {counts['done']}/{len(self._runs)}, running " + \
+               f"{counts['running']}, failed {counts['failed']} | " + \
+               f"{rate:9.1f} simulated days/s | ETA {eta} | elapsed {elapsed:7.0f} s"
+        if sys.stdout.isatty():
+            print("\r" + line, end = "\n" if final else "", flush = True)
+        elif final or int(elapsed / self.RENDER_INTERVAL) % 20 == 0:
+            print(line, flush = True)
+
+################################################################################
+def buildRuns(input_csvs: list[str], overrides: dict[str, str], \
+              clade_overrides: dict[int, dict[str, str]], replicates: int, \
+              output_dir: str) -> list[RunState]:
+    ''' builds one RunState per (input CSV, replicate), with the output files
+        of each run redirected into output_dir/<name> so that parallel runs
+        do not overwrite each other's files
+    Raises:
+        ValueError, for an invalid input CSV or override
+    '''
+    runs = []
+    for i, input_csv in enumerate(input_csvs):
+        Parser.parseCSVInput(input_csv)
+        Parser.applyOverrides(overrides, clade_overrides)
+        stem = os.path.splitext(os.path.basename(input_csv))[0]
+        for replicate in range(replicates):
+            name = f"{i + 1}_{stem}" + (f"_rep{replicate}" if replicates > 1 else "")
+            run_overrides = dict(overrides)
+            if replicates > 1: run_overrides['REPLICATE'] = str(replicate)
+            for parameter in SweepQueue.OUTPUT_PARAMETERS:
+                filename = getattr(Parameters, parameter)
+                if filename != "":
+                    run_overrides[parameter] = os.path.join(output_dir, name, \
+                                                            os.path.basename(filename))
+                    os.makedirs(os.path.join(output_dir, name), exist_ok = True)
+            runs.append(RunState(name, os.path.abspath(input_csv), run_overrides, \
+                                 clade_overrides, Parameters.MAX_SIMULATED_TIME))
+    return runs
+
+################################################################################
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "run many simulations in " + \
+        "parallel subprocesses with one aggregated progress line")
+    parser.add_argument("input_csv", nargs = "+", help = "input CSV filename(s)")
+    parser.add_argument("--replicates", type = int, default = 1, \
+        help = "replicates per input CSV (REPLICATE 0, 1, ...; default: 1)")
+    parser.add_argument("--parallel", type = int, default = None, \
+        help = "maximum concurrent runs (default: number of CPUs)")
+    parser.add_argument("--timeout", type = float, default = None, \
+        help = "per-run wall-time limit in seconds (default: none)")
+    parser.add_argument("--retries", type = int, default = 0, \
+        help = "retries of a failed or timed-out run (default: 0)")
+    parser.add_argument("--output-dir", default = "orchestrator_output", \
+        help = "directory for the runs' output files (default: orchestrator_output)")
+    parser.add_argument("--set", action = "append", default = [], \
+        metavar = "NAME=VALUE", dest = "overrides", \
+        help = "override a simulation-level parameter (may be repeated)")
+    parser.add_argument("--set-clade", action = "append", default = [], \
+        metavar = "N:NAME=VALUE", dest = "clade_overrides", \
+        help = "override a parameter of clade number N (may be repeated)")
+    parser.add_argument("--cache", action = "store_true", \
+        help = "runs use (and store results in) the result cache")
+    args = parser.parse_args()
+
+    try:
+        overrides, clade_overrides = Parser.parseSettings(args.overrides, args.clade_overrides)
+        runs = buildRuns(args.input_csv, overrides, clade_overrides, args.replicates, \
+                         args.output_dir)
+    except ValueError as err:
+        parser.error(str(err))
+
+    orchestrator = Orchestrator(runs, args.parallel, args.timeout, args.retries, \
+                                os.path.join(args.output_dir, "logs"), \
+                                use_cache = args.cache)
+    orchestrator.run()
+    failed = [run for run in runs if run.status == 'failed']
+    for run in failed:
+        print(f"FAILED {run.name} after {run.attempts} attempt(s): {run.error}")
+    sys.exit(1 if failed else 0)
+
+##########################
+if __name__ == "__main__":
+    main()
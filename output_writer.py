@@ -0,0 +1,267 @@
+import atexit
+import queue
+import threading
+from enum import Enum
+from compressed_io import CompressedIO
+
+################################################################################
+class Channel(Enum):
+    ''' enumeration to identify the different output files that are written
+        through the OutputWriter pipeline
+    '''
+    POPULATION = 0
+    CSV        = 1
+
+################################################################################
+class FileSink:
+    ''' output sink formatting each record and writing it to a file
+        (compressed according to the file extension -- see CompressedIO) '''
+    def __init__(self, filename: str, formatter: 'callable', header: str = None) -> None:
+        self._file      = CompressedIO.openForWriting(filename)
+        self._formatter = formatter
+        if header is not None: self._file.write(header)
+
+    def write(self, record: object) -> None: self._file.write(self._formatter(record))
+    def close(self) -> None: self._file.close()
+
+################################################################################
+class MemorySink:
+    ''' output sink keeping the (unformatted) records in memory, in a list
+        available via getRecords() once the channel has been closed '''
+    def __init__(self) -> None: self._records = []
+
+    def write(self, record: object) -> None: self._records.append(record)
+    def close(self) -> None: pass
+    def getRecords(self) -> list: return self._records
+
+################################################################################
+class NullSink:
+    ''' output sink discarding all records '''
+    def write(self, record: object) -> None: pass
+    def close(self) -> None: pass
+
+################################################################################
+class OutputWriter:
+    ''' Class to implement a background output pipeline for the simulation.
+        The simulation thread pushes lightweight records (tuples of values) for
+        a particular Channel using put(); records are grouped into batches and
+        handed to a bounded queue, and a separate writer thread hands each
+        record to the sink of its channel: usually a FileSink, which formats
+        the record and writes it -- compressing, if requested -- to the
+        corresponding file, or else a MemorySink or NullSink.  Because
+        the queue is bounded, a slow file system applies backpressure to the
+        simulation rather than letting the queue grow without limit.  Any
+        exception raised in the writer thread is stored and re-raised (as a
+        RuntimeError) in the simulation thread when it next hands off a batch
+        (see put) or on closeChannel() or finish(); the writer thread is then
+        stopped before the sinks are closed, and the pipeline stays failed
+        (discarding records) until the next start().
+    '''
+
+    # class-level constants
+    BATCH_SIZE  : int = 512   # number of records per queue item
+    QUEUE_SIZE  : int = 64    # maximum number of batches in flight
+
+    # class-level variables
+    _queue        : queue.Queue                     = None
+    _thread       : threading.Thread                = None
+    _threaded     : bool                            = True
+    _pending      : list[tuple[Channel, object]]    = []
+    _open         : set[Channel]                    = set()
+    _sinks        : dict[Channel, object]           = {}   # e.g. FileSink
+    _error        : BaseException                   = None   # not yet reported
+    _failed       : bool                            = False  # sticky, until start()
+    _atexit_registered : bool                       = False
+
+    # sentinel record used to request that a channel's file be closed
+    _CLOSE = object()
+
+    ############################################################################
+    @classmethod
+    def start(cls, threaded: bool = True) -> None:
+        ''' class-level method to start the output pipeline
+        Parameters:
+            threaded: if True (default), formatting and writing happen in a
+                background writer thread; if False, records are formatted and
+                written immediately in the calling thread (useful for debugging)
+        '''
+        if cls._thread is not None: cls.finish()
+        cls._threaded = threaded
+        cls._pending  = []
+        cls._open     = set()
+        cls._sinks    = {}
+        cls._error    = None
+        cls._failed   = False
+        if threaded:
+            cls._queue  = queue.Queue(maxsize = cls.QUEUE_SIZE)
+            cls._thread = threading.Thread(target = cls._writerLoop, \
+                                           name = "OutputWriter", daemon = True)
+            cls._thread.start()
+        if not cls._atexit_registered:
+            # make sure buffered records reach disk even if the simulation
+            # exits early (e.g., sys.exit or an uncaught exception)
+            atexit.register(cls._finishQuietly)
+            cls._atexit_registered = True
+
+    ############################################################################
+    @classmethod
+    def openChannel(cls, channel: Channel, filename: str, formatter: 'callable', \
+                    header: str = None) -> None:
+        ''' class-level method to open the output file for a given channel
+            (compressed according to the file extension -- see CompressedIO)
+        Parameters:
+            channel: named entry from the Channel class
+            filename: name of the file to be written
+            formatter: callable taking a single record and returning the str
+                to be written to the file
+            header: optional str written once at the top of the file
+        '''
+        cls.openSink(channel, FileSink(filename, formatter, header))
+
+    ############################################################################
+    @classmethod
+    def openSink(cls, channel: Channel, sink: object) -> None:
+        ''' class-level method to open a channel with a given sink
+        Parameters:
+            channel: named entry from the Channel class
+            sink: object with write(record) and close() methods, called in
+                the writer thread (e.g., a FileSink, MemorySink, or NullSink)
+        '''
+        cls._sinks[channel] = sink
+        cls._open.add(channel)
+
+    ############################################################################
+    @classmethod
+    def isOpen(cls, channel: Channel) -> bool:
+        ''' returns True if the given channel currently has an open sink '''
+        return channel in cls._open
+
+    ############################################################################
+    @classmethod
+    def put(cls, channel: Channel, record: object) -> None:
+        ''' class-level method used by the simulation to push a record onto the
+            output pipeline
+        Parameters:
+            channel: named entry from the Channel class
+            record: the (lightweight) record to be formatted by the writer
+        Raises:
+            RuntimeError, if the writer thread previously failed (checked only
+            when a batch is handed off, i.e., every BATCH_SIZE records; a
+            failure not yet reported is raised by finish())
+        '''
+        cls._pending.append((channel, record))
+        if len(cls._pending) >= cls.BATCH_SIZE: cls._submit()
+
+    ############################################################################
+    @classmethod
+    def closeChannel(cls, channel: Channel) -> None:
+        ''' class-level method to flush all pending records for a channel and
+            then close its sink
+        Parameters:
+            channel: named entry from the Channel class
+        '''
+        if channel not in cls._open: return
+        cls._open.discard(channel)  # no more records accepted for channel
+        cls._pending.append((channel, cls._CLOSE))
+        cls._submit()
+
+    ############################################################################
+    @classmethod
+    def finish(cls) -> None:
+        ''' class-level method to close all open channels, wait for the writer
+            thread to drain the queue, and stop the thread
+        Raises:
+            RuntimeError, if the writer thread failed at any point
+        '''
+        try:
+            for channel in list(cls._open):
+                cls.closeChannel(channel)
+            cls._submit()
+        finally:
+            cls._stopThread()
+        cls._checkForError()
+
+    ############################################################################
+    @classmethod
+    def _stopThread(cls) -> None:
+        ''' tells the writer thread to stop, once it has drained the queue,
+            and waits for it '''
+        if cls._thread is not None:
+            cls._queue.put(None)
+            cls._thread.join()
+            cls._thread = None
+
+    ############################################################################
+    @classmethod
+    def _finishQuietly(cls) -> None:
+        ''' atexit version of finish, which does not raise '''
+        try:    cls.finish()
+        except Exception as err: print(f"ERROR: {err}")
+
+    ############################################################################
+    @classmethod
+    def _submit(cls) -> None:
+        ''' hands the batch of pending records to the writer thread (blocking
+            if the queue is full) or, if not threaded, writes them directly
+        '''
+        cls._checkForError()
+        if cls._failed: cls._pending = []   # (already reported)
+        if len(cls._pending) == 0: return
+        batch, cls._pending = cls._pending, []
+        if cls._threaded:
+            cls._queue.put(batch)
+        else:
+            try:
+                cls._writeBatch(batch)
+            except BaseException as err:
+                cls._failed, cls._error = True, err
+                cls._checkForError()
+
+    ############################################################################
+    @classmethod
+    def _checkForError(cls) -> None:
+        ''' re-raises in the calling thread any error from the writer thread
+            (once), after stopping the thread and closing the sinks '''
+        if cls._error is not None:
+            err = cls._error
+            cls._error = None
+            cls._stopThread()   # (the thread no longer touches the sinks)
+            cls._closeAllFiles()
+            raise RuntimeError(f"Error in OutputWriter: {err!r}") from err
+
+    ############################################################################
+    @classmethod
+    def _writerLoop(cls) -> None:
+        ''' main loop of the writer thread '''
+        while True:
+            batch = cls._queue.get()
+            if batch is None: break
+            # after a failure, keep draining the queue (discarding records) so
+            # the simulation thread never blocks on a full queue
+            if cls._failed: continue
+            try:
+                cls._writeBatch(batch)
+            except BaseException as err:
+                cls._failed, cls._error = True, err
+
+    ############################################################################
+    @classmethod
+    def _writeBatch(cls, batch: list[tuple[Channel, object]]) -> None:
+        ''' hands a batch of records to the sinks of their channels '''
+        sinks = cls._sinks
+        for channel, record in batch:
+            if record is cls._CLOSE:
+                sinks.pop(channel).close()
+            else:
+                sinks[channel].write(record)
+
+    ############################################################################
+    @classmethod
+    def _closeAllFiles(cls) -> None:
+        ''' closes any sinks left open after a writer failure (with the
+            writer thread stopped) '''
+        for sink in cls._sinks.values():
+            try:    sink.close()
+            except Exception: pass
+        cls._sinks = {}
+        cls._open  = set()
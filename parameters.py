@@ -9,6 +9,7 @@ class Parameters:
     INFINITY = float('inf')
 
     INITIAL_SEED:              int         = 0
+    REPLICATE:                 int         = 0      # replicate number (see rng_mt19937.py)
     MAX_SIMULATED_TIME:        float       = 0.0    # in days 
     NUM_ROWS:                  int         = 0
     NUM_COLS:                  int         = 0 
@@ -17,15 +18,31 @@ class Parameters:
     HOST_CELL_DEMAND:          float       = 0.0
     HCD_FUZZ:                  float       = 0.0
     AVG_TIME_BETWEEN_ARRIVALS: float       = 0.0
+    ARRIVAL_FAST_FORWARD:      str         = "off"  # 'off', 'exact', or 'memoryless'
 
     NUM_CLADES:                int         = 0
     CLADE_PROPORTIONS:         list[float] = []
 
     POPULATION_FILENAME:       str         = ""
+    POPULATION_INTERVAL:       float       = 1.0    # in days
     WRITE_CSV_INFO:            bool        = False
     CSV_FILENAME:              str         = ""
+    WRITE_SUMMARY_INFO:        bool        = False
+    SUMMARY_FILENAME:          str         = ""
+    SUMMARY_WINDOW:            float       = 0.0    # in days; 0 for no windows
+    STOP_ON_EXTINCTION:        bool        = False
+    STOP_EXTINCTION_DAYS:      float       = 0.0    # in days
+    STOP_DOMINANCE_FRACTION:   float       = 0.0    # 0 for no dominance rule
+    STOP_DOMINANCE_DAYS:       float       = 0.0    # in days
+    STOP_CV_THRESHOLD:         float       = 0.0    # 0 for no steady-state rule
+    STOP_CV_DAYS:              float       = 30.0   # in days
+    STOP_SATURATION_DAYS:      float       = 0.0    # in days; 0 for no saturation rule
     WRITE_LOGGING_INFO:        bool        = False
     LOG_FILENAME:              str         = ""
+    WRITE_TELEMETRY_INFO:      bool        = False
+    TELEMETRY_FILENAME:        str         = ""
+    TELEMETRY_INTERVAL:        float       = 1.0    # in days; 0 for none
+    TELEMETRY_EVENTS:          int         = 0      # 0 for none
 
     PRINT_PARAMETER_VALUES:    bool        = False
 
@@ -35,5 +52,5 @@ class Parameters:
             parameters '''
         for var in dir(cls):
             if not var.startswith('__') and not callable(getattr(cls, var)):
-                value = eval(f"cls.{var}")
+                value = getattr(cls, var)
                 print(f"{var:<30}: {value}")
@@ -1,101 +1,277 @@
-import pandas as pd
+import ast
+import copy
+import csv
+import math
+import operator
 from parameters import *
 from clade import *
 
+# default values of the simulation-level parameters (the class-level variables
+# of the Parameters class), restored before each configuration is applied
+_PARAMETER_DEFAULTS : dict[str, object] = {attr: getattr(Parameters, attr) \
+    for attr in dir(Parameters) \
+    if not attr.startswith("__") and not callable(getattr(Parameters, attr))}
+
 class Parser:
     ''' class for parsing input parameters provided in CSV input file '''
 
+    # simulation-level parameters whose values are kept as (unevaluated) str
+    STRING_PARAMETERS : tuple[str] = ('POPULATION_FILENAME', 'CSV_FILENAME', \
+        'SUMMARY_FILENAME', 'LOG_FILENAME', 'TELEMETRY_FILENAME', 'INITIAL_PLACEMENT', \
+        'ARRIVAL_FAST_FORWARD')
+
+    # operators allowed in parameter-value expressions (see safeEval)
+    _BINARY_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, \
+                   ast.Mult: operator.mul, ast.Div: operator.truediv, \
+                   ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod, \
+                   ast.Pow: lambda base, exponent: Parser._power(base, exponent)}
+    _UNARY_OPS  = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+
+    # largest magnitude (in bits) of a power in an expression -- beyond that
+    # of any float -- so that, e.g., 10**10**10 is rejected, not computed
+    MAX_POWER_BITS : int = 1024
+
     ###############################################
     @classmethod
-    def parseCSVInput(cls, csv_fname: str) -> None:
-        ''' class-level method to parse input parameters from CSV input file
+    def _power(cls, base: object, exponent: object) -> object:
+        ''' class-level method returning base ** exponent, if its magnitude is
+            at most 2**MAX_POWER_BITS and it is real
+        Raises:
+            ValueError, if the result would be larger, or complex (e.g., a
+            negative base with a fractional exponent)
+        '''
+        if base != 0 and exponent * math.log2(abs(base)) > cls.MAX_POWER_BITS:
+            raise ValueError(f"Error in Parser: power ({base})**({exponent}) too large")
+        result = base ** exponent
+        if isinstance(result, complex):
+            raise ValueError(f"Error in Parser: power ({base})**({exponent}) not real")
+        return result
+
+    ###############################################
+    @classmethod
+    def safeEval(cls, expression: str) -> object:
+        ''' class-level method to evaluate a parameter-value expression such as
+            365*4, 1/12.0, or (1/2,1/2) -- i.e., numbers, True/False, + - * /
+            // % **, parentheses, and tuples/lists -- without using eval
+        Parameters:
+            expression: the str to evaluate
+        Returns:
+            the resulting value (int, float, bool, or tuple/list of these)
+        Raises:
+            ValueError, if the expression contains anything else, or its
+            arithmetic fails (e.g., division by zero, or too large a power)
+        '''
+        def evaluate(node: ast.AST) -> object:
+            if isinstance(node, ast.Constant) and \
+               isinstance(node.value, (int, float)):  # (includes bool)
+                return node.value
+            if isinstance(node, ast.BinOp) and type(node.op) in cls._BINARY_OPS:
+                left, right = evaluate(node.left), evaluate(node.right)
+                try:
+                    return cls._BINARY_OPS[type(node.op)](left, right)
+                except (ArithmeticError, TypeError) as err:
+                    raise ValueError(f"Error in Parser: invalid parameter value " + \
+                                     f"'{expression}' ({err})") from None
+            if isinstance(node, ast.UnaryOp) and type(node.op) in cls._UNARY_OPS:
+                return cls._UNARY_OPS[type(node.op)](evaluate(node.operand))
+            if isinstance(node, ast.Tuple):
+                return tuple([evaluate(elt) for elt in node.elts])
+            if isinstance(node, ast.List):
+                return [evaluate(elt) for elt in node.elts]
+            raise ValueError(f"Error in Parser: invalid parameter value '{expression}'")
+
+        try:
+            tree = ast.parse(expression.strip(), mode = 'eval')
+        except SyntaxError:
+            raise ValueError(f"Error in Parser: invalid parameter value '{expression}'") from None
+        return evaluate(tree.body)
+
+    ###############################################
+    @classmethod
+    def convertValue(cls, parameter_name: str, value: str) -> object:
+        ''' class-level method to convert a parameter value given as str (e.g.,
+            from the input CSV) to its Python value
+        Parameters:
+            parameter_name: name of the parameter (str)
+            value: the value, as given in the input (str)
+        Returns:
+            an int or float if the value is numeric; otherwise the str itself
+            for filenames and INITIAL_PLACEMENT, or the evaluated expression
+            (e.g., a tuple for "(0.5,0.5)", True/False in any letter case)
+        '''
+        try: return int(value)
+        except ValueError: pass
+        try: return float(value)
+        except ValueError: pass
+        if parameter_name in cls.STRING_PARAMETERS: return value
+        if value.strip().lower() == "true":  return True
+        if value.strip().lower() == "false": return False
+        return cls.safeEval(value)
+
+    ###############################################
+    @classmethod
+    def readConfig(cls, csv_fname: str) -> dict:
+        ''' class-level method to read a configuration from a CSV input file,
+            without applying it (see applyConfig)
         Parameters:
             csv_fname: filename of the CSV input file (str)
+        Returns:
+            dict with 'parameters', a dict mapping simulation-level parameter
+            names to values, and 'clades', a list with one dict of clade-level
+            parameter names to values per clade (in the order of the file)
+        Raises:
+            ValueError, if the file contains an unknown parameter name or an
+                invalid value
         '''
-        # first, fish out the class-level variables from the Parameters class,
-        # creating a list of those variable names; we will create a simple
-        # string below to exec thereby assigning the Parameters variables as
-        # we find the corresponding entry in the input CSV
-        sim_params_list = [attr for attr in dir(Parameters) \
-                           if not attr.startswith("__") and \
-                              not callable(getattr(Parameters, attr))]
-
-        # lambda to morph a Clade instance variable into its corresponding
-        # Clade setter name; this will convert something like
-        # _avg_residence_time into Clade.setAvgResidenceTime (with a few
-        # replace exceptions that title() doesn't handle well)
-        morph = lambda var: 'Clade.set' + \
-            var.title().replace('Ppr','PPR').replace('Mcr','MCR').replace('G1Sg2M','G1SG2M').replace('_','')
-
-        # now fish out the instance variables from Clade, creating a dictionary
-        # with key as the variable entry in the CSV input file, and value as the
-        # corresponding setter inside Clade (see eval below and more lambda);
-        # with this dictionary, when we encounter clade-level parameters in the
-        # CSV input file, we can find the entry (key will match variable name in
-        # the CSV input file) and then call the method (key's value in dict)
-        # passing the parameter value given in the CSV input file
-        # (ignore the clade_object class-level variable, anything starting with
-        #  '__' (e.g., __str__), and any callable function/method)
-        clade_methods_dict = { \
-            attr.upper()[1:]:eval(morph(attr)) for attr in dir(Clade) \
-               if attr != "clade_objects" and not attr.startswith("__") and \
-                  not callable(getattr(Clade, attr))}
-
-        # read the input CSV as a pandas dataframe 
-        csv_dataframe = pd.read_csv(csv_fname, header = 0)
-
-        # drop (ignore) any blank rows in the CSV (NaN in all entries)
-        csv_dataframe = csv_dataframe.dropna(subset="Parameter Name")
-
-        clade_number = 0 # used below to track which clade to update
-        clade = None
-
-        for r in range(len(csv_dataframe)):
-            row = csv_dataframe.iloc[r]
-            # each row should be of the form: parameter name, value, description
+        with open(csv_fname, newline = '') as csv_file:
+            rows = list(csv.reader(csv_file))
+
+        parameters, clades = {}, []
+        # skip the header row (Parameter Name, Parameter Value, Full Description)
+        for row in rows[1:]:
+            # each row should be of the form: parameter name, value, description;
+            # ignore blank rows and any row where the parameter name begins
+            # with # (comment)
+            if len(row) == 0: continue
             parameter_name = row[0]
-            value          = row[1]
-            description    = row[2]
-
-            # ignore any row where the parameter name begins with # (comment)
-            if isinstance(parameter_name, str) and parameter_name.startswith('#'): continue
-
-            # convert value to either int or float; if unsuccessful, leave as
-            # str if filename, otherwise eval (e.g., for tuples)
-            try: value = int(value)
-            except:
-                try: value = float(value)
-                except:
-                    if parameter_name in ('POPULATION_FILENAME','CSV_FILENAME','LOG_FILENAME','INITIAL_PLACEMENT'):
-                        value = repr(value)  # repr includes quotes for str
-                    else:
-                        # str like "(0.5,0.5)" will be eval'd to tuple
-                        if value.lower() == "true":  value = "True"
-                        if value.lower() == "false": value = "False"
-                        value = eval(str(value))
-
-            if parameter_name in sim_params_list:
-                # simulation-level parameter -- use exec to just set its value
-                exec_str = f'Parameters.{parameter_name} = {value}'
-                exec(exec_str)
+            if parameter_name == "" or parameter_name.startswith('#'): continue
+            if len(row) < 2:
+                raise ValueError(f"Error in Parser: no value given for {parameter_name}")
+            value = cls.convertValue(parameter_name, row[1])
+
+            if parameter_name in _PARAMETER_DEFAULTS:
+                # simulation-level parameter
+                parameters[parameter_name] = value
             else:
-                # clade-level parameter
-                if parameter_name == "CLADE_NUMBER":
-                    # add the previous clade to the list of clades in Clade
-                    if clade is not None: Clade.addClade(clade)
-                    # then create a new clade
-                    clade_number += 1
-                    clade = Clade(clade_number)
-                assert(clade is not None)
+                # clade-level parameter; CLADE_NUMBER starts a new clade
+                if parameter_name == "CLADE_NUMBER": clades.append({})
+                if parameter_name not in Clade.CSV_SETTERS:
+                    raise ValueError(f"Error in Parser: unknown parameter {parameter_name}")
+                if len(clades) == 0:
+                    raise ValueError(f"Error in Parser: clade parameter {parameter_name} " + \
+                                     "given before CLADE_NUMBER")
+                clades[-1][parameter_name] = value
+        return {'parameters': parameters, 'clades': clades}
+
+    ###############################################
+    @classmethod
+    def applyConfig(cls, config: dict) -> None:
+        ''' class-level method to set the Parameters and create the Clade
+            objects from a configuration (see readConfig); simulation-level
+            parameters not in the configuration take their default values
+        Parameters:
+            config: dict with 'parameters' and 'clades' (see readConfig)
+        Raises:
+            ValueError, for an unknown parameter name or an invalid value
+        '''
+        # start from the defaults and no clades (in case of a previous run in
+        # this process)
+        for parameter_name, value in _PARAMETER_DEFAULTS.items():
+            setattr(Parameters, parameter_name, copy.copy(value))
+        Clade.clade_objects = []
+
+        for parameter_name, value in config['parameters'].items():
+            if parameter_name not in _PARAMETER_DEFAULTS:
+                raise ValueError(f"Error in Parser: unknown parameter {parameter_name}")
+            setattr(Parameters, parameter_name, value)
+
+        assert(len(config['clades']) > 0)
+        for clade_number, clade_values in enumerate(config['clades']):
+            clade = Clade(clade_number + 1)
+            for parameter_name, value in clade_values.items():
                 # get the setter method reference and then call, passing value
-                setter_method = clade_methods_dict[parameter_name]
+                setter_method = Clade.CSV_SETTERS.get(parameter_name)
+                if setter_method is None:
+                    raise ValueError(f"Error in Parser: unknown parameter {parameter_name}")
                 setter_method(clade, value)  # pass in clade for self
+            Clade.addClade(clade)
 
-        # add the last clade (still in progress)
-        assert(clade is not None)
-        Clade.addClade(clade)
+    ###############################################
+    @classmethod
+    def parseCSVInput(cls, csv_fname: str) -> None:
+        ''' class-level method to parse input parameters from CSV input file
+        Parameters:
+            csv_fname: filename of the CSV input file (str)
+        Raises:
+            ValueError, if the file contains an unknown parameter name or an
+                invalid value
+        '''
+        cls.applyConfig(cls.readConfig(csv_fname))
 
-        ## check whether user want to see all parameter values 
+    ###############################################
+    @classmethod
+    def parseSettings(cls, settings: list[str], clade_settings: list[str] = ()) \
+            -> tuple[dict[str, str], dict[int, dict[str, str]]]:
+        ''' class-level method to parse override settings given as str, e.g.,
+            from --set NAME=VALUE and --set-clade N:NAME=VALUE on the command
+            line, into the dicts expected by applyOverrides
+        Parameters:
+            settings: list of "NAME=VALUE" str
+            clade_settings: list of "N:NAME=VALUE" str
+        Returns:
+            tuple of the dict {NAME: VALUE} and the dict {N: {NAME: VALUE}}
+            (VALUEs as str)
+        Raises:
+            ValueError, for a malformed setting
+        '''
+        overrides = {}
+        for setting in settings:
+            name, equals, value = setting.partition("=")
+            if equals == "" or name.strip() == "":
+                raise ValueError(f"Error in Parser: invalid setting {setting}")
+            overrides[name.strip()] = value
+        clade_overrides = {}
+        for setting in clade_settings:
+            number, colon, assignment = setting.partition(":")
+            name, equals, value = assignment.partition("=")
+            if colon == "" or equals == "" or name.strip() == "" or \
+               not number.strip().isdigit():
+                raise ValueError(f"Error in Parser: invalid clade setting {setting}")
+            clade_overrides.setdefault(int(number), {})[name.strip()] = value
+        return (overrides, clade_overrides)
+
+    ###############################################
+    @classmethod
+    def applyOverrides(cls, overrides: dict[str, object] = None, \
+                       clade_overrides: dict[int, dict[str, object]] = None) -> None:
+        ''' class-level method to override parameter values after the input CSV
+            has been parsed (see parseCSVInput), e.g., from --set/--set-clade
+            on the command line or from a sweep driver
+        Parameters:
+            overrides: dict mapping simulation-level parameter names to values
+            clade_overrides: dict mapping clade numbers (from 1, as in the
+                CLADE_NUMBER column) to dicts of clade-level parameter names
+                to values
+            (str values are converted as if read from the input CSV -- see
+             convertValue; other values are used as given)
+        Raises:
+            ValueError, for an unknown parameter name or clade number, or an
+                invalid value
+        '''
+        convert = lambda name, value: \
+            cls.convertValue(name, value) if isinstance(value, str) else value
+
+        for parameter_name, value in (overrides or {}).items():
+            if parameter_name.startswith("__") or not hasattr(Parameters, parameter_name) or \
+               callable(getattr(Parameters, parameter_name)):
+                raise ValueError(f"Error in Parser: unknown parameter {parameter_name}")
+            setattr(Parameters, parameter_name, convert(parameter_name, value))
+
+        for clade_number, clade_values in (clade_overrides or {}).items():
+            if not 1 <= clade_number <= len(Clade.clade_objects):
+                raise ValueError(f"Error in Parser: no clade number {clade_number}")
+            clade = Clade.getClade(clade_number - 1)
+            for parameter_name, value in clade_values.items():
+                setter_method = Clade.CSV_SETTERS.get(parameter_name)
+                if setter_method is None or parameter_name == "CLADE_NUMBER":
+                    raise ValueError(f"Error in Parser: unknown clade parameter {parameter_name}")
+                setter_method(clade, convert(parameter_name, value))
+
+    ###############################################
+    @classmethod
+    def printParameterValues(cls) -> None:
+        ''' class-level method to print all parameter values, if the user
+            requested so (PRINT_PARAMETER_VALUES) '''
         if Parameters.PRINT_PARAMETER_VALUES:
             Parameters.printParameters()
             for clade in Clade.clade_objects:
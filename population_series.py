@@ -0,0 +1,137 @@
+import math
+
+import numpy
+
+################################################################################
+class PopulationSeries:
+    ''' Class to accumulate the population time series (total and per-clade
+        number of symbionts) in memory, in a preallocated numpy array with one
+        row per sampling time 0, dt, 2*dt, ..., up to the maximum simulated
+        time, and one column for the total followed by one per clade.  Rows
+        are handed off for writing in chunks (see takePendingRows) rather than
+        written one small piece at a time.
+    '''
+    __slots__ = ('_interval', '_counts', '_num_recorded', '_num_taken')
+
+    ############################################################################
+    def __init__(self, max_time: float, num_clades: int, interval: float = 1.0) -> None:
+        ''' initializer for a PopulationSeries object
+        Parameters:
+            max_time: maximum simulated time (float, in days)
+            num_clades: number of clades (int)
+            interval: time between samples (float, in days; default 1.0)
+        Raises:
+            ValueError, if the interval is not positive
+        '''
+        if interval <= 0:
+            raise ValueError(f"Error in PopulationSeries: invalid interval {interval}")
+        self._interval     : float         = interval
+        self._num_recorded : int           = 0   # rows filled so far
+        self._num_taken    : int           = 0   # rows already handed off for writing
+        num_samples = self.sampleIndex(max_time) + 1
+        self._counts       : numpy.ndarray = \
+            numpy.zeros((num_samples, num_clades + 1), dtype = numpy.int64)
+
+    ############################################################################
+    def sampleIndex(self, time: float) -> int:
+        ''' returns the index of the most recent sample at or before time '''
+        return int(time / self._interval)
+
+    def sampleStart(self, sample: int) -> float:
+        ''' returns the earliest time whose sample index (see sampleIndex) is
+            at least the given sample, i.e., sample * interval up to rounding '''
+        time = sample * self._interval
+        while self.sampleIndex(time) < sample: time = math.nextafter(time, math.inf)
+        while time > 0 and self.sampleIndex(math.nextafter(time, -math.inf)) >= sample:
+            time = math.nextafter(time, -math.inf)
+        return time
+
+    ############################################################################
+    def record(self, sample: int, total: int, per_clade: list[int]) -> None:
+        ''' records the counts for a particular sample (row)
+        Parameters:
+            sample: the index of the sample (must be the next unrecorded row)
+            total: total number of symbionts
+            per_clade: list (or array) of the number of symbionts per clade
+        '''
+        assert(sample == self._num_recorded)
+        row = self._counts[sample]
+        row[0]  = total
+        row[1:] = per_clade
+        self._num_recorded += 1
+
+    ############################################################################
+    def repeatPrevious(self, sample: int) -> None:
+        ''' records a sample as a copy of the previous sample (used when no
+            event occurred during the sample's interval)
+        Parameters:
+            sample: the index of the sample (must be the next unrecorded row)
+        '''
+        assert(sample == self._num_recorded and sample > 0)
+        self._counts[sample] = self._counts[sample - 1]
+        self._num_recorded += 1
+
+    ############################################################################
+    def recordAll(self, counts: numpy.ndarray) -> None:
+        ''' records all samples at once (e.g., from the result cache)
+        Parameters:
+            counts: 2D array with one row per sample (see getCounts); may have
+                fewer rows than getNumSamples() (e.g., for a run stopped early)
+        '''
+        assert(self._num_recorded == 0 and counts.shape[0] <= self._counts.shape[0] \
+               and counts.shape[1] == self._counts.shape[1])
+        self._counts[:counts.shape[0]] = counts
+        self._num_recorded = counts.shape[0]
+
+    ############################################################################
+    def numPending(self) -> int:
+        ''' returns the number of recorded rows not yet handed off for writing '''
+        return self._num_recorded - self._num_taken
+
+    ############################################################################
+    def takePendingRows(self) -> tuple[int, numpy.ndarray]:
+        ''' hands off (a copy of) the recorded rows not yet written
+        Returns:
+            a tuple containing the index of the first row and the 2D array of rows
+        '''
+        first = self._num_taken
+        rows  = self._counts[first:self._num_recorded].copy()
+        self._num_taken = self._num_recorded
+        return (first, rows)
+
+    ############################################################################
+    ''' simple getter/accessor methods '''
+    def getInterval(self)   -> float: return self._interval
+    def getNumSamples(self) -> int:   return self._counts.shape[0]
+
+    ############################################################################
+    def getCounts(self) -> numpy.ndarray:
+        ''' returns the recorded rows: column 0 is the total number of symbionts
+            and column c+1 is the number of symbionts of clade c '''
+        return self._counts[:self._num_recorded]
+
+    ############################################################################
+    def getTimes(self) -> numpy.ndarray:
+        ''' returns the sampling time of each recorded row '''
+        return numpy.arange(self._num_recorded) * self._interval
+
+    ############################################################################
+    @staticmethod
+    def formatRows(record: tuple[int, float, numpy.ndarray]) -> str:
+        ''' formats a chunk of rows for the population file (applied by the
+            OutputWriter thread): sampling time, total, then per-clade counts,
+            tab-separated; times are whole days when the interval is a whole
+            number of days
+        Parameters:
+            record: tuple of (index of first row, interval, 2D array of rows)
+        Returns:
+            the str to be written
+        '''
+        first, interval, rows = record
+        integral = float(interval).is_integer()
+        lines = []
+        for i, row in enumerate(rows.tolist()):
+            time = (first + i) * interval
+            time = int(time) if integral else round(time, 9)
+            lines.append(f"{time}\t" + "\t".join([str(n) for n in row]) + "\n")
+        return "".join(lines)
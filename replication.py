@@ -0,0 +1,306 @@
+import argparse
+import csv
+import math
+import multiprocessing
+import multiprocessing.pool
+import os
+import statistics
+import sys
+
+from exit_statistics import RunningStats
+from parameters import Parameters
+from parser import Parser
+from result_cache import ResultCache
+
+################################################################################
+def runReplicate(task: tuple) -> dict[str, float]:
+    ''' runs one replicate of a configuration (in a worker process) and
+        returns its output metrics
+    Parameters:
+        task: tuple of (input CSV filename, overrides, clade overrides,
+              replicate number, whether to compute the mean residence time,
+              whether to use the result cache, result cache directory)
+    Returns:
+        dict mapping metric name to value: 'total' and 'clade1', 'clade2', ...
+        (numbers of symbionts at the end of the run) and, if requested,
+        'resTime' (mean residence time of all exited symbionts)
+    '''
+    # imported here so that the (forked or spawned) worker sets up its own
+    # simulation state
+    from simulation import Simulation
+
+    input_csv, overrides, clade_overrides, replicate, residence_time, \
+        use_cache, cache_dir = task
+    ResultCache.directory = cache_dir
+
+    # replicates write no files: the metrics come from the in-memory results
+    overrides = dict(overrides)
+    overrides.update({'REPLICATE': replicate, 'POPULATION_FILENAME': "", \
+        'WRITE_CSV_INFO': False, 'WRITE_LOGGING_INFO': False, 'WRITE_TELEMETRY_INFO': False, \
+        'WRITE_SUMMARY_INFO': residence_time, 'SUMMARY_FILENAME': "", \
+        'PRINT_PARAMETER_VALUES': False})
+    Simulation.run(input_csv, overrides, clade_overrides, use_cache = use_cache)
+
+    final = Simulation.getPopulationSeries()[-1]
+    metrics = {'total': float(final[0])}
+    for c in range(1, len(final)):
+        metrics[f'clade{c}'] = float(final[c])
+    if residence_time:
+        metrics['resTime'] = meanResidenceTime(Simulation.getSummary())
+    return metrics
+
+################################################################################
+def meanResidenceTime(summary: str) -> float:
+    ''' returns the mean residence time over all clades and exit statuses from
+        an exit-statistics summary (see ExitStatistics.formatSummary), i.e.,
+        the count-weighted mean of the per-clade totals (which leave out the
+        symbionts still in residence at the end of the run) '''
+    rows = csv.DictReader([line for line in summary.splitlines() \
+                           if not line.startswith('#')])
+    count, total = 0, 0.0
+    for row in rows:
+        if row['exitStatus'] != 'ALL' or int(row['count']) == 0: continue
+        count += int(row['count'])
+        total += int(row['count']) * float(row['resTimeMean'])
+    return total / count if count > 0 else math.nan
+
+################################################################################
+class ReplicateController:
+    ''' Class to run replicates of one configuration (an input CSV plus any
+        overrides) in batches, in parallel, until the confidence interval of
+        the mean of every chosen output metric is narrow enough -- its half-
+        width at most target times the mean -- or the replicate budget is
+        spent.  Replicate r runs with Parameters.REPLICATE = r, i.e., with an
+        independent set of random streams derived from INITIAL_SEED (see
+        RNG.initializeStreams); replicate 0 is the configuration as given.
+        Results do not depend on the number of workers: batches have a fixed
+        size (DEFAULT_BATCH_SIZE unless given), and the stopping rule is
+        checked only between batches, on the replicates in order.
+    '''
+
+    RESIDENCE_TIME     : str = 'resTime'
+    DEFAULT_BATCH_SIZE : int = 8   # replicates per batch (not the worker count)
+
+    ############################################################################
+    def __init__(self, input_csv: str, overrides: dict[str, object] = None, \
+                 clade_overrides: dict[int, dict[str, object]] = None, \
+                 metrics: list[str] = None, target: float = 0.05, \
+                 confidence: float = 0.95, min_replicates: int = 5, \
+                 max_replicates: int = 100, batch_size: int = None, \
+                 workers: int = None, use_cache: bool = False) -> None:
+        ''' initializer for a ReplicateController
+        Parameters:
+            input_csv: input CSV filename of the configuration
+            overrides, clade_overrides: parameter overrides (see
+                Parser.applyOverrides)
+            metrics: names of the output metrics to track: 'total', 'clade1',
+                'clade2', ..., and/or 'resTime' (default: total and per-clade
+                final numbers of symbionts)
+            target: target relative half-width of the confidence intervals
+            confidence: confidence level of the intervals (e.g., 0.95)
+            min_replicates: number of replicates before checking the target
+            max_replicates: budget: maximum number of replicates to run
+            batch_size: number of replicates per batch (default:
+                DEFAULT_BATCH_SIZE)
+            workers: number of worker processes (default: number of CPUs)
+            use_cache: whether replicates use the result cache (default:
+                False)
+        Raises:
+            ValueError, for an unknown metric name or invalid settings
+        '''
+        self._input_csv       = input_csv
+        self._overrides       = dict(overrides or {})
+        self._clade_overrides = dict(clade_overrides or {})
+        self._target          = target
+        self._confidence      = confidence
+        self._min_replicates  = max(min_replicates, 2)
+        self._max_replicates  = max_replicates
+        self._workers         = workers or os.cpu_count() or 1
+        self._batch_size      = batch_size or self.DEFAULT_BATCH_SIZE
+        self._use_cache       = use_cache
+        if not 0 < confidence < 1 or target <= 0 or max_replicates < 1 or \
+           self._batch_size < 1:
+            raise ValueError("Error in ReplicateController: invalid settings")
+
+        # the available metrics depend on the number of clades
+        Parser.parseCSVInput(input_csv)
+        Parser.applyOverrides(self._overrides, self._clade_overrides)
+        available = ['total'] + [f'clade{c+1}' for c in range(Parameters.NUM_CLADES)] + \
+                    [self.RESIDENCE_TIME]
+        self._metrics = list(metrics) if metrics else available[:-1]
+        for metric in self._metrics:
+            if metric not in available:
+                raise ValueError(f"Error in ReplicateController: unknown metric {metric}")
+
+        self._stats : dict[str, RunningStats] = {m: RunningStats() for m in self._metrics}
+        self._num_replicates : int = 0
+
+    ############################################################################
+    @staticmethod
+    def tCDF(t: float, dof: int) -> float:
+        ''' returns the cumulative distribution function at t of Student's t
+            distribution with (integer) dof degrees of freedom, exactly, from
+            the finite series in cos(theta), theta = atan(t / sqrt(dof))
+            (Abramowitz and Stegun 26.7.3 and 26.7.4)
+        '''
+        theta = math.atan(abs(t) / math.sqrt(dof))
+        cos2, term = math.cos(theta)**2, 1.0
+        if dof % 2 == 1:
+            series = 0.0
+            for k in range(3, dof + 1, 2):
+                series += term
+                term *= cos2 * (k - 1) / k
+            prob = 2 / math.pi * (theta + math.sin(theta) * math.cos(theta) * series)
+        else:
+            series = 0.0
+            for k in range(2, dof + 1, 2):
+                series += term
+                term *= cos2 * (k - 1) / k
+            prob = math.sin(theta) * series
+        return 0.5 + math.copysign(prob / 2, t)   # (prob: P(|T| < |t|))
+
+    ############################################################################
+    @staticmethod
+    def tQuantile(p: float, dof: int) -> float:
+        ''' returns the p quantile of Student's t distribution with (integer)
+            dof degrees of freedom: the Cornish-Fisher expansion about the
+            normal quantile, refined by Newton's method on the exact tCDF
+            (the expansion alone is far off for few degrees of freedom, e.g.,
+            about 9.7 instead of 12.71 for p = 0.975, dof = 1)
+        '''
+        if p < 0.5: return -ReplicateController.tQuantile(1 - p, dof)
+        z = statistics.NormalDist().inv_cdf(p)
+        t = z + (z**3 + z) / (4 * dof) + \
+            (5 * z**5 + 16 * z**3 + 3 * z) / (96 * dof**2) + \
+            (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * dof**3)
+        # density constant of the t distribution
+        log_c = math.lgamma((dof + 1) / 2) - math.lgamma(dof / 2) - \
+                0.5 * math.log(dof * math.pi)
+        for _ in range(50):
+            density = math.exp(log_c - (dof + 1) / 2 * math.log1p(t * t / dof))
+            step = (ReplicateController.tCDF(t, dof) - p) / density
+            t -= step
+            if abs(step) <= 1e-12 * abs(t): break
+        return t
+
+    ############################################################################
+    def getHalfWidth(self, metric: str) -> float:
+        ''' returns the current confidence-interval half-width of the mean of
+            the given metric (nan before two replicates) '''
+        stats = self._stats[metric]
+        n = stats.getCount()
+        if n < 2: return math.nan
+        t = self.tQuantile(0.5 + self._confidence / 2, n - 1)
+        return t * stats.getStdDev() / math.sqrt(n)
+
+    ############################################################################
+    def getRelativeHalfWidth(self, metric: str) -> float:
+        ''' returns the half-width relative to the magnitude of the mean (0 for
+            a metric that has been exactly 0 in every replicate) '''
+        mean, half_width = self._stats[metric].getMean(), self.getHalfWidth(metric)
+        if half_width == 0: return 0.0
+        return half_width / abs(mean) if mean != 0 else math.inf
+
+    ############################################################################
+    def isConverged(self) -> bool:
+        ''' returns True if every metric meets the target relative half-width '''
+        return self._num_replicates >= self._min_replicates and \
+               all([self.getRelativeHalfWidth(m) <= self._target for m in self._metrics])
+
+    ############################################################################
+    def run(self, pool: multiprocessing.pool.Pool = None) -> dict:
+        ''' runs batches of replicates until the target or the budget is met
+        Parameters:
+            pool: multiprocessing pool to use (default: a new pool of
+                worker processes, closed on return)
+        Returns:
+            dict with 'replicates' (number of replicates spent), 'converged'
+            (bool: whether the target was met), and 'metrics' (dict mapping
+            each metric name to a tuple of (mean, CI half-width, relative
+            half-width))
+        '''
+        own_pool = pool is None
+        if own_pool: pool = multiprocessing.Pool(self._workers)
+        try:
+            residence_time = self.RESIDENCE_TIME in self._metrics
+            while not self.isConverged() and self._num_replicates < self._max_replicates:
+                first = self._num_replicates
+                last  = min(first + self._batch_size, self._max_replicates)
+                tasks = [(self._input_csv, self._overrides, self._clade_overrides, \
+                          replicate, residence_time, self._use_cache, \
+                          ResultCache.directory) for replicate in range(first, last)]
+                for metrics in pool.map(runReplicate, tasks):
+                    for metric in self._metrics:
+                        self._stats[metric].add(metrics[metric])
+                self._num_replicates = last
+        finally:
+            if own_pool:
+                pool.close()
+                pool.join()
+        return self.getResult()
+
+    ############################################################################
+    def getResult(self) -> dict:
+        ''' returns the current results (see run) '''
+        return {'replicates': self._num_replicates, 'converged': self.isConverged(), \
+                'metrics': {m: (self._stats[m].getMean(), self.getHalfWidth(m), \
+                                self.getRelativeHalfWidth(m)) for m in self._metrics}}
+
+################################################################################
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "run replicates of one " + \
+        "or more configurations until confidence-interval targets are met")
+    parser.add_argument("input_csv", nargs = "+", \
+        help = "input CSV filename(s), one per configuration")
+    parser.add_argument("--metric", action = "append", default = [], dest = "metrics", \
+        help = "output metric to track: total, cladeN, or resTime (may be " + \
+        "repeated; default: total and all cladeN)")
+    parser.add_argument("--target", type = float, default = 0.05, \
+        help = "target relative CI half-width (default: 0.05)")
+    parser.add_argument("--confidence", type = float, default = 0.95, \
+        help = "confidence level (default: 0.95)")
+    parser.add_argument("--min-replicates", type = int, default = 5, \
+        help = "replicates before checking the target (default: 5)")
+    parser.add_argument("--max-replicates", type = int, default = 100, \
+        help = "maximum replicates per configuration (default: 100)")
+    parser.add_argument("--batch-size", type = int, default = None, \
+        help = "replicates per batch (default: " + \
+        f"{ReplicateController.DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--workers", type = int, default = None, \
+        help = "worker processes (default: number of CPUs)")
+    parser.add_argument("--set", action = "append", default = [], \
+        metavar = "NAME=VALUE", dest = "overrides", \
+        help = "override a simulation-level parameter (may be repeated)")
+    parser.add_argument("--set-clade", action = "append", default = [], \
+        metavar = "N:NAME=VALUE", dest = "clade_overrides", \
+        help = "override a parameter of clade number N (may be repeated)")
+    parser.add_argument("--cache", action = "store_true", \
+        help = "replicates use (and store results in) the result cache")
+    parser.add_argument("--cache-dir", default = ResultCache.DEFAULT_DIRECTORY, \
+        metavar = "DIR", help = "directory of the result cache")
+    args = parser.parse_args()
+
+    try:
+        overrides, clade_overrides = Parser.parseSettings(args.overrides, args.clade_overrides)
+    except ValueError as err:
+        parser.error(str(err))
+    ResultCache.directory = args.cache_dir
+
+    with multiprocessing.Pool(args.workers or os.cpu_count() or 1) as pool:
+        for input_csv in args.input_csv:
+            controller = ReplicateController(input_csv, overrides, clade_overrides, \
+                metrics = args.metrics, target = args.target, \
+                confidence = args.confidence, min_replicates = args.min_replicates, \
+                max_replicates = args.max_replicates, batch_size = args.batch_size, \
+                workers = args.workers, use_cache = args.cache)
+            result = controller.run(pool)
+            status = "target met" if result['converged'] else "budget reached"
+            print(f"{input_csv}: {result['replicates']} replicates ({status})")
+            for metric, (mean, half_width, relative) in result['metrics'].items():
+                print(f"    {metric:<10} {mean:>14.6g} +/- {half_width:<12.6g}" + \
+                      f" (relative {relative:.4g})")
+            sys.stdout.flush()
+
+##########################
+if __name__ == "__main__":
+    main()
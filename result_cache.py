@@ -0,0 +1,177 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import os.path
+
+import numpy
+
+from parameters import Parameters
+from clade import Clade
+
+################################################################################
+class ResultCache:
+    ''' Class to implement a local, content-addressed cache of simulation
+        results, so that a configuration that has already been simulated need
+        not be simulated again.  The key for a run is a SHA-256 hash of
+            - the fully resolved Parameters (excluding output-only ones, such
+              as filenames) and all Clade objects, canonicalized so that,
+              e.g., 365*4 and 1460 in the input CSV give the same key,
+            - the seed (INITIAL_SEED, part of the Parameters), and
+            - a code-version tag (hash of the simulation source files and the
+              numpy version, since the random streams come from numpy).
+        Each entry is a .npz file holding the population time series, the
+        exit-statistics summary (if any), and the early-stop reason (if any).
+        When the total size of the cache directory exceeds max_bytes, the least
+        recently used entries (by file modification time, updated on each hit)
+        are removed.
+    '''
+
+    # class-level constants
+    DEFAULT_DIRECTORY : str = ".abm_cache"
+    DEFAULT_MAX_BYTES : int = 1 << 30   # 1 GiB
+
+    # parameters that only affect which files are written (not the results)
+    OUTPUT_ONLY_PARAMETERS : tuple[str] = ('POPULATION_FILENAME', 'CSV_FILENAME', \
+        'SUMMARY_FILENAME', 'LOG_FILENAME', 'WRITE_CSV_INFO', 'WRITE_LOGGING_INFO', \
+        'WRITE_TELEMETRY_INFO', 'TELEMETRY_FILENAME', 'TELEMETRY_INTERVAL', \
+        'TELEMETRY_EVENTS', 'PRINT_PARAMETER_VALUES')
+
+    # class-level variables
+    directory : str = DEFAULT_DIRECTORY   # set via --cache-dir
+    max_bytes : int = DEFAULT_MAX_BYTES
+    _code_version : str = None
+
+    ############################################################################
+    @staticmethod
+    def _canonical(value: object) -> object:
+        ''' returns a JSON-serializable canonical form of a parameter value:
+            integers (and integral floats) exactly, as int str, so that, e.g.,
+            seeds above 2**53 stay distinct; other floats as float repr;
+            tuples as lists '''
+        if isinstance(value, (bool, numpy.bool_)): return bool(value)
+        if value is None: return value
+        if isinstance(value, (int, numpy.integer)): return str(int(value))
+        if isinstance(value, (float, numpy.floating)):
+            value = float(value)
+            return str(int(value)) if value.is_integer() else repr(value)
+        if isinstance(value, (tuple, list)) or hasattr(value, 'tolist'):
+            return [ResultCache._canonical(v) for v in value]
+        return str(value)
+
+    ############################################################################
+    @classmethod
+    def codeVersion(cls) -> str:
+        ''' class-level method returning the code-version tag: a hash of the
+            simulation's Python source files and of the numpy version '''
+        if cls._code_version is None:
+            sha = hashlib.sha256(numpy.__version__.encode())
+            source_dir = os.path.dirname(os.path.abspath(__file__))
+            for filename in sorted(glob.glob(os.path.join(source_dir, "*.py"))):
+                sha.update(os.path.basename(filename).encode())
+                with open(filename, "rb") as file: sha.update(file.read())
+            cls._code_version = sha.hexdigest()[:16]
+        return cls._code_version
+
+    ############################################################################
+    @classmethod
+    def configuration(cls) -> dict:
+        ''' class-level method returning the canonical configuration of the
+            current run (Parameters, Clades, and code version) as a dict '''
+        parameters = {}
+        for var in sorted(dir(Parameters)):
+            if var.startswith('__') or callable(getattr(Parameters, var)) or \
+               var in cls.OUTPUT_ONLY_PARAMETERS: continue
+            value = getattr(Parameters, var)
+            if var == 'INITIAL_PLACEMENT' and isinstance(value, str):
+                value = value.lower()
+                if value == 'random': value = 'randomize'
+            parameters[var] = cls._canonical(value)
+        clades = [{slot: cls._canonical(getattr(clade, slot)) for slot in Clade.__slots__} \
+                  for clade in Clade.clade_objects]
+        return {'parameters': parameters, 'clades': clades, 'code': cls.codeVersion()}
+
+    ############################################################################
+    @classmethod
+    def key(cls) -> str:
+        ''' class-level method returning the cache key (hex str) of the current
+            run's configuration '''
+        text = json.dumps(cls.configuration(), sort_keys = True, separators = (',', ':'))
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    ############################################################################
+    @classmethod
+    def _path(cls, key: str) -> str:
+        return os.path.join(cls.directory, f"{key}.npz")
+
+    ############################################################################
+    @classmethod
+    def load(cls, key: str) -> dict or None:
+        ''' class-level method to look up a cache entry
+        Parameters:
+            key: the cache key (see key())
+        Returns:
+            a dict with 'population' (2D int array), 'interval' (float),
+            'summary' (str, or None if not stored), 'stop_reason' (str, or
+            None if the run was not stopped early) and 'stop_time' (float or
+            None), or None on a cache miss
+        '''
+        path = cls._path(key)
+        try:
+            with numpy.load(path, allow_pickle = False) as entry:
+                result = {'population': entry['population'], \
+                          'interval':   float(entry['interval']), \
+                          'summary':    str(entry['summary']) if entry['has_summary'] else None, \
+                          'stop_reason': str(entry['stop_reason']) if entry['stopped'] else None, \
+                          'stop_time':  float(entry['stop_time']) if entry['stopped'] else None}
+        except (OSError, KeyError, ValueError):
+            return None   # missing, or unreadable (e.g., partially written)
+        os.utime(path)   # mark as recently used
+        return result
+
+    ############################################################################
+    @classmethod
+    def store(cls, key: str, population: numpy.ndarray, interval: float, \
+              summary: str = None, stop_reason: str = None, stop_time: float = None) -> None:
+        ''' class-level method to store the results of a run, then evict least
+            recently used entries if the cache has grown beyond max_bytes
+        Parameters:
+            key: the cache key (see key())
+            population: 2D array of the population time series
+            interval: interval between population samples (float)
+            summary: the exit-statistics summary text (or None)
+            stop_reason, stop_time: why and when the run was stopped early by a
+                stopping rule (or None)
+        '''
+        os.makedirs(cls.directory, exist_ok = True)
+        buffer = io.BytesIO()
+        numpy.savez_compressed(buffer, population = population, interval = interval, \
+            summary = summary or "", has_summary = summary is not None, \
+            stop_reason = stop_reason or "", stop_time = stop_time or 0.0, \
+            stopped = stop_reason is not None)
+        # write to a temporary file then rename, so that concurrent runs
+        # never see a partially written entry
+        path = cls._path(key)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as file: file.write(buffer.getvalue())
+        os.replace(temp, path)
+        cls.evict()
+
+    ############################################################################
+    @classmethod
+    def evict(cls) -> None:
+        ''' class-level method to remove least recently used entries until the
+            cache directory holds at most max_bytes '''
+        entries = []
+        for path in glob.glob(os.path.join(cls.directory, "*.npz")):
+            try:
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+            except OSError: pass   # removed by a concurrent run
+        total = sum([size for mtime, size, path in entries])
+        for mtime, size, path in sorted(entries):
+            if total <= cls.max_bytes: break
+            try:    os.remove(path)
+            except OSError: pass
+            total -= size
@@ -1,6 +1,6 @@
 import numpy.typing
 from enum import Enum
-from numpy.random import MT19937, Generator
+from numpy.random import MT19937, Generator, SeedSequence
 from parameters import *
 
 #############################################################################
@@ -61,14 +61,24 @@ class RNG:
             sufficiently far apart, giving us one stream per stochastic
             component (i.e., number of entries in the Stream enum).
 
+            Replicates of the same configuration (Parameters.REPLICATE > 0)
+            start from a seed derived from INITIAL_SEED and the replicate
+            number (a SeedSequence spawn key), giving statistically
+            independent sets of streams; replicate 0 uses INITIAL_SEED itself.
+
             See:
                 https://bit.ly/numpy_random_jumping
                 https://bit.ly/numpy_random_Generator
+                https://numpy.org/doc/stable/reference/random/parallel.html
         '''
         cls._streams = []
-        rng = MT19937(Parameters.INITIAL_SEED)  # Mersenne twister
+        spawn_key = (Parameters.REPLICATE,) if Parameters.REPLICATE > 0 else ()
+        rng = MT19937(SeedSequence(Parameters.INITIAL_SEED, spawn_key = spawn_key))
+        # stream i is the generator jumped i times; jumped(i) costs i jumps,
+        # so jump once from the previous stream instead
         for i in range(len(Stream)):
-            cls._streams.append(Generator(rng.jumped(i)))
+            cls._streams.append(Generator(rng))
+            if i < len(Stream) - 1: rng = rng.jumped()
         cls._initialized = True
 
     ############################################################################
@@ -133,20 +143,24 @@ class RNG:
     
     ############################################################################
     @classmethod
-    def exponential(cls, mu: float, which_stream: Stream) -> numpy.float64:
+    def exponential(cls, mu: float, which_stream: Stream, size: int = None) \
+            -> numpy.float64 or numpy.ndarray:
         ''' Class-level method to generate variates drawn from an exponential
             distribution with given mean mu.
         Parameters:
             mu: float representing the mean (scale), not rate (e.g., avt time
                 b/w arrivals rather arrivals per unit time)
             which_stream: named entry from Stream class
+            size: if given, the number of variates to generate at once -- the
+                same values, in order, as size separate calls would give
         Returns:
             a floating point value drawn from an exponential(mu) distribution
+            (or a numpy array of size of them)
         '''
         if not isinstance(which_stream, Stream):
             raise TypeError(f"in RNG.exponential, which_stream must be of type Stream, not {type(which_stream)}")
         if not cls._initialized: cls.initializeStreams()
-        return cls._streams[which_stream.value].exponential(mu)  # expects mean, not rate
+        return cls._streams[which_stream.value].exponential(mu, size)  # expects mean, not rate
 
     ############################################################################
     @classmethod
@@ -206,6 +220,25 @@ class RNG:
             value = cls.normal(mean, sd, which_stream)
         return value
 
+    @classmethod
+    def fuzzWithSD(cls, mean: float, sd: float, which_stream: Stream) -> numpy.float64:
+        ''' class-level method to fuzz a value as in fuzz, given the standard
+            deviation (mean * fuzz_pct) / 2 already computed (e.g., once per
+            clade -- see CladeConstants)
+        Parameters:
+            mean: floating point value for the normal distribution's mean parameter
+            sd: floating point value for the normal's standard deviation
+            which_stream: named entry from Stream class
+        Returns:
+            floating point value of appropriately fuzzed normal
+        '''
+        if not isinstance(which_stream, Stream):
+            raise TypeError(f"in RNG.fuzzWithSD, which_stream must be of type Stream, not {type(which_stream)}")
+        value = -1
+        while value < 0:
+            value = cls.normal(mean, sd, which_stream)
+        return value
+
     #############################################################################
     # NEW VERSION OF divfuzz AFTER SPRING 2016 MEETING
     @classmethod
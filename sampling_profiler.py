@@ -0,0 +1,146 @@
+import json
+import os.path
+import signal
+
+################################################################################
+class SamplingProfiler:
+    ''' Class to implement a low-overhead statistical profiler (see --profile
+        in simulation.py) using only the standard library: a CPU-time interval
+        timer (setitimer with ITIMER_PROF) raises SIGPROF every interval
+        seconds of CPU time, and the signal handler records the call stack of
+        the main thread, so that production-sized runs can be profiled without
+        the distortion of a deterministic profiler such as cProfile.  (Work in
+        other threads, e.g., the OutputWriter thread, is not sampled.)
+
+        The samples are written either as a speedscope JSON file (for a .json
+        filename; open at https://www.speedscope.app) or as collapsed stacks
+        ("frame;frame;frame count" lines, for flamegraph.pl and similar
+        tools).  Each sample is also attributed to one model component --
+        Symbiont, Sponge, RNG, EventList, or I/O -- by the innermost frame in
+        one of their modules (e.g., numpy code called from the RNG counts as
+        RNG), and a summary by component is printed by printSummary.
+    '''
+
+    # model component, by source file (module) of a frame
+    COMPONENTS : dict[str, str] = { \
+        'symbiont.py': 'Symbiont', 'clade.py': 'Symbiont', \
+        'sponge.py': 'Sponge', \
+        'rng_mt19937.py': 'RNG', \
+        'event_list.py': 'EventList', 'heapq.py': 'EventList', \
+        'output_writer.py': 'I/O', 'compressed_io.py': 'I/O', 'event_trace.py': 'I/O', \
+        'population_series.py': 'I/O', 'gzip.py': 'I/O', 'lzma.py': 'I/O', \
+        '_compression.py': 'I/O', 'csv.py': 'I/O', 'threading.py': 'I/O', \
+        'queue.py': 'I/O'}
+    OTHER : str = 'other'
+
+    # class-level variables
+    _interval : float                = 0.001
+    _samples  : dict[tuple, int]     = {}     # stack (code objects) -> count
+    _previous : object               = None   # previous SIGPROF handler
+
+    ############################################################################
+    @classmethod
+    def start(cls, interval: float = 0.001) -> None:
+        ''' class-level method to start sampling
+        Parameters:
+            interval: seconds of CPU time between samples
+        Raises:
+            ValueError, if interval timers are not available (e.g., Windows)
+        '''
+        if not hasattr(signal, 'setitimer') or not hasattr(signal, 'SIGPROF'):
+            raise ValueError("Error in SamplingProfiler: interval timers " + \
+                             "(setitimer/SIGPROF) are not available on this platform")
+        cls._interval = interval
+        cls._samples  = {}
+        cls._previous = signal.signal(signal.SIGPROF, cls._sample)
+        signal.setitimer(signal.ITIMER_PROF, interval, interval)
+
+    ############################################################################
+    @classmethod
+    def stop(cls) -> None:
+        ''' class-level method to stop sampling '''
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        if cls._previous is not None:
+            signal.signal(signal.SIGPROF, cls._previous)
+            cls._previous = None
+
+    ############################################################################
+    @classmethod
+    def _sample(cls, signum: int, frame: 'frame') -> None:
+        ''' SIGPROF handler: records the stack (innermost frame first) '''
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        key = tuple(stack)
+        cls._samples[key] = cls._samples.get(key, 0) + 1
+
+    ############################################################################
+    @staticmethod
+    def frameName(code: 'code') -> str:
+        ''' returns the display name of a frame: qualified name and module '''
+        name = getattr(code, 'co_qualname', code.co_name)
+        return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    @classmethod
+    def component(cls, stack: tuple) -> str:
+        ''' returns the model component of a stack (innermost frame first) '''
+        for code in stack:
+            component = cls.COMPONENTS.get(os.path.basename(code.co_filename))
+            if component is not None: return component
+        return cls.OTHER
+
+    ############################################################################
+    @classmethod
+    def getNumSamples(cls) -> int:
+        return sum(cls._samples.values())
+
+    @classmethod
+    def getComponentTotals(cls) -> dict[str, int]:
+        ''' class-level method returning the number of samples per component '''
+        totals = {}
+        for stack, count in cls._samples.items():
+            component = cls.component(stack)
+            totals[component] = totals.get(component, 0) + count
+        return dict(sorted(totals.items(), key = lambda item: -item[1]))
+
+    ############################################################################
+    @classmethod
+    def write(cls, filename: str, name: str = "simulation") -> None:
+        ''' class-level method to write the samples: speedscope JSON if the
+            filename ends in .json, otherwise collapsed stacks; each stack's
+            root frame is its component, e.g., "[RNG]" '''
+        stacks = [(["[" + cls.component(stack) + "]"] + \
+                   [cls.frameName(code) for code in reversed(stack)], count) \
+                  for stack, count in cls._samples.items()]
+        if filename.endswith(".json"):
+            frames, index = [], {}
+            samples, weights = [], []
+            for names, count in stacks:
+                for frame_name in names:
+                    if frame_name not in index:
+                        index[frame_name] = len(frames)
+                        frames.append({'name': frame_name})
+                samples.append([index[frame_name] for frame_name in names])
+                weights.append(count * cls._interval)
+            profile = {'$schema': 'https://www.speedscope.app/file-format-schema.json', \
+                'shared': {'frames': frames}, 'name': name, 'activeProfileIndex': 0, \
+                'exporter': 'sampling_profiler.py', \
+                'profiles': [{'type': 'sampled', 'name': name, 'unit': 'seconds', \
+                    'startValue': 0, 'endValue': sum(weights), \
+                    'samples': samples, 'weights': weights}]}
+            with open(filename, "w") as file:
+                json.dump(profile, file)
+        else:
+            with open(filename, "w") as file:
+                for names, count in sorted(stacks):
+                    file.write(';'.join(names) + f" {count}\n")
+
+    ############################################################################
+    @classmethod
+    def printSummary(cls) -> None:
+        ''' class-level method to print the share of samples per component '''
+        total = cls.getNumSamples()
+        print(f"profile: {total} samples ({total * cls._interval:.2f} s CPU) by component:")
+        for component, count in cls.getComponentTotals().items():
+            print(f"    {component:<10}{count:>8}{100 * count / max(total, 1):>8.1f}%")
@@ -1,8 +1,12 @@
-import logging
-import pdb
-from progress.bar import Bar  # https://pypi.python.org/pypi/progress
+import argparse
+from bisect import bisect_left
+import math
 import sys # for command-line args
+import os
 import os.path
+import time
+
+import numpy
 
 # now call the parser to parse the file
 from parser import Parser
@@ -10,8 +14,20 @@ from rng_mt19937 import *
 from parameters import *
 
 from event_list import EventList
+from arrival_stream import ArrivalStream
 from sponge import Sponge
 from symbiont import *
+from output_writer import OutputWriter, Channel, MemorySink
+from compressed_io import CompressedIO
+from event_trace import EventTrace, TraceRole
+from population_series import PopulationSeries
+from exit_statistics import ExitStatistics
+from result_cache import ResultCache
+from stopping_rules import StoppingRules
+from telemetry import Telemetry
+from event_profiler import EventProfiler
+from sampling_profiler import SamplingProfiler
+from memory_report import MemoryReport
 
 ################################################################################
 class Placement(Enum):
@@ -26,121 +42,535 @@ class Simulation:
         and containing the event-driven loop driving the simulation
     '''
 
+    # class-level constants
+    POPULATION_CHUNK_ROWS         : int                 = 1024  # rows per population write
+    PROGRESS_INTERVAL             : float               = 0.25  # seconds between --progress-fd reports
+    SINKS                         : tuple[str]          = ('file', 'memory', 'null')
+    FAST_FORWARD_MODES            : tuple[str]          = ('off', 'exact', 'memoryless')
+
     # class-level variables
     _current_time                 : float               = None
     _show_progress                : bool                = None
-    _progress_bar                 : Bar                 = None
+    _progress_fd                  : int                 = None   # see --progress-fd
+    _progress_reported            : float               = 0.0    # wall time of last report
+    _use_cache                    : bool                = False
+    _progress_bar                 : 'progress.bar.Bar'  = None
     _input_cvs_fname              : str                 = None
     _current_time                 : float               = None
-    _current_day                  : int                 = None
+    _current_sample               : int                 = None
     _end_time                     : float               = None
     _num_symbionts                : int                 = None
     _num_symbionts_per_clade      : list[int]           = None
-    _prev_num_symbionts           : int                 = None
-    _prev_num_symbionts_per_clade : list[int]           = None
-    _population_file              : '_io.TextIOWrapper' = None
+    _population_series            : PopulationSeries    = None
+    _check_stopping               : bool                = False
+    _stop_reason                  : str                 = None
+    _stop_time                    : float               = None
+    _summary                      : str                 = None
+    _sink                         : str                 = 'file'
+    _exit_records                 : MemorySink          = None
     _num_rows                     : int                 = None
     _num_cols                     : int                 = None
     _sponge                       : Sponge              = None
     _event_list                   : EventList           = None
+    _next_event                   : Event               = None   # not yet processed
+    _arrivals                     : ArrivalStream       = None   # arrivals from the pool
+    _fast_forward                 : str                 = 'off'  # see ARRIVAL_FAST_FORWARD
+    _time_reached                 : float               = 0.0    # all events before it processed
+    _finished                     : bool                = False  # stopped (see isDone)
+    _handlers                     : dict                = None   # EventType -> handler
+    _trace                        : 'callable'          = None
+    _telemetry                    : bool                = False  # see telemetry.py
+    _profile_events               : bool                = False  # see event_profiler.py
+    _memory_report                : str                 = None   # see memory_report.py
+    _memory_interval              : float               = 10.0
 
     ########################
     @classmethod
     def usage(cls, msg: str = None) -> None:
         ''' method to print usage and exit '''
         if msg is not None: print(f"ERROR: {msg}")
-        print(f"python {sys.argv[0]} [input CSV filename (default: 'input.csv')] [show progress (default: True)]")
+        cls._argumentParser().print_help()
         sys.exit(1)
 
+    ########################
+    @classmethod
+    def _argumentParser(cls) -> argparse.ArgumentParser:
+        ''' method to create the parser for the command-line arguments '''
+        parser = argparse.ArgumentParser(prog = f"python {sys.argv[0]}")
+        parser.add_argument("input_csv", nargs = "?", default = "input.csv", \
+            help = "input CSV filename (default: 'input.csv')")
+        parser.add_argument("show_progress", nargs = "?", default = "True", \
+            help = "show progress (default: True)")
+        parser.add_argument("--compress-level", type = int, default = None, \
+            metavar = "N", help = "compression level for output files whose " + \
+            "names end in .gz, .xz, .zst or .zstd (default: a fast level " + \
+            "per format -- see compressed_io.py)")
+        parser.add_argument("--set", action = "append", default = [], \
+            metavar = "NAME=VALUE", dest = "overrides", help = "override a " + \
+            "simulation-level parameter from the input CSV (may be repeated)")
+        parser.add_argument("--set-clade", action = "append", default = [], \
+            metavar = "N:NAME=VALUE", dest = "clade_overrides", help = "override " + \
+            "a parameter of clade number N from the input CSV (may be repeated)")
+        parser.add_argument("--progress-fd", type = int, default = None, \
+            metavar = "FD", help = "write the simulated time reached, as text " + \
+            "lines, to file descriptor FD (at most a few times per second; " + \
+            "used by orchestrator.py)")
+        parser.add_argument("--profile-events", action = "store_true", help = \
+            "time each event handler (by event type and division outcome) and " + \
+            "report latency statistics at the end (see event_profiler.py)")
+        parser.add_argument("--profile", default = None, metavar = "FILE", help = \
+            "run under a sampling profiler, writing the profile to FILE: " + \
+            "speedscope JSON if FILE ends in .json, else collapsed stacks for " + \
+            "flame graphs (see sampling_profiler.py)")
+        parser.add_argument("--profile-interval", type = float, default = 1.0, \
+            metavar = "MS", help = "CPU milliseconds between profile samples " + \
+            "(default: 1)")
+        parser.add_argument("--memory-report", default = None, metavar = "FILE", \
+            help = "trace memory allocations, writing the footprint (by type: " + \
+            "symbionts, their history lists, events, cells) to the CSV file " + \
+            "FILE every --memory-interval days, and report the top allocation " + \
+            "sites at the end (slow; see memory_report.py)")
+        parser.add_argument("--memory-interval", type = float, default = 10.0, \
+            metavar = "DAYS", help = "simulated days between memory report " + \
+            "rows (default: 10)")
+        parser.add_argument("--cache", action = "store_true", help = "use (and " + \
+            "store results in) the result cache: a configuration already " + \
+            "simulated is not simulated again (see result_cache.py; default: " + \
+            "always simulate)")
+        parser.add_argument("--cache-dir", default = ResultCache.DEFAULT_DIRECTORY, \
+            metavar = "DIR", help = "directory of the result cache (default: " + \
+            f"'{ResultCache.DEFAULT_DIRECTORY}')")
+        return parser
+
+    ########################
+    @classmethod
+    def parseCommandLine(cls, argv: list[str] = None) -> argparse.Namespace:
+        ''' method to parse the command-line arguments, setting the
+            corresponding class-level (and CompressedIO) variables
+        Parameters:
+            argv: list of command-line arguments (default: sys.argv[1:])
+        Returns:
+            the argparse.Namespace of parsed arguments, in which overrides is
+            a dict {NAME: VALUE} and clade_overrides a dict {N: {NAME: VALUE}}
+            (VALUEs as str -- see Parser.applyOverrides)
+        '''
+        args = cls._argumentParser().parse_args(argv)
+
+        try:
+            args.overrides, args.clade_overrides = \
+                Parser.parseSettings(args.overrides, args.clade_overrides)
+        except ValueError as err:
+            cls.usage(str(err))
+
+        cls._input_csv_fname = args.input_csv
+        if not os.path.exists(cls._input_csv_fname):
+            cls.usage(f"file not found: {cls._input_csv_fname}")
+
+        # any of ["False", "false", "FALSE", "0"] turns off the progress bar
+        cls._show_progress = args.show_progress.lower() not in ("false", "0")
+        cls._progress_fd   = args.progress_fd
+        cls._profile_events = args.profile_events
+        cls._memory_report   = args.memory_report
+        cls._memory_interval = args.memory_interval
+        if cls._memory_interval <= 0: cls.usage("--memory-interval must be positive")
+
+        CompressedIO.compress_level = args.compress_level
+        cls._use_cache = args.cache
+        ResultCache.directory = args.cache_dir
+        return args
+
     ##################################
     @classmethod
-    def writePopulation(cls, time: float) -> None:
-        ''' write the population time series as the simulation executes 
+    def writePopulation(cls, time: float) -> bool:
+        ''' record the population time series as the simulation executes, one
+            sample every POPULATION_INTERVAL days (see population_series.py);
+            recorded samples are handed to the OutputWriter in chunks, and
+            the stopping rules (if any) are checked on each new sample
         Parameters:
             time: floating-point time that population is being written
+        Returns:
+            True if a stopping rule says the simulation should stop (see
+            StoppingRules), in which case no later samples are recorded
         '''
-        # first, check to see if days were possibly skipped:
-        if int(time) > cls._current_day:
-            while cls._current_day < int(time):
+        series = cls._population_series
+        sample = series.sampleIndex(time)
+
+        # first, check to see if samples were possibly skipped:
+        if sample > cls._current_sample:
+            while cls._current_sample < sample:
                 if cls._show_progress: cls._progress_bar.next()
-                cls._population_file.write(f"{cls._current_day}\t{cls._prev_num_symbionts}")
-                for i in range(Parameters.NUM_CLADES):
-                    cls._population_file.write(f"\t{cls._prev_num_symbionts_per_clade[i]}")
-                cls._population_file.write('\n')
-                cls._current_day += 1
-
-        # then move to the current day
-        if int(time) == cls._current_day:
+                series.repeatPrevious(cls._current_sample)
+                cls._current_sample += 1
+                if cls._check_stopping and cls._checkStoppingRules(): return True
+
+        # then move to the current sample
+        if sample == cls._current_sample:
             if cls._show_progress: cls._progress_bar.next()
-            cls._population_file.write(f"{cls._current_day}\t{cls._num_symbionts}")
-            for i in range(Parameters.NUM_CLADES):
-                cls._population_file.write(f"\t{cls._num_symbionts_per_clade[i]}")
-            cls._population_file.write('\n')
-            cls._current_day += 1
-            cls._prev_num_symbionts = cls._num_symbionts
-            for i in range(Parameters.NUM_CLADES):
-                cls._prev_num_symbionts_per_clade[i] = cls._num_symbionts_per_clade[i]
+            series.record(cls._current_sample, cls._num_symbionts, cls._num_symbionts_per_clade)
+            cls._current_sample += 1
+            if cls._progress_fd is not None: cls._reportProgress(time)
+            if cls._check_stopping and cls._checkStoppingRules(): return True
 
-    ################################################################################
+        if series.numPending() >= cls.POPULATION_CHUNK_ROWS:
+            cls._flushPopulation()
+        return False
+
+    ##################################
+    @classmethod
+    def _reportProgress(cls, time_reached: float, force: bool = False) -> None:
+        ''' writes the simulated time reached to the --progress-fd descriptor,
+            at most every PROGRESS_INTERVAL seconds (wall time) unless forced '''
+        now = time.monotonic()
+        if not force and now - cls._progress_reported < cls.PROGRESS_INTERVAL: return
+        cls._progress_reported = now
+        try:
+            os.write(cls._progress_fd, f"{time_reached}\n".encode())
+        except OSError:
+            cls._progress_fd = None   # the reader went away; keep simulating
+
+    ##################################
+    @classmethod
+    def _checkStoppingRules(cls) -> bool:
+        ''' checks the stopping rules on the most recently recorded sample,
+            recording the stop reason and time if one is satisfied '''
+        series = cls._population_series
+        sample = cls._current_sample - 1
+        counts = series.getCounts()[sample].tolist()
+        time   = sample * series.getInterval()
+        reason = StoppingRules.check(time, counts[0], counts[1:], Symbiont.getArrivalCounts())
+        if reason is None: return False
+        cls._stop_reason, cls._stop_time = reason, time
+        return True
+
+    ##################################
+    @classmethod
+    def _flushPopulation(cls) -> None:
+        ''' hands any not-yet-written population samples to the OutputWriter '''
+        series = cls._population_series
+        if series.numPending() > 0 and OutputWriter.isOpen(Channel.POPULATION):
+            first, rows = series.takePendingRows()
+            OutputWriter.put(Channel.POPULATION, (first, series.getInterval(), rows))
+
+    ##################################
+    @classmethod
+    def getStopReason(cls) -> tuple[str, float] or None:
+        ''' class-level method returning (reason, time) if the most recent run
+            was stopped early by one of the stopping rules, or None if it ran
+            to MAX_SIMULATED_TIME '''
+        if cls._stop_reason is None: return None
+        return (cls._stop_reason, cls._stop_time)
+
+    ##################################
+    @classmethod
+    def _reportStop(cls) -> None:
+        ''' records the reason and time of an early stop in the outputs '''
+        if cls._stop_reason is None: return
+        print(f"Stopped at t={cls._stop_time}: {cls._stop_reason}")
+        ExitStatistics.addSummaryLine("stopReason", cls._stop_reason)
+        ExitStatistics.addSummaryLine("stopTime", cls._stop_time)
+
+    ##################################
+    @classmethod
+    def getPopulationSeries(cls) -> 'numpy.ndarray':
+        ''' class-level method to return the in-memory population time series of
+            the most recent (or current) run, without touching disk
+        Returns:
+            2D numpy array with one row per sample (every POPULATION_INTERVAL
+            days, starting at t=0); column 0 is the total number of symbionts
+            and column c+1 the number of symbionts of clade c
+        '''
+        return cls._population_series.getCounts()
+
+    ##################################
+    @classmethod
+    def getSummary(cls) -> str or None:
+        ''' class-level method to return the exit-statistics summary of the
+            most recent run (the contents of SUMMARY_FILENAME, see
+            ExitStatistics.formatSummary), or None if WRITE_SUMMARY_INFO is
+            False; an empty SUMMARY_FILENAME keeps the summary in memory only
+        '''
+        return cls._summary
+
+    ##################################
+    @classmethod
+    def getExitRecords(cls) -> list[tuple] or None:
+        ''' class-level method to return the per-symbiont records (one tuple
+            per exited or still-resident symbiont, see Symbiont.csvOutputOnExit)
+            of the most recent run with the 'memory' sink and WRITE_CSV_INFO,
+            or None otherwise
+        '''
+        if cls._exit_records is None: return None
+        return cls._exit_records.getRecords()
+
+    ##################################
     @classmethod
-    def run(cls) -> None:
-        ''' class-level method to implement the main simulation code / loop '''
+    def getSponge(cls) -> Sponge:
+        ''' class-level method to return the sponge (grid of host cells) of
+            the most recent run, in its state at the end of the run (None if
+            the run's results came from the result cache) '''
+        return cls._sponge
 
-        # look for -h or --help or similar
-        try:    need_help = "-h" in sys.argv[1]
-        except: pass
+    ##################################
+    @classmethod
+    def _useCachedResult(cls, cached: dict) -> None:
+        ''' class-level method to produce the outputs of a run from a result
+            cache entry (see ResultCache.load) instead of simulating
+        '''
+        cls._population_series = PopulationSeries(Parameters.MAX_SIMULATED_TIME, \
+            Parameters.NUM_CLADES, Parameters.POPULATION_INTERVAL)
+        cls._population_series.recordAll(cached['population'])
+        cls._sponge = None   # (the final grid state is not cached)
+        cls._stop_reason, cls._stop_time = cached['stop_reason'], cached['stop_time']
+        if cls._stop_reason is not None:
+            print(f"Stopped at t={cls._stop_time}: {cls._stop_reason}")
+        write_files = cls._sink == 'file'
+        if Parameters.POPULATION_FILENAME != "" and write_files:
+            with CompressedIO.openForWriting(Parameters.POPULATION_FILENAME) as file:
+                file.write(PopulationSeries.formatRows( \
+                    (0, cached['interval'], cached['population'])))
+        cls._summary = cached['summary'] if Parameters.WRITE_SUMMARY_INFO else None
+        if cls._summary is not None and Parameters.SUMMARY_FILENAME != "" and write_files:
+            ExitStatistics.writeSummary(Parameters.SUMMARY_FILENAME, cls._summary)
+        # (always noted: the outputs are reproduced, not simulated)
+        print(f"(using cached result from {ResultCache.directory}; the final " + \
+              "sponge state is not available)")
+        if cls._progress_fd is not None:
+            cls._reportProgress(cls._stop_time if cls._stop_reason is not None \
+                                else Parameters.MAX_SIMULATED_TIME, force = True)
+
+    ################################################################################
+    @classmethod
+    def run(cls, input_csv_fname: str = None, \
+            overrides: dict[str, object] = None, \
+            clade_overrides: dict[int, dict[str, object]] = None, \
+            show_progress: bool = False, use_cache: bool = False, \
+            config: dict = None, sink: str = 'file', profile_events: bool = False, \
+            memory_report: str = None, memory_interval: float = 10.0) -> None:
+        ''' class-level method to implement the main simulation code: sets up
+            the run (see start) and runs it to MAX_SIMULATED_TIME
+        Parameters:
+            input_csv_fname: input CSV filename; if None (default) and no
+                config is given, the input CSV, progress bar, and overrides
+                come from the command line
+            overrides: dict of simulation-level parameter values to use in
+                place of those in the input CSV, e.g., {'INITIAL_SEED': 42}
+            clade_overrides: dict mapping clade number (from 1) to a dict of
+                clade-level parameter values, e.g., {2: {'G0_LENGTH': 10.0}}
+            show_progress: whether to show the progress bar (default: False)
+            use_cache: whether to use (and store results in) the result cache
+                in ResultCache.directory (default: False)
+            (see Parser.applyOverrides)
+            config: configuration to use instead of an input CSV file (see
+                Parser.readConfig)
+            sink: where the outputs go: 'file' (default) writes the output
+                files named in the configuration; 'memory' writes no files,
+                keeping the per-symbiont records (if WRITE_CSV_INFO) in memory
+                -- see getExitRecords; 'null' writes and keeps nothing beyond
+                the population time series and summary (see
+                getPopulationSeries and getSummary); per-event tracing needs
+                the 'file' sink
+            profile_events: whether to time the event handlers and print a
+                latency report at the end (see event_profiler.py)
+            memory_report: name of a CSV file to which to write a memory
+                report every memory_interval days, printing the top
+                allocation sites at the end (see memory_report.py); None
+                (default) for none
+        Raises:
+            ValueError, for an invalid configuration, override, or sink (if
+                not run from the command line)
+        '''
+        from_command_line = input_csv_fname is None and config is None
+        if from_command_line:
+            # input CSV filename, progress bar, and --options (see -h or --help)
+            args = cls.parseCommandLine()
+            overrides, clade_overrides = args.overrides, args.clade_overrides
+            if args.profile is not None:
+                # the whole run (set-up included) is sampled, and is always
+                # simulated rather than taken from the result cache
+                cls._use_cache = False
+                try:
+                    SamplingProfiler.start(args.profile_interval / 1000)
+                except ValueError as err:
+                    cls.usage(str(err))
         else:
-            if need_help: cls.usage()
+            cls._input_csv_fname = input_csv_fname
+            cls._show_progress   = show_progress
+            cls._use_cache       = use_cache
+            cls._progress_fd     = None
+            cls._profile_events  = profile_events
+            cls._memory_report   = memory_report
+            cls._memory_interval = memory_interval
+        cls._configure(config, overrides, clade_overrides, \
+                       sink if not from_command_line else 'file', from_command_line)
 
-        try:    cls._input_csv_fname = sys.argv[1]
-        except: cls._input_csv_fname = "input.csv"
-        if not os.path.exists(cls._input_csv_fname):
-            cls.usage(f"file not found: {cls._input_csv_fname}")
-    
-        # use .capitalize then eval then bool, which will work for any of 
-        #   ["True", "False", "true", "false", "TRUE", "FALSE", "1", "0"]
-        try:    cls._show_progress = bool(eval(sys.argv[2].capitalize()))
-        except: cls._show_progress = True
-    
-        ################################################################
-        # parse the simulation parameters provided in the input CSV file
-        Parser.parseCSVInput(cls._input_csv_fname)
+        # a configuration whose results are already in the result cache is
+        # not simulated again; per-symbiont CSV, trace, and telemetry output
+        # (and event profiling or a memory report) need an actual simulation,
+        # so the cache is bypassed when any is requested
+        cache_key = None
+        if cls._use_cache and not Parameters.WRITE_CSV_INFO and \
+           not Parameters.WRITE_LOGGING_INFO and not Parameters.WRITE_TELEMETRY_INFO and \
+           not cls._profile_events and cls._memory_report is None:
+            cache_key = ResultCache.key()
+            cached = ResultCache.load(cache_key)
+            if cached is not None:
+                cls._useCachedResult(cached)
+                return
+
+        cls._initialize()
+        cls.runUntil(Parameters.MAX_SIMULATED_TIME)
+        cls.finish()
+
+        if from_command_line and args.profile is not None:
+            SamplingProfiler.stop()
+            SamplingProfiler.write(args.profile, os.path.basename(cls._input_csv_fname))
+            SamplingProfiler.printSummary()
+
+        if cache_key is not None:
+            try:
+                ResultCache.store(cache_key, cls._population_series.getCounts(), \
+                                  Parameters.POPULATION_INTERVAL, cls._summary, \
+                                  cls._stop_reason, cls._stop_time)
+            except OSError as err:
+                print(f"WARNING: could not store result in cache: {err}")
+    ## end of run()
+
+    ################################################################################
+    @classmethod
+    def start(cls, input_csv_fname: str = None, \
+              overrides: dict[str, object] = None, \
+              clade_overrides: dict[int, dict[str, object]] = None, \
+              config: dict = None, sink: str = 'file', profile_events: bool = False, \
+              memory_report: str = None, memory_interval: float = 10.0) -> None:
+        ''' class-level method to set up a run to be driven step by step (see
+            step, runUntil, and iterDays) rather than all at once by run; call
+            finish at the end.  E.g.,
+                Simulation.start('input.csv', sink = 'memory')
+                for day, counts in Simulation.iterDays():
+                    ...
+                Simulation.finish()
+            Stepped runs do not use the result cache.
+        Parameters:
+            as for run (input_csv_fname or config must be given)
+        Raises:
+            ValueError, for an invalid configuration, override, or sink
+        '''
+        if input_csv_fname is None and config is None:
+            raise ValueError("Error in Simulation: no input CSV or configuration given")
+        cls._input_csv_fname = input_csv_fname
+        cls._show_progress   = False
+        cls._progress_fd     = None
+        cls._profile_events  = profile_events
+        cls._memory_report   = memory_report
+        cls._memory_interval = memory_interval
+        cls._configure(config, overrides, clade_overrides, sink, False)
+        cls._initialize()
+
+    ################################################################################
+    @classmethod
+    def _configure(cls, config: dict, overrides: dict[str, object], \
+                   clade_overrides: dict[int, dict[str, object]], sink: str, \
+                   from_command_line: bool) -> None:
+        ''' parses the simulation parameters provided in the input CSV file (or
+            given as a configuration), then applies any overrides on top '''
+        if sink not in cls.SINKS:
+            raise ValueError(f"Error in Simulation: unknown sink {sink}")
+        cls._sink         = sink
+        cls._exit_records = None
+        cls._stop_reason, cls._stop_time = None, None
+
+        if config is None: config = Parser.readConfig(cls._input_csv_fname)
+        Parser.applyConfig(config)
+        try:
+            Parser.applyOverrides(overrides, clade_overrides)
+        except ValueError as err:
+            if not from_command_line: raise
+            cls.usage(str(err))
+        Parser.printParameterValues()
         Symbiont.computeCumulativeCladeProportions()
-        ################################################################
+        Symbiont.initializeRun()
+
+    ################################################################################
+    @classmethod
+    def _initialize(cls) -> None:
+        ''' sets up the outputs, the sponge, the initial symbionts, and the
+            event list, ready for the main simulation loop (see runUntil) '''
+        write_files = cls._sink == 'file'
+
+        # optional memory report (see memory_report.py): allocations are
+        # traced from here on, so that the sponge and initial symbionts count
+        if cls._memory_report is not None:
+            MemoryReport.open(cls._memory_report, cls._memory_interval, \
+                clock = lambda: cls._current_time, num_live = lambda: cls._num_symbionts)
 
         RNG.initializeStreams()
-    
+
+        # the population time series is accumulated in memory, sampled every
+        # POPULATION_INTERVAL days (default: daily)
+        cls._population_series = PopulationSeries(Parameters.MAX_SIMULATED_TIME, \
+            Parameters.NUM_CLADES, Parameters.POPULATION_INTERVAL)
+
         if cls._show_progress:
-            cls._progress_bar = Bar("Progress:", max = Parameters.MAX_SIMULATED_TIME)
-    
-        if Parameters.WRITE_LOGGING_INFO:
-            logging.basicConfig(format = '%(message)s', level = logging.DEBUG,\
-                filename = Parameters.LOG_FILENAME, filemode = 'w')
-    
-        if Parameters.WRITE_CSV_INFO:
+            # imported only when needed, to keep startup fast for batch runs
+            from progress.bar import Bar  # https://pypi.python.org/pypi/progress
+            cls._progress_bar = Bar("Progress:", \
+                max = cls._population_series.getNumSamples() - 1)
+
+        # all output files are written through the background OutputWriter,
+        # so that formatting and disk latency stay out of the event loop
+        OutputWriter.start()
+
+        # per-event tracing is selected once, here: when disabled, trace is
+        # None and the event handlers evaluate nothing per event; when
+        # enabled, binary records are written to LOG_FILENAME (render them as
+        # text using event_trace.py)
+        trace = None
+        if Parameters.WRITE_LOGGING_INFO and write_files:
+            EventTrace.open(Parameters.LOG_FILENAME)
+            trace = EventTrace.record
+        cls._trace = trace
+
+        if Parameters.WRITE_CSV_INFO and write_files:
             Symbiont.openCSVFile(Parameters.CSV_FILENAME)
-    
+        elif Parameters.WRITE_CSV_INFO and cls._sink == 'memory':
+            cls._exit_records = MemorySink()
+            Symbiont.openCSVSink(cls._exit_records)
+
+        # per-clade exit statistics, aggregated as symbionts exit (a compact
+        # alternative to the per-symbiont CSV file)
+        if Parameters.WRITE_SUMMARY_INFO:
+            Symbiont.enableExitSummary(Parameters.SUMMARY_WINDOW, \
+                                       Parameters.MAX_SIMULATED_TIME)
+
         cls._num_symbionts : int = 0
         cls._num_symbionts_per_clade : list[int] = [0] * Parameters.NUM_CLADES
-    
-        # some setup for writing population time series
-        cls._current_day : int = 1
-        cls._prev_num_symbionts : int = 0
-        cls._prev_num_symbionts_per_clade : list[int] = []
-    
-        cls._population_file = open(Parameters.POPULATION_FILENAME, "w")
-    
+
+        # optional early termination (see stopping_rules.py), checked as each
+        # population sample is recorded
+        cls._check_stopping = StoppingRules.initialize(Parameters.NUM_CLADES, \
+            Parameters.NUM_ROWS * Parameters.NUM_COLS)
+
+        # some setup for writing population time series (an empty filename
+        # keeps the time series in memory only -- see getPopulationSeries)
+        cls._current_sample : int = 1
+
+        if Parameters.POPULATION_FILENAME != "" and write_files:
+            OutputWriter.openChannel(Channel.POPULATION, Parameters.POPULATION_FILENAME, \
+                PopulationSeries.formatRows)
+
         # create the sponge environment with initially-empty cells
         cls._num_rows : int    = Parameters.NUM_ROWS
         cls._num_cols : int    = Parameters.NUM_COLS
         cls._sponge   : Sponge = Sponge(cls._num_rows, cls._num_cols)
-    
-        # set the class-level sponge reference for all symbionts
+
+        # set the class-level sponge reference for all symbionts, and their
+        # per-clade constants (which depend on the number of rows)
         Symbiont.sponge = cls._sponge
-    
+        Symbiont.computeCladeConstants(cls._num_rows)
+
         # create the event list -- initially empty except for the first arrival
         cls._event_list : EventList = EventList()
-    
+
         ###################################################################################
         ###################################################################################
         ## INITIAL SYMBIONT SETUP
@@ -150,27 +580,34 @@ class Simulation:
         allow_typical_arrivals : bool = True
         #allow_typical_arrivals : bool = False
     
-        if allow_typical_arrivals:
-            # schedule the first arrival to the system
-            time  = RNG.exponential(Parameters.AVG_TIME_BETWEEN_ARRIVALS, Stream.ARRIVALS)
-            event = Event(time, EventType.ARRIVAL, symbiont = None)
-            cls._event_list.insertEvent(event)
+        # arrivals are not scheduled in the event list: their times come from
+        # a pre-generated stream, merged with the event list in runUntil
+        cls._arrivals = ArrivalStream(Parameters.AVG_TIME_BETWEEN_ARRIVALS \
+                                      if allow_typical_arrivals else None)
+        # while the sponge is full every arrival is rejected, so the stream
+        # may be suspended until a cell frees up (see _skipRejectedArrivals)
+        cls._fast_forward = Parameters.ARRIVAL_FAST_FORWARD.lower()
+        if cls._fast_forward not in cls.FAST_FORWARD_MODES:
+            raise ValueError("Error in Simulation: ARRIVAL_FAST_FORWARD must be one of " + \
+                             f"{', '.join(cls.FAST_FORWARD_MODES)}")
     
         num_initial_agents : int = Parameters.NUM_INITIAL_SYMBIONTS
         if Parameters.INITIAL_PLACEMENT.lower() == "random":
             Parameters.INITIAL_PLACEMENT = "randomize"
-        initial_placement : Placement = eval(f"Placement.{Parameters.INITIAL_PLACEMENT.upper()}")
+        initial_placement : Placement = Placement[Parameters.INITIAL_PLACEMENT.upper()]
     
         cls._current_time : float = 0.0
 
-        which_clade : int = 0
-        prev_clade_proportion : float = 0.0
+        # initial symbionts are assigned to clades in order, by proportion:
+        # symbiont n goes to the first clade whose cumulative proportion is at
+        # least n / num_initial_agents (with many clades, a step may pass over
+        # clades too small to get any initial symbiont)
+        cumulative : list[float] = Symbiont.clade_cumulative_proportions
         for n in range(num_initial_agents):
-            if n / num_initial_agents > Symbiont.clade_cumulative_proportions[which_clade]:
-                prev_clade_proportion = Symbiont.clade_cumulative_proportions[which_clade]
-                which_clade = min(which_clade + 1, Parameters.NUM_CLADES - 1)
-    
-            clade_proportion = Symbiont.clade_cumulative_proportions[which_clade]
+            which_clade : int = min(bisect_left(cumulative, n / num_initial_agents), \
+                                    Parameters.NUM_CLADES - 1)
+            prev_clade_proportion : float = cumulative[which_clade - 1] if which_clade > 0 else 0.0
+            clade_proportion      : float = cumulative[which_clade]
 
             if initial_placement == Placement.RANDOMIZE:
                 open_cell = Symbiont.findOpenCell()
@@ -179,7 +616,7 @@ class Simulation:
                 # place this clade at random within the appropriate
                 # horizontal slice of the host
                 row_start = int(Parameters.NUM_ROWS * prev_clade_proportion)
-                row_end   = int(Parameters.NUM_ROWS * clade_proportion) 
+                row_end   = max(int(Parameters.NUM_ROWS * clade_proportion), row_start + 1)
                 col_start = 0
                 col_end   = Parameters.NUM_COLS
                 open_cell = Symbiont.findOpenCellWithin(row_start, row_end, col_start, col_end)
@@ -190,8 +627,12 @@ class Simulation:
                 row_start = 0
                 row_end   = Parameters.NUM_ROWS
                 col_start = int(Parameters.NUM_COLS * prev_clade_proportion)
-                col_end   = int(Parameters.NUM_COLS * clade_proportion) 
+                col_end   = max(int(Parameters.NUM_COLS * clade_proportion), col_start + 1)
                 open_cell = Symbiont.findOpenCellWithin(row_start, row_end, col_start, col_end)
+            # (with more clades than rows or columns, a clade's slice -- at least
+            # one row or column -- may be shared, and may fill up: the symbiont
+            # then goes anywhere in the host)
+            if open_cell is None: open_cell = Symbiont.findOpenCell()
     
             symbiont = Symbiont(which_clade, open_cell, cls._current_time)
             open_cell.setSymbiont(symbiont, cls._current_time)
@@ -203,239 +644,430 @@ class Simulation:
             cls._num_symbionts_per_clade[which_clade] += 1
             #num_symbionts_per_clade[symbiont._clade_number] += 1
 
-            logging.debug(str(symbiont))
+            if trace is not None:
+                trace(cls._current_time, EventType.ARRIVAL, symbiont, \
+                      SymbiontState.ARRIVED_FROM_POOL, TraceRole.INITIAL)
     
         ###################################################################################
         ###################################################################################
-    
+
         ###################################################################################
         ###################################################################################
         # prepare to enter the main simulation loop...
-        event = cls._event_list.getNextEvent()
+        cls._next_event = cls._event_list.getNextEvent()
         cls._end_time = Parameters.MAX_SIMULATED_TIME
-    
+        cls._time_reached = 0.0
+        cls._finished = False
+
+        # the event handlers, by event type (see runUntil)
+        cls._handlers = {EventType.ARRIVAL:    cls._handleArrival, \
+                         EventType.END_G0:     cls._handleEndOfG0, \
+                         EventType.END_G1SG2M: cls._handleEndOfG1SG2M, \
+                         EventType.DIGESTION:  cls._handleExit, \
+                         EventType.ESCAPE:     cls._handleExit, \
+                         EventType.DENOUEMENT: cls._handleExit}
+
+        # optional event profiling (see event_profiler.py): the handlers are
+        # wrapped with timing ones only when it is enabled (and before any
+        # telemetry wrapping, so that only the handlers themselves are timed)
+        if cls._profile_events:
+            cls._handlers = EventProfiler.wrapHandlers(cls._handlers)
+
+        # optional performance telemetry (see telemetry.py): the handlers are
+        # wrapped with event-counting ones only when it is enabled
+        cls._telemetry = Parameters.WRITE_TELEMETRY_INFO and write_files
+        if cls._telemetry:
+            Telemetry.open(Parameters.TELEMETRY_FILENAME, Parameters.TELEMETRY_INTERVAL, \
+                Parameters.TELEMETRY_EVENTS, Parameters.NUM_CLADES, \
+                clock = lambda: cls._current_time, \
+                state = lambda: (len(cls._event_list), cls._num_symbionts, \
+                                 cls._num_symbionts_per_clade))
+            cls._handlers = Telemetry.wrapHandlers(cls._handlers)
+
+        if cls._memory_report is not None:
+            cls._handlers = MemoryReport.wrapHandlers(cls._handlers)
+            MemoryReport.sample()
+
         # write out t=0 population (which may not be zero for some experiments)
-        string = ""
         total_population = 0
         for c in range(Parameters.NUM_CLADES):
-            string += '\t'
-            string += str(cls._num_symbionts_per_clade[c])
             total_population += cls._num_symbionts_per_clade[c]
-            cls._prev_num_symbionts_per_clade.append(cls._num_symbionts_per_clade[c])
-        string = f"0\t{total_population}{string}\n"
-        cls._population_file.write(string)
-    
-        cls._prev_num_symbionts = total_population
-    
-        #############################################################
-        # enter the main simulation loop
-        while event is not None and event.getTime() < cls._end_time:
-            ###################################
-            cls._current_time = event.getTime()
-            event_type = event.getType()
-            symbiont   = event.getSymbiont()
-    
-            cls.writePopulation(cls._current_time)
-            ###################################
-    
-            ###################################
-            if event_type == EventType.ARRIVAL:
-                #
-                logging.debug('ARRIVAL @ t=%f' % (cls._current_time))
-                # handle a symbiont arrival to the sponge -- 
-                # check for affinity and open cell...
-                symbiont = Symbiont.generateArrival(cls._current_time, cls._num_symbionts)
-                if symbiont is not None:
-                    # sufficient affinity to infect, so set up next event for symbiont
-                    next_time, next_type = symbiont.getNextEvent()
-                    new_event = Event(next_time, next_type, symbiont)
-                    cls._event_list.insertEvent(new_event)
-                    cls._num_symbionts += 1
-                    cls._num_symbionts_per_clade[symbiont.getCladeNumber()] += 1
-                
-                logging.debug(str(symbiont))
-    
-                # schedule the next arrival
-                next_time = cls._current_time + \
-                    RNG.exponential(Parameters.AVG_TIME_BETWEEN_ARRIVALS, Stream.ARRIVALS)
-                new_event = Event(next_time, EventType.ARRIVAL, symbiont = None)
-                cls._event_list.insertEvent(new_event)
-                #
-            ####################################
-            elif event_type == EventType.END_G0:
-                #
-                logging.debug('END G0 @ t=%f' % (cls._current_time))
-                # handle a symbiont's end of G0 event
-                symbiont.endOfG0(cls._current_time)
-                # set up the next event for this symbiont -- G1SG2M or exit or digestion...
-                next_time, next_type = symbiont.getNextEvent()
-                new_event = Event(next_time, next_type, symbiont)
-                cls._event_list.insertEvent(new_event)
-                #
-                logging.debug(str(symbiont))
-                #
-            ########################################
-            elif event_type == EventType.END_G1SG2M:
-                #
-                logging.debug('END G1SG2M @ t=%f' % (cls._current_time))
-                # handle a symbiont's end of G1SG2M event, which may result in a
-                # built-in eviction event (see symbiont.py endOfG1SG2M())
-                status, child = symbiont.endOfG1SG2M(cls._current_time)
-                #
-                logging.debug(f'status @ end of G1SG2M={status.name}')
-                logging.debug(str(symbiont))
-                logging.debug(str(child))
-                #
-                if status == SymbiontState.CHILD_INFECTS_OUTSIDE:
-                    logging.debug(f'\t{status.name}')
-                    child.csvOutputOnExit(cls._current_time, status)
-                    # set up next events for parent (symbiont) only
-                    next_time, next_type = symbiont.getNextEvent()
-                    new_event = Event(next_time, next_type, symbiont)
-                    cls._event_list.insertEvent(new_event)
-                    #
-                elif status == SymbiontState.PARENT_EVICTED:
-                    logging.debug(f'\t{status.name}')
-                    symbiont.csvOutputOnExit(cls._current_time, status)
-                    # set up the next event for the child only 
-                    # (who now occupies the cell)
-                    next_time, next_type = child.getNextEvent()
-                    new_event = Event(next_time, next_type, child)
-                    cls._event_list.insertEvent(new_event)
-                    #
-                    logging.debug(f'RT = {cls._current_time - symbiont.getArrivalTime()} ({symbiont.getCladeNumber()})')
-                    #
-                elif status == SymbiontState.PARENT_INFECTS_OUTSIDE:
-                    logging.debug(f'\t{status.name}')
-                    symbiont.csvOutputOnExit(cls._current_time, status)
-                    # set up the next event for the child only (who now occupies the cell)
-                    next_time, next_type = child.getNextEvent()
-                    new_event = Event(next_time, next_type, child)
-                    cls._event_list.insertEvent(new_event)
-                    #
-                    logging.debug(f'RT = {cls._current_time - symbiont.getArrivalTime()} ({symbiont.getCladeNumber()})')
-                    #
-                elif status == SymbiontState.CHILD_EVICTED:
-                    logging.debug(f'\t{status.name}')
-                    child.csvOutputOnExit(cls._current_time, status)
-                    # set up the next event for the parent only (who still occupies the cell)
-                    next_time, next_type = symbiont.getNextEvent()
-                    new_event = Event(next_time, next_type, symbiont)
-                    cls._event_list.insertEvent(new_event)
-                    #
-                    logging.debug(f'RT = {cls._current_time - child.getArrivalTime()} ({child.getCladeNumber()})')
-                    #
-                elif status == SymbiontState.BOTH_STAY:
-                    logging.debug(f'\t{status.name}')
-                    # set up the next events for both symbionts
-                    next_time, next_type = symbiont.getNextEvent()
-                    new_event = Event(next_time, next_type, symbiont)
-                    cls._event_list.insertEvent(new_event)
-                    #
-                    next_time, next_type = child.getNextEvent()
-                    new_event = Event(next_time, next_type, child)
-                    cls._event_list.insertEvent(new_event)
-                    #
-                    cls._num_symbionts += 1
-                    cls._num_symbionts_per_clade[child.getCladeNumber()] += 1
-                    #
-                elif status == SymbiontState.PARENT_NO_AFFINITY:
-                    logging.debug(f'\t{status.name}')
-                    symbiont.csvOutputOnExit(cls._current_time, status)
-                    # set up the next event for the child only (who now occupies the cell)
-                    next_time, next_type = child.getNextEvent()
-                    new_event = Event(next_time, next_type, child)
-                    cls._event_list.insertEvent(new_event)
-                    #
-                    logging.debug(f'RT = {cls._current_time - symbiont.getArrivalTime()} ({symbiont.getCladeNumber()})')
-                    #
-                elif status == SymbiontState.CHILD_NO_AFFINITY:
-                    logging.debug(f'\t{status.name}')
-                    child.csvOutputOnExit(cls._current_time, status)
-                    # set up the next event for the parent only (who still occupies the cell)
-                    next_time, next_type = symbiont.getNextEvent()
-                    new_event = Event(next_time, next_type, symbiont)
-                    cls._event_list.insertEvent(new_event)
-                    #
-                    logging.debug(f'RT = {cls._current_time - child.getArrivalTime()} ({child.getCladeNumber()})')
-                    #
-                #
-            #######################################
-            elif event_type == EventType.DIGESTION:
-                #
-                logging.debug('DIGESTION @ t=%f' % (cls._current_time))
-                # handle a symbiont-being-digested event
-                symbiont.digestion(cls._current_time)
-                prev_event_type = symbiont.getPrevEventType()
-                if prev_event_type in (EventType.ARRIVAL, EventType.END_G1SG2M):
-                    exit_status = SymbiontState.DIGESTION_IN_G0
-                else:
-                    exit_status = SymbiontState.DIGESTION_IN_G1SG2M
-                symbiont.csvOutputOnExit(cls._current_time, exit_status)
-                cls._num_symbionts -= 1
-                cls._num_symbionts_per_clade[symbiont.getCladeNumber()] -= 1
-                #
-                # no further event updating for this symbiont -- the symbiont is gone!
-                #
-                logging.debug(str(symbiont))
-                logging.debug(f'RT = {cls._current_time - symbiont.getArrivalTime()} ({symbiont.getCladeNumber()})')
-                #
-            #####################################
-            elif event_type == EventType.ESCAPE:
-                #
-                logging.debug('ESCAPE @ t=%f' % (cls._current_time))
-                # handle a symbiont-escaping-digestion event
-                symbiont.escape(cls._current_time)
-                prev_event_type = symbiont.getPrevEventType()
-                if prev_event_type in (EventType.ARRIVAL, EventType.END_G1SG2M):
-                    exit_status = SymbiontState.ESCAPE_IN_G0
-                else:
-                    exit_status = SymbiontState.ESCAPE_IN_G1SG2M
-                symbiont.csvOutputOnExit(cls._current_time, exit_status)
-                cls._num_symbionts -= 1
-                cls._num_symbionts_per_clade[symbiont.getCladeNumber()] -= 1
-                #
-                # no further event updating for this symbiont -- the symbiont is gone!
-                #
-                logging.debug(str(symbiont))
-                logging.debug(f'RT = {cls._current_time - symbiont.getArrivalTime()} ({symbiont.getCladeNumber()})')
-                #
-            ########################################
-            elif event_type == EventType.DENOUEMENT:
-                #
-                logging.debug('DENOUEMENT @ t=%f' % (cls._current_time))
-                # handle a symbiont-leaving-of-own-accord event
-                symbiont.denouement(cls._current_time)
-                prev_event_type = symbiont.getPrevEventType()
-                if prev_event_type in (EventType.ARRIVAL, EventType.END_G1SG2M):
-                    exit_status = SymbiontState.DENOUEMENT_IN_G0
-                else:
-                    exit_status = SymbiontState.DENOUEMENT_IN_G1SG2M
-                symbiont.csvOutputOnExit(cls._current_time, exit_status)
-                cls._num_symbionts -= 1
-                cls._num_symbionts_per_clade[symbiont.getCladeNumber()] -= 1
-                #
-                # no further event updating for this symbiont -- the symbiont is gone!
-                #
-                logging.debug(str(symbiont))
-                logging.debug(f'RT = {cls._current_time - symbiont.getArrivalTime()} ({symbiont.getCladeNumber()})')
-                #
-            # 
-    
-            logging.debug('>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>')
-            event = cls._event_list.getNextEvent()
-    
-        # end of main simulation loop
-        #######################################################
-    
-        # write out csv output for all symbionts still in residence at end
+        cls._population_series.record(0, total_population, cls._num_symbionts_per_clade)
+
+    ################################################################################
+    @classmethod
+    def runUntil(cls, time: float) -> bool:
+        ''' class-level method implementing the main simulation loop: processes,
+            in time order, all events before the given time (or before
+            MAX_SIMULATED_TIME, if earlier), stopping early if a stopping rule
+            is satisfied; may be called repeatedly with increasing times
+        Parameters:
+            time: floating-point time up to which to simulate
+        Returns:
+            False if the run is over (MAX_SIMULATED_TIME reached or a stopping
+            rule satisfied), True if there is more to simulate
+        '''
+        if cls.isDone(): return False
+        end_time   = min(time, cls._end_time)
+        event_list = cls._event_list
+        handlers   = cls._handlers
+        trace      = cls._trace
+        event      = cls._next_event
+        event_time = event.getTime() if event is not None else INFINITY
+        # the next arrival from the pool (see arrival_stream.py) is merged
+        # with the next event from the event list; at equal times the event
+        # goes first, as arrivals come last in the event ordering (EventType)
+        arrivals       = cls._arrivals
+        arrival_time   = arrivals.peek()
+        handle_arrival = handlers[EventType.ARRIVAL]
+        while True:
+            if event_time <= arrival_time:
+                # (arrivals suspended while the sponge is full -- see
+                # _skipRejectedArrivals)
+                if arrival_time == INFINITY and arrivals.isSuspended() and \
+                   cls._skipRejectedArrivals(min(event_time, end_time)):
+                    cls._finished = True
+                    break
+                if event_time >= end_time: break
+                cls._current_time = event_time
+                if cls.writePopulation(event_time):  # stopping rule
+                    cls._finished = True
+                    break
+                handlers[event.getType()](event.getType(), event.getSymbiont(), trace)
+                event = event_list.getNextEvent()
+                event_time = event.getTime() if event is not None else INFINITY
+                if arrival_time == INFINITY: arrival_time = cls._resumeArrivals()
+            else:
+                if arrival_time >= end_time: break
+                cls._current_time = arrival_time
+                if cls.writePopulation(arrival_time):  # stopping rule
+                    cls._finished = True
+                    break
+                handle_arrival(EventType.ARRIVAL, None, trace)
+                arrival_time = arrivals.advance()
+                # (the arrival may have scheduled an event earlier than the
+                # one already taken from the event list, or the first one, if
+                # the list was empty)
+                event = event_list.exchangeEvent(event) if event is not None \
+                        else event_list.getNextEvent()
+                event_time = event.getTime() if event is not None else INFINITY
+        cls._next_event = event
+        if not cls._finished: cls._time_reached = max(cls._time_reached, end_time)
+        return not cls.isDone()
+
+    ################################################################################
+    @classmethod
+    def step(cls) -> bool:
+        ''' class-level method to process the next event only
+        Returns:
+            False if the run is over (see runUntil), True otherwise
+        '''
+        if cls.isDone(): return False
+        event = cls._next_event
+        event_time = event.getTime() if event is not None else INFINITY
+        arrival_time = cls._arrivals.peek()
+        if arrival_time == INFINITY and cls._arrivals.isSuspended() and \
+           cls._skipRejectedArrivals(min(event_time, cls._end_time)):
+            cls._finished = True
+            return False
+        if min(event_time, arrival_time) >= cls._end_time:
+            cls._time_reached = cls._end_time
+            return False
+        cls._current_time = min(event_time, arrival_time)
+        if cls.writePopulation(cls._current_time):
+            cls._finished = True
+            return False
+        if event_time <= arrival_time:   # (see runUntil)
+            cls._handlers[event.getType()](event.getType(), event.getSymbiont(), cls._trace)
+            cls._next_event = cls._event_list.getNextEvent()
+            cls._resumeArrivals()
+        else:
+            cls._handlers[EventType.ARRIVAL](EventType.ARRIVAL, None, cls._trace)
+            cls._arrivals.advance()
+            cls._next_event = cls._event_list.exchangeEvent(event) if event is not None \
+                              else cls._event_list.getNextEvent()
+        cls._time_reached = cls._current_time
+        return True
+
+    ################################################################################
+    @classmethod
+    def iterDays(cls, interval: float = 1.0) -> 'Iterator[tuple[float, numpy.ndarray]]':
+        ''' class-level generator method to simulate one day (or interval) at a
+            time, yielding the number of symbionts at each whole day
+        Parameters:
+            interval: time between yields, in days (default: 1.0)
+        Yields:
+            tuples of (time, counts), for times k*interval up to
+            MAX_SIMULATED_TIME (or the stop time), where counts is a numpy
+            array of the total and per-clade numbers of symbionts at that time
+            (i.e., after all events before it)
+        '''
+        time = math.ceil(cls._time_reached / interval) * interval
+        while time <= cls._end_time and not cls._finished:
+            cls.runUntil(time)
+            if cls._finished: break
+            yield (time, numpy.array([cls._num_symbionts] + cls._num_symbionts_per_clade))
+            time += interval
+
+    ################################################################################
+    @classmethod
+    def isDone(cls) -> bool:
+        ''' class-level method returning True if the run is over (see runUntil) '''
+        return cls._finished or cls._time_reached >= cls._end_time
+
+    ################################################################################
+    @classmethod
+    def getCurrentTime(cls) -> float:
+        ''' class-level method returning the time of the most recent event '''
+        return cls._current_time
+
+    ################################################################################
+    @classmethod
+    def getCounts(cls) -> tuple[int, list[int]]:
+        ''' class-level method returning the current total and per-clade
+            numbers of symbionts '''
+        return (cls._num_symbionts, list(cls._num_symbionts_per_clade))
+
+    ################################################################################
+    @classmethod
+    def finish(cls) -> None:
+        ''' class-level method to end the run, writing the remaining outputs; a
+            run finished before MAX_SIMULATED_TIME (e.g., by a caller of
+            runUntil or iterDays) is recorded as stopped early '''
+        if not cls.isDone():
+            cls._stop_reason = "finished by caller"
+            cls._stop_time   = cls._time_reached
+            cls.writePopulation(cls._time_reached)
+            cls._finished = True
+
+        # write out csv output (and exit statistics) for all symbionts still
+        # in residence at end
         Symbiont.csvOutputAtEnd(cls._current_time)
-    
-        cls.writePopulation(Parameters.MAX_SIMULATED_TIME)
-        cls._population_file.close()
-    
+        cls._reportStop()
+        summary = None
+        if Parameters.WRITE_SUMMARY_INFO:
+            summary = ExitStatistics.formatSummary()
+            if Parameters.SUMMARY_FILENAME != "" and cls._sink == 'file':
+                ExitStatistics.writeSummary(Parameters.SUMMARY_FILENAME, summary)
+        cls._summary = summary
+
+        # (a run stopped early has no samples after the stop time)
+        if cls._stop_reason is None: cls.writePopulation(Parameters.MAX_SIMULATED_TIME)
+        cls._flushPopulation()
+
+        if cls._trace is not None: EventTrace.close()
+        if cls._telemetry: Telemetry.close()
+        if cls._profile_events: print(EventProfiler.formatReport(), end = "")
+        if cls._memory_report is not None:
+            MemoryReport.close()
+            print(MemoryReport.formatReport(), end = "")
+
+        # flush and close the population (and CSV) files, waiting for the
+        # writer thread to finish; re-raises any error from the writer
+        OutputWriter.finish()
+
         if cls._show_progress: cls._progress_bar.finish()
-    ## end of run()
+        if cls._progress_fd is not None: cls._reportProgress(cls._time_reached, force = True)
+
+    ################################################################################
+    # event handlers (see _initialize and runUntil), each given the event type,
+    # the symbiont of the event (None for an arrival from the pool), and the
+    # trace function (None if tracing is off)
+    ################################################################################
+    @classmethod
+    def _handleArrival(cls, event_type: EventType, symbiont: None, trace: 'callable') -> None:
+        ''' handles a symbiont arrival from the pool '''
+        # handle a symbiont arrival to the sponge -- 
+        # check for affinity and open cell...
+        symbiont = Symbiont.generateArrival(cls._current_time, cls._num_symbionts)
+        if symbiont is not None:
+            # sufficient affinity to infect, so set up next event for symbiont
+            next_time, next_type = symbiont.getNextEvent()
+            new_event = Event(next_time, next_type, symbiont)
+            cls._event_list.insertEvent(new_event)
+            cls._num_symbionts += 1
+            cls._num_symbionts_per_clade[symbiont.getCladeNumber()] += 1
+
+        elif cls._fast_forward != 'off' and \
+             cls._num_symbionts == Parameters.NUM_ROWS * Parameters.NUM_COLS:
+            # the sponge is full: suspend arrivals until a cell frees up
+            cls._arrivals.suspend()
+
+        if trace is not None:
+            trace(cls._current_time, EventType.ARRIVAL, symbiont, \
+                  None if symbiont is None else SymbiontState.ARRIVED_FROM_POOL)
+        # (the next arrival comes from the arrival stream -- see runUntil)
+
+    ################################################################################
+    @classmethod
+    def _skipRejectedArrivals(cls, time: float) -> bool:
+        ''' with the arrivals suspended (the sponge full), catches up with the
+            population samples due before the given time (see writePopulation),
+            which would otherwise repeat the previous sample: with
+            ARRIVAL_FAST_FORWARD 'exact' each is recorded at the first arrival
+            of its interval and the arrivals skipped are counted as rejected,
+            just as if they had been handled, so that results are those of
+            ARRIVAL_FAST_FORWARD 'off'; with 'memoryless' each is recorded at
+            its sampling time
+        Parameters:
+            time: the time of the next event (or the end time)
+        Returns:
+            True if a stopping rule says the simulation should stop
+        '''
+        arrivals = cls._arrivals
+        series   = cls._population_series
+        exact    = cls._fast_forward == 'exact'
+        while True:
+            sample_time = series.sampleStart(cls._current_sample)
+            if sample_time >= time: break
+            if exact:
+                skipped, _ = arrivals.skipBefore(sample_time)
+                Symbiont.addRejectedArrivals(skipped)
+                sample_time = arrivals.upcoming()
+                if sample_time >= time: break
+            cls._current_time = sample_time
+            if cls.writePopulation(sample_time): return True
+        if exact:
+            skipped, last_time = arrivals.skipBefore(time)
+            Symbiont.addRejectedArrivals(skipped)
+            if last_time is not None: cls._current_time = max(cls._current_time, last_time)
+        return False
+
+    ################################################################################
+    @classmethod
+    def _resumeArrivals(cls) -> float:
+        ''' resumes the arrivals from the pool, if suspended (see ArrivalStream)
+            and the sponge is no longer full: with ARRIVAL_FAST_FORWARD 'exact'
+            at the first arrival of the unsuspended stream not yet skipped
+            (see _skipRejectedArrivals), with 'memoryless' at a fresh
+            exponential draw from the current time
+        Returns:
+            the time of the next arrival (INFINITY while still suspended)
+        '''
+        arrivals = cls._arrivals
+        if arrivals.isSuspended() and \
+           cls._num_symbionts < Parameters.NUM_ROWS * Parameters.NUM_COLS:
+            arrivals.resume(None if cls._fast_forward == 'exact' else cls._current_time)
+        return arrivals.peek()
+
+    ################################################################################
+    @classmethod
+    def _handleEndOfG0(cls, event_type: EventType, symbiont: Symbiont, trace: 'callable') -> None:
+        ''' handles a symbiont's end of G0 event '''
+        symbiont.endOfG0(cls._current_time)
+        # set up the next event for this symbiont -- G1SG2M or exit or digestion...
+        next_time, next_type = symbiont.getNextEvent()
+        new_event = Event(next_time, next_type, symbiont)
+        cls._event_list.insertEvent(new_event)
+        #
+        if trace is not None: trace(cls._current_time, EventType.END_G0, symbiont)
+
+    ################################################################################
+    @classmethod
+    def _handleEndOfG1SG2M(cls, event_type: EventType, symbiont: Symbiont, trace: 'callable') -> None:
+        ''' handles a symbiont's end of G1SG2M event '''
+        # handle a symbiont's end of G1SG2M event, which may result in a
+        # built-in eviction event (see symbiont.py endOfG1SG2M())
+        status, child = symbiont.endOfG1SG2M(cls._current_time)
+        #
+        if trace is not None:
+            trace(cls._current_time, EventType.END_G1SG2M, symbiont, status, \
+                  exiting = status in (SymbiontState.PARENT_EVICTED, \
+                                       SymbiontState.PARENT_INFECTS_OUTSIDE, \
+                                       SymbiontState.PARENT_NO_AFFINITY))
+            trace(cls._current_time, EventType.END_G1SG2M, child, status, \
+                  TraceRole.CHILD, \
+                  exiting = status in (SymbiontState.CHILD_EVICTED, \
+                                       SymbiontState.CHILD_INFECTS_OUTSIDE, \
+                                       SymbiontState.CHILD_NO_AFFINITY))
+        #
+        if status == SymbiontState.CHILD_INFECTS_OUTSIDE:
+            child.csvOutputOnExit(cls._current_time, status)
+            # set up next events for parent (symbiont) only
+            next_time, next_type = symbiont.getNextEvent()
+            new_event = Event(next_time, next_type, symbiont)
+            cls._event_list.insertEvent(new_event)
+            #
+        elif status == SymbiontState.PARENT_EVICTED:
+            symbiont.csvOutputOnExit(cls._current_time, status)
+            # set up the next event for the child only 
+            # (who now occupies the cell)
+            next_time, next_type = child.getNextEvent()
+            new_event = Event(next_time, next_type, child)
+            cls._event_list.insertEvent(new_event)
+            #
+        elif status == SymbiontState.PARENT_INFECTS_OUTSIDE:
+            symbiont.csvOutputOnExit(cls._current_time, status)
+            # set up the next event for the child only (who now occupies the cell)
+            next_time, next_type = child.getNextEvent()
+            new_event = Event(next_time, next_type, child)
+            cls._event_list.insertEvent(new_event)
+            #
+        elif status == SymbiontState.CHILD_EVICTED:
+            child.csvOutputOnExit(cls._current_time, status)
+            # set up the next event for the parent only (who still occupies the cell)
+            next_time, next_type = symbiont.getNextEvent()
+            new_event = Event(next_time, next_type, symbiont)
+            cls._event_list.insertEvent(new_event)
+            #
+        elif status == SymbiontState.BOTH_STAY:
+            # set up the next events for both symbionts
+            next_time, next_type = symbiont.getNextEvent()
+            new_event = Event(next_time, next_type, symbiont)
+            cls._event_list.insertEvent(new_event)
+            #
+            next_time, next_type = child.getNextEvent()
+            new_event = Event(next_time, next_type, child)
+            cls._event_list.insertEvent(new_event)
+            #
+            cls._num_symbionts += 1
+            cls._num_symbionts_per_clade[child.getCladeNumber()] += 1
+            #
+        elif status == SymbiontState.PARENT_NO_AFFINITY:
+            symbiont.csvOutputOnExit(cls._current_time, status)
+            # set up the next event for the child only (who now occupies the cell)
+            next_time, next_type = child.getNextEvent()
+            new_event = Event(next_time, next_type, child)
+            cls._event_list.insertEvent(new_event)
+            #
+        elif status == SymbiontState.CHILD_NO_AFFINITY:
+            child.csvOutputOnExit(cls._current_time, status)
+            # set up the next event for the parent only (who still occupies the cell)
+            next_time, next_type = symbiont.getNextEvent()
+            new_event = Event(next_time, next_type, symbiont)
+            cls._event_list.insertEvent(new_event)
+
+    ################################################################################
+    # exit statuses, by event type and by whether the exit happened in G0
+    _EXIT_STATUSES : dict[EventType, tuple[SymbiontState, SymbiontState]] = { \
+        EventType.DIGESTION:  (SymbiontState.DIGESTION_IN_G0,  SymbiontState.DIGESTION_IN_G1SG2M), \
+        EventType.ESCAPE:     (SymbiontState.ESCAPE_IN_G0,     SymbiontState.ESCAPE_IN_G1SG2M), \
+        EventType.DENOUEMENT: (SymbiontState.DENOUEMENT_IN_G0, SymbiontState.DENOUEMENT_IN_G1SG2M)}
+
+    @classmethod
+    def _handleExit(cls, event_type: EventType, symbiont: Symbiont, trace: 'callable') -> None:
+        ''' handles a symbiont being digested, escaping digestion, or leaving of
+            its own accord (denouement) '''
+        if event_type == EventType.DIGESTION:
+            symbiont.digestion(cls._current_time)
+        elif event_type == EventType.ESCAPE:
+            symbiont.escape(cls._current_time)
+        else:
+            symbiont.denouement(cls._current_time)
+        prev_event_type = symbiont.getPrevEventType()
+        in_g0, in_g1sg2m = cls._EXIT_STATUSES[event_type]
+        if prev_event_type in (EventType.ARRIVAL, EventType.END_G1SG2M):
+            exit_status = in_g0
+        else:
+            exit_status = in_g1sg2m
+        symbiont.csvOutputOnExit(cls._current_time, exit_status)
+        cls._num_symbionts -= 1
+        cls._num_symbionts_per_clade[symbiont.getCladeNumber()] -= 1
+        #
+        # no further event updating for this symbiont -- the symbiont is gone!
+        #
+        if trace is not None:
+            trace(cls._current_time, event_type, symbiont, exit_status, exiting = True)
 
 ##########################
 if __name__ == "__main__":
@@ -44,6 +44,7 @@ class Cell:
     def getRowCol(self)   -> tuple[int,int]:     return (self._row, self._col)
     def getSymbiont(self) -> 'Symbiont' or None: return self._symbiont
     def isOccupied(self)  -> bool:               return self._occupied
+    def getNumOccupants(self) -> int:            return self._num_occupants
 
     ######################################################
     def removeSymbiont(self, current_time: float) -> None:
@@ -0,0 +1,162 @@
+import math
+from collections import deque
+
+from parameters import Parameters
+
+################################################################################
+class StoppingRules:
+    ''' Class to implement optional early termination of a simulation run,
+        checked each time a population sample is recorded (see
+        Simulation.writePopulation).  Each rule is enabled by its parameter(s)
+        in the input CSV (all are disabled by default):
+            extinction:  a clade that was present has had no symbionts for
+                         STOP_EXTINCTION_DAYS days (STOP_ON_EXTINCTION)
+            dominance:   one clade has held more than STOP_DOMINANCE_FRACTION
+                         of the symbionts for STOP_DOMINANCE_DAYS days
+            steady state: the coefficient of variation of the total number of
+                         symbionts over the last STOP_CV_DAYS days is below
+                         STOP_CV_THRESHOLD
+            saturation:  the sponge has been full, with every arrival from the
+                         pool rejected for lack of space, for
+                         STOP_SATURATION_DAYS days
+        The first rule satisfied gives the stop reason.
+    '''
+
+    # class-level variables
+    _enabled          : bool               = False
+    _capacity         : int                = 0
+    _seen             : list[bool]         = []    # clade has had symbionts
+    _zero_since       : list[float]        = []    # time clade count became 0
+    _dominance_since  : float              = None
+    _dominant_clade   : int                = None
+    _cv_window        : deque              = None  # (time, total) samples
+    _cv_sum           : float              = 0.0
+    _cv_sum_squares   : float              = 0.0
+    _saturated_since  : float              = None
+    _prev_arrivals    : tuple[int, int]    = (0, 0)
+
+    ############################################################################
+    @classmethod
+    def initialize(cls, num_clades: int, capacity: int) -> bool:
+        ''' class-level method to reset the rules for a new run
+        Parameters:
+            num_clades: number of clades
+            capacity: number of cells in the sponge
+        Returns:
+            True if any rule is enabled
+        '''
+        cls._enabled = Parameters.STOP_ON_EXTINCTION or \
+                       Parameters.STOP_DOMINANCE_FRACTION > 0 or \
+                       Parameters.STOP_CV_THRESHOLD > 0 or \
+                       Parameters.STOP_SATURATION_DAYS > 0
+        cls._capacity        = capacity
+        cls._seen            = [False] * num_clades
+        cls._zero_since      = [None] * num_clades
+        cls._dominance_since = None
+        cls._dominant_clade  = None
+        cls._cv_window       = deque()
+        cls._cv_sum          = 0.0
+        cls._cv_sum_squares  = 0.0
+        cls._saturated_since = None
+        cls._prev_arrivals   = (0, 0)
+        return cls._enabled
+
+    ############################################################################
+    @classmethod
+    def isEnabled(cls) -> bool: return cls._enabled
+
+    ############################################################################
+    @classmethod
+    def check(cls, time: float, total: int, per_clade: list[int], \
+              arrivals: tuple[int, int]) -> str or None:
+        ''' class-level method to evaluate the enabled rules on a new sample
+        Parameters:
+            time: the sample time (float, in days)
+            total: total number of symbionts
+            per_clade: list of the number of symbionts per clade
+            arrivals: tuple of (number of arrivals from the pool, number of
+                those rejected because the sponge was full) so far
+        Returns:
+            a str describing why the simulation should stop, or None
+        '''
+        reason = None
+        if Parameters.STOP_ON_EXTINCTION:
+            reason = cls._checkExtinction(time, per_clade)
+        if reason is None and Parameters.STOP_DOMINANCE_FRACTION > 0:
+            reason = cls._checkDominance(time, total, per_clade)
+        if reason is None and Parameters.STOP_CV_THRESHOLD > 0:
+            reason = cls._checkSteadyState(time, total)
+        if reason is None and Parameters.STOP_SATURATION_DAYS > 0:
+            reason = cls._checkSaturation(time, total, arrivals)
+        return reason
+
+    ############################################################################
+    @classmethod
+    def _checkExtinction(cls, time: float, per_clade: list[int]) -> str or None:
+        ''' extinction: a previously-present clade has been absent long enough '''
+        for clade, count in enumerate(per_clade):
+            if count > 0:
+                cls._seen[clade] = True
+                cls._zero_since[clade] = None
+            elif cls._seen[clade]:
+                if cls._zero_since[clade] is None: cls._zero_since[clade] = time
+                if time - cls._zero_since[clade] >= Parameters.STOP_EXTINCTION_DAYS:
+                    return f"extinction of clade {clade}"
+        return None
+
+    ############################################################################
+    @classmethod
+    def _checkDominance(cls, time: float, total: int, per_clade: list[int]) -> str or None:
+        ''' dominance: one clade above the threshold fraction long enough '''
+        dominant = None
+        if total > 0:
+            clade = max(range(len(per_clade)), key = lambda c: per_clade[c])
+            if per_clade[clade] > Parameters.STOP_DOMINANCE_FRACTION * total:
+                dominant = clade
+        if dominant is None or dominant != cls._dominant_clade:
+            cls._dominant_clade  = dominant
+            cls._dominance_since = time if dominant is not None else None
+        if dominant is not None and \
+           time - cls._dominance_since >= Parameters.STOP_DOMINANCE_DAYS:
+            return f"dominance of clade {dominant} " + \
+                   f"(> {Parameters.STOP_DOMINANCE_FRACTION} of symbionts)"
+        return None
+
+    ############################################################################
+    @classmethod
+    def _checkSteadyState(cls, time: float, total: int) -> str or None:
+        ''' steady state: running CV of the total population below threshold '''
+        window = cls._cv_window
+        window.append((time, total))
+        cls._cv_sum         += total
+        cls._cv_sum_squares += total * total
+        while time - window[0][0] > Parameters.STOP_CV_DAYS:
+            t, old = window.popleft()
+            cls._cv_sum         -= old
+            cls._cv_sum_squares -= old * old
+        # only judge once the window spans STOP_CV_DAYS
+        if time - window[0][0] < Parameters.STOP_CV_DAYS or len(window) < 2: return None
+        n    = len(window)
+        mean = cls._cv_sum / n
+        if mean <= 0: return None
+        variance = max(cls._cv_sum_squares - n * mean * mean, 0.0) / (n - 1)
+        cv = math.sqrt(variance) / mean
+        if cv < Parameters.STOP_CV_THRESHOLD:
+            return f"steady state (CV {cv:.4g} over {Parameters.STOP_CV_DAYS} days)"
+        return None
+
+    ############################################################################
+    @classmethod
+    def _checkSaturation(cls, time: float, total: int, arrivals: tuple[int, int]) -> str or None:
+        ''' saturation: sponge full and every arrival rejected long enough '''
+        num_arrivals, num_rejected = arrivals
+        prev_arrivals, prev_rejected = cls._prev_arrivals
+        cls._prev_arrivals = arrivals
+        all_rejected = (num_arrivals - prev_arrivals) == (num_rejected - prev_rejected)
+        if total < cls._capacity or not all_rejected:
+            cls._saturated_since = None
+            return None
+        if cls._saturated_since is None: cls._saturated_since = time
+        if time - cls._saturated_since >= Parameters.STOP_SATURATION_DAYS:
+            return "saturation (sponge full, all arrivals rejected)"
+        return None
@@ -0,0 +1,425 @@
+import argparse
+import json
+import multiprocessing
+import os
+import os.path
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+
+from parameters import Parameters
+from parser import Parser
+from result_cache import ResultCache
+
+################################################################################
+class SweepQueue:
+    ''' Class to implement a crash-resumable work queue of simulation runs
+        (input CSV plus overrides) in a SQLite file, so that a sweep can be
+        worked on by many worker processes, on one or more nodes sharing a
+        filesystem, and resumed after being killed.  Each run is
+            pending  -> running (leased by one worker) -> done (or failed)
+        A worker holds a run by a lease that it renews by heartbeats while
+        the run executes; a run whose lease has expired (its worker was
+        killed, or stalled) is claimed again by the next worker -- a worker
+        that has lost its lease discards its result -- and resume() re-queues
+        every run that was not finished.  Each run writes its output files
+        into its own directory (see addRun).
+
+        Concurrency: the database uses SQLite's rollback journal (not WAL,
+        whose shared-memory index works only on one host), so that workers on
+        several nodes coordinate through the file locks of the shared
+        filesystem -- which must therefore support POSIX locking (e.g., NFS
+        with its lock manager running); without it, use the queue from one
+        host only.  Each claim, heartbeat, or completion is one short write
+        transaction, waiting for the lock for up to BUSY_TIMEOUT_MS, so dozens
+        of workers (each of which spends its time simulating) contend very
+        little.  Leases use wall-clock time, so clocks of the nodes must agree
+        to well within the lease length.
+    '''
+
+    # run states
+    PENDING : str = 'pending'
+    RUNNING : str = 'running'
+    DONE    : str = 'done'
+    FAILED  : str = 'failed'
+
+    # the output-file parameters redirected into each run's directory
+    OUTPUT_PARAMETERS : tuple[str] = ('POPULATION_FILENAME', 'CSV_FILENAME', \
+        'SUMMARY_FILENAME', 'LOG_FILENAME', 'TELEMETRY_FILENAME')
+
+    DEFAULT_LEASE   : float = 300.0   # seconds
+    BUSY_TIMEOUT_MS : int   = 60000
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS runs (
+            id              INTEGER PRIMARY KEY,
+            name            TEXT UNIQUE NOT NULL,
+            input_csv       TEXT NOT NULL,
+            overrides       TEXT NOT NULL,     -- JSON
+            clade_overrides TEXT NOT NULL,     -- JSON
+            output_dir      TEXT NOT NULL,
+            outputs         TEXT NOT NULL,     -- JSON: output parameter -> path
+            status          TEXT NOT NULL DEFAULT 'pending',
+            worker          TEXT,
+            lease_expires   REAL,
+            attempts        INTEGER NOT NULL DEFAULT 0,
+            started         REAL,
+            finished        REAL,
+            error           TEXT
+        );
+        CREATE INDEX IF NOT EXISTS runs_by_status ON runs (status, lease_expires, id);
+    '''
+
+    ############################################################################
+    def __init__(self, path: str) -> None:
+        ''' initializer for a SweepQueue, creating the database if needed
+        Parameters:
+            path: filename of the SQLite database
+        '''
+        self._path = path
+        self._connection = self._connect(path)
+        with self._connection:
+            self._connection.executescript(self._SCHEMA)
+
+    ############################################################################
+    @classmethod
+    def _connect(cls, path: str) -> sqlite3.Connection:
+        ''' opens a connection in autocommit mode (transactions are explicit)
+            with a rollback journal and a generous busy timeout '''
+        connection = sqlite3.connect(path, timeout = cls.BUSY_TIMEOUT_MS / 1000, \
+                                     isolation_level = None)
+        connection.row_factory = sqlite3.Row
+        connection.execute(f"PRAGMA busy_timeout = {cls.BUSY_TIMEOUT_MS}")
+        connection.execute("PRAGMA journal_mode = DELETE")   # (e.g., after WAL)
+        connection.execute("PRAGMA synchronous = FULL")
+        return connection
+
+    ############################################################################
+    def _transaction(self, sql: str, parameters: tuple = ()) -> sqlite3.Cursor:
+        ''' runs one statement in its own write transaction '''
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            cursor = connection.execute(sql, parameters)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return cursor
+
+    ############################################################################
+    def close(self) -> None:
+        self._connection.close()
+
+    ############################################################################
+    def addRun(self, input_csv: str, overrides: dict[str, object] = None, \
+               clade_overrides: dict[int, dict[str, object]] = None, \
+               name: str = None, output_dir: str = None) -> int:
+        ''' method to add a run to the queue
+        Parameters:
+            input_csv: input CSV filename
+            overrides, clade_overrides: parameter overrides (see
+                Parser.applyOverrides; values must be JSON-serializable)
+            name: unique name of the run (default: run<N>)
+            output_dir: directory for the run's output files (default:
+                sweep_output/<name>); each output filename in the input CSV
+                (e.g., POPULATION_FILENAME) is redirected into it
+        Returns:
+            the id of the new run
+        Raises:
+            ValueError, if the input CSV or overrides are invalid
+        '''
+        # check the configuration now, rather than when a worker gets to it
+        Parser.parseCSVInput(input_csv)
+        Parser.applyOverrides(overrides, clade_overrides)
+        clade_overrides = {str(c): values for c, values in (clade_overrides or {}).items()}
+
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if name is None:
+                count = connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+                name = f"run{count + 1}"
+            if output_dir is None: output_dir = os.path.join("sweep_output", name)
+            output_dir = os.path.abspath(output_dir)
+            outputs = {}
+            for parameter in self.OUTPUT_PARAMETERS:
+                filename = getattr(Parameters, parameter)
+                if filename != "":
+                    outputs[parameter] = os.path.join(output_dir, os.path.basename(filename))
+            cursor = connection.execute('''INSERT INTO runs (name, input_csv, overrides,
+                clade_overrides, output_dir, outputs) VALUES (?, ?, ?, ?, ?, ?)''', \
+                (name, os.path.abspath(input_csv), json.dumps(overrides or {}), \
+                 json.dumps(clade_overrides), output_dir, json.dumps(outputs)))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return cursor.lastrowid
+
+    ############################################################################
+    def claim(self, worker: str, lease: float = DEFAULT_LEASE) -> dict or None:
+        ''' method to lease the next pending run (or a running one whose lease
+            has expired) to a worker
+        Parameters:
+            worker: name of the worker (str)
+            lease: length of the lease (in seconds)
+        Returns:
+            a dict of the run's columns (overrides, clade_overrides, and
+            outputs decoded), or None if there is nothing to do
+        '''
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = connection.execute('''SELECT * FROM runs WHERE status = ?
+                OR (status = ? AND lease_expires < ?) ORDER BY id LIMIT 1''', \
+                (self.PENDING, self.RUNNING, now)).fetchone()
+            if row is not None:
+                connection.execute('''UPDATE runs SET status = ?, worker = ?,
+                    lease_expires = ?, attempts = attempts + 1, started = ?,
+                    error = NULL WHERE id = ?''', \
+                    (self.RUNNING, worker, now + lease, now, row['id']))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if row is None: return None
+        run = dict(row)
+        run['overrides'] = json.loads(run['overrides'])
+        run['clade_overrides'] = {int(c): values for c, values in \
+                                  json.loads(run['clade_overrides']).items()}
+        run['outputs'] = json.loads(run['outputs'])
+        return run
+
+    ############################################################################
+    def heartbeat(self, run_id: int, worker: str, lease: float = DEFAULT_LEASE) -> bool:
+        ''' method to renew a worker's lease on a run
+        Returns:
+            False if the worker no longer holds the run (its lease expired
+            and the run was claimed by another worker, or it was re-queued)
+        '''
+        cursor = self._transaction('''UPDATE runs SET lease_expires = ?
+            WHERE id = ? AND worker = ? AND status = ?''', \
+            (time.time() + lease, run_id, worker, self.RUNNING))
+        return cursor.rowcount == 1
+
+    ############################################################################
+    def complete(self, run_id: int, worker: str, attempt_dir: str = None) -> bool:
+        ''' method to mark a run as done, first moving the output files of the
+            worker's attempt into the run's output directory -- both within
+            one write transaction, so that the run is done only once its
+            outputs are in place (if the worker dies in between, the run stays
+            running and is claimed again when its lease expires), and no other
+            worker can complete the run meanwhile
+        Parameters:
+            run_id, worker: the run and the worker holding it
+            attempt_dir: directory of the output files to move (None for none)
+        Returns:
+            False if the worker no longer holds the run (see heartbeat), in
+            which case nothing is moved, the run is left as it is, and the
+            result should be discarded
+        '''
+        connection = self._connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute('''SELECT output_dir FROM runs
+                WHERE id = ? AND worker = ? AND status = ?''', \
+                (run_id, worker, self.RUNNING)).fetchone()
+            if row is not None:
+                if attempt_dir is not None:
+                    for filename in os.listdir(attempt_dir):
+                        os.replace(os.path.join(attempt_dir, filename), \
+                                   os.path.join(row['output_dir'], filename))
+                    os.rmdir(attempt_dir)
+                connection.execute('''UPDATE runs SET status = ?, finished = ?,
+                    lease_expires = NULL WHERE id = ?''', (self.DONE, time.time(), run_id))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return row is not None
+
+    ############################################################################
+    def fail(self, run_id: int, worker: str, error: str) -> None:
+        ''' method to mark a run as failed (not retried, except by resume),
+            if the worker still holds it '''
+        self._transaction('''UPDATE runs SET status = ?, finished = ?,
+            lease_expires = NULL, error = ? WHERE id = ? AND worker = ? AND status = ?''', \
+            (self.FAILED, time.time(), error, run_id, worker, self.RUNNING))
+
+    ############################################################################
+    def resume(self, include_failed: bool = False) -> int:
+        ''' method to re-queue every unfinished run after a sweep was killed
+            (call only when no workers are running; while workers run, runs
+            of killed workers are re-claimed anyway once their leases expire)
+        Parameters:
+            include_failed: whether to also re-queue failed runs
+        Returns:
+            the number of runs re-queued
+        '''
+        states = (self.RUNNING, self.FAILED) if include_failed else (self.RUNNING,)
+        cursor = self._transaction(f'''UPDATE runs SET status = ?, worker = NULL,
+            lease_expires = NULL WHERE status IN ({",".join("?" * len(states))})''', \
+            (self.PENDING,) + states)
+        return cursor.rowcount
+
+    ############################################################################
+    def status(self) -> dict[str, int]:
+        ''' method returning the number of runs in each state '''
+        counts = {state: 0 for state in (self.PENDING, self.RUNNING, self.DONE, self.FAILED)}
+        for row in self._connection.execute( \
+                "SELECT status, COUNT(*) AS n FROM runs GROUP BY status"):
+            counts[row['status']] = row['n']
+        return counts
+
+    ############################################################################
+    def runs(self) -> list[dict]:
+        ''' method returning all runs (as dicts of their columns), in order '''
+        return [dict(row) for row in self._connection.execute("SELECT * FROM runs ORDER BY id")]
+
+################################################################################
+class _Heartbeat(threading.Thread):
+    ''' background thread renewing a worker's lease on a run every third of
+        the lease length, using its own database connection '''
+    def __init__(self, path: str, run_id: int, worker: str, lease: float) -> None:
+        super().__init__(daemon = True)
+        self._path, self._run_id, self._worker, self._lease = path, run_id, worker, lease
+        self._done = threading.Event()
+        self.lost = False   # whether the run was taken from this worker
+
+    def run(self) -> None:
+        queue = SweepQueue(self._path)
+        try:
+            while not self._done.wait(self._lease / 3):
+                if not queue.heartbeat(self._run_id, self._worker, self._lease):
+                    self.lost = True
+        finally:
+            queue.close()
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+################################################################################
+def work(path: str, worker: str = None, lease: float = SweepQueue.DEFAULT_LEASE, \
+         use_cache: bool = False) -> int:
+    ''' worker loop: claims and runs runs from the queue until none is left
+    Parameters:
+        path: filename of the SQLite database
+        worker: name of the worker (default: host:pid)
+        lease: lease length (in seconds)
+        use_cache: whether runs use the result cache (see result_cache.py;
+            default: False)
+    Returns:
+        the number of runs completed by this worker
+    '''
+    from simulation import Simulation
+
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = SweepQueue(path)
+    completed = 0
+    try:
+        while True:
+            run = queue.claim(worker, lease)
+            if run is None: break
+            # the run writes into a directory of its own attempt, moved into
+            # place by complete() only if the worker still holds the run when
+            # it is done, so that a worker whose lease was lost cannot
+            # overwrite the output of the worker that took the run over
+            attempt_dir = os.path.join(run['output_dir'], f".attempt{run['attempts']}")
+            os.makedirs(attempt_dir, exist_ok = True)
+            overrides = dict(run['overrides'])
+            overrides.update({parameter: os.path.join(attempt_dir, os.path.basename(filename)) \
+                              for parameter, filename in run['outputs'].items()})
+            overrides['PRINT_PARAMETER_VALUES'] = False
+            heartbeat = _Heartbeat(path, run['id'], worker, lease)
+            heartbeat.start()
+            try:
+                Simulation.run(run['input_csv'], overrides, run['clade_overrides'], \
+                               use_cache = use_cache)
+            except Exception:
+                heartbeat.stop()
+                queue.fail(run['id'], worker, traceback.format_exc())
+                shutil.rmtree(attempt_dir, ignore_errors = True)
+                print(f"{worker}: {run['name']} failed")
+                continue
+            heartbeat.stop()
+            if heartbeat.lost or not queue.complete(run['id'], worker, attempt_dir):
+                shutil.rmtree(attempt_dir, ignore_errors = True)
+                print(f"{worker}: {run['name']} result discarded (lease was lost)")
+                continue
+            completed += 1
+            print(f"{worker}: {run['name']} done")
+    finally:
+        queue.close()
+    return completed
+
+################################################################################
+def main() -> None:
+    parser = argparse.ArgumentParser(description = "crash-resumable sweep queue " + \
+        "of simulation runs in a SQLite file")
+    parser.add_argument("queue", help = "SQLite database filename")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    add = commands.add_parser("add", help = "add a run")
+    add.add_argument("input_csv", help = "input CSV filename")
+    add.add_argument("--name", default = None, help = "unique run name (default: run<N>)")
+    add.add_argument("--output-dir", default = None, \
+        help = "directory for the run's output files (default: sweep_output/<name>)")
+    add.add_argument("--set", action = "append", default = [], \
+        metavar = "NAME=VALUE", dest = "overrides", \
+        help = "override a simulation-level parameter (may be repeated)")
+    add.add_argument("--set-clade", action = "append", default = [], \
+        metavar = "N:NAME=VALUE", dest = "clade_overrides", \
+        help = "override a parameter of clade number N (may be repeated)")
+
+    worker = commands.add_parser("worker", help = "run queued runs until none is left")
+    worker.add_argument("--processes", type = int, default = 1, \
+        help = "number of worker processes on this node (default: 1)")
+    worker.add_argument("--lease", type = float, default = SweepQueue.DEFAULT_LEASE, \
+        help = f"lease length in seconds (default: {SweepQueue.DEFAULT_LEASE:g})")
+    worker.add_argument("--cache", action = "store_true", \
+        help = "runs use (and store results in) the result cache")
+    worker.add_argument("--cache-dir", default = ResultCache.DEFAULT_DIRECTORY, \
+        metavar = "DIR", help = "directory of the result cache")
+
+    resume = commands.add_parser("resume", help = "re-queue unfinished runs " + \
+        "(when no workers are running)")
+    resume.add_argument("--failed", action = "store_true", \
+        help = "also re-queue failed runs")
+
+    commands.add_parser("status", help = "show the number of runs in each state")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        try:
+            overrides, clade_overrides = \
+                Parser.parseSettings(args.overrides, args.clade_overrides)
+            queue = SweepQueue(args.queue)
+            run_id = queue.addRun(args.input_csv, overrides, clade_overrides, \
+                                  args.name, args.output_dir)
+        except (ValueError, sqlite3.IntegrityError) as err:
+            parser.error(str(err))
+        print(f"added run {run_id}")
+    elif args.command == "worker":
+        ResultCache.directory = args.cache_dir
+        tasks = [(args.queue, None, args.lease, args.cache)] * args.processes
+        if args.processes == 1:
+            completed = [work(*tasks[0])]
+        else:
+            with multiprocessing.Pool(args.processes, maxtasksperchild = 1) as pool:
+                completed = pool.starmap(work, tasks)
+        print(f"completed {sum(completed)} runs")
+    elif args.command == "resume":
+        print(f"re-queued {SweepQueue(args.queue).resume(args.failed)} runs")
+    else:
+        for state, count in SweepQueue(args.queue).status().items():
+            print(f"{state:<10}{count:>8}")
+
+##########################
+if __name__ == "__main__":
+    main()
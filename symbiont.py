@@ -2,12 +2,15 @@ import logging
 import copy  # for copy constructor:
     # http://stackoverflow.com/questions/1241148/copy-constructor-in-python
     # http://pymotw.com/2/copy/
+from bisect import bisect_right
 from numpy import cumsum
 from parameters import *
 from rng_mt19937 import *
 from event_list import Event, EventType
 from clade import *
 from sponge import Cell
+from output_writer import OutputWriter, Channel
+from exit_statistics import ExitStatistics
 
 ###############################################################################
 # This class implements a symbiont alga in the agent-based simulation.
@@ -62,7 +65,9 @@ from sponge import Cell
 #    __str__()                         : use to print a symbiont
 #    getNextEvent()                    : returns next event as (time,EventType)
 #    openCSVFile        [class-level]  : open CSV file for writing per-symbiont info (if requested)
-#    csvOutputOnExit    [class-level]  : dumps symbiont info to CSV @ time of symbiont exit
+#    enableExitSummary  [class-level]  : turn on per-clade exit statistics (if requested)
+#    csvOutputOnExit    [class-level]  : dumps symbiont info to CSV (and/or exit statistics) @ symbiont exit
+#    formatCSVRecord    [static]       : formats one per-symbiont CSV line (in the writer thread)
 #    csvOutputAtEnd     [class-level]  : dumps remaining in-residence symbiont info to CSV @ simulation end
 #    findOpenCell       [class-level]  : finds an open cell at random among all avaiable in sponge
 #    findOpenCellWithin [class-level]  : finds an open cell at random within a given neighborhood
@@ -146,17 +151,29 @@ class Symbiont:
                  '_time_of_next_end_g1sg2m', \
                  )
 
+    # outcomes of a division (see endOfG1SG2M)
+    DIVISION_OUTCOMES : tuple[SymbiontState] = (SymbiontState.BOTH_STAY, \
+        SymbiontState.CHILD_INFECTS_OUTSIDE, SymbiontState.PARENT_INFECTS_OUTSIDE, \
+        SymbiontState.CHILD_EVICTED, SymbiontState.PARENT_EVICTED, \
+        SymbiontState.CHILD_NO_AFFINITY, SymbiontState.PARENT_NO_AFFINITY)
+
     # class-level variables
     sponge : 'Sponge' = None   # set in simulation.py main function when symbionts are created
     clade_cumulative_proportions : list[float] = [None] * len(Parameters.CLADE_PROPORTIONS)
+    clade_constants : list[CladeConstants] = []   # see computeCladeConstants
     _count : int      = 0      # used to count total number of symbionts
 
     # class-level variables for writing per-symbiont statistics; whether to
     # write the CSV information can be changed via command-line argument at
     # simulation execution
     _write_csv:  bool                = False  
+    _write_summary: bool             = False
     _csv_writes: int                 = 0
-    _csv_file:   '_io.TextIOWrapper' = None
+    _num_arrivals: int               = 0      # arrivals from the pool
+    _num_rejected_arrivals: int      = 0      # ... rejected as the sponge was full
+    _num_accepted_arrivals: int      = 0      # ... phagocytosed into a cell
+    _division_outcomes: dict         = {}     # SymbiontState -> count (see endOfG1SG2M)
+    _last_division_outcome: 'SymbiontState' = None
 
     ############################################################################
     def __init__(self, clade_number: int, cell: Cell, current_time: float) -> None:
@@ -225,9 +242,10 @@ class Symbiont:
         # INDIVIDUAL SYMBIONT FUZZING
         # Rather than fuzzing uniformly, use normal with 95% of the data
         # between (mu +/- mu*f) -- see implementation in rng.py
-        m = float(self._my_clade.getMCR())
-        f = float(self._my_clade.getMCRFuzz())  # assume to be % of the mean
-        self._mitotic_cost_rate = RNG.fuzz(m, f, Stream.MITOTIC_COST_RATE)
+        # (the clade's means and fuzz SDs are precomputed -- see CladeConstants)
+        constants = Symbiont.clade_constants[clade_number]
+        self._mitotic_cost_rate = RNG.fuzzWithSD(constants.mcr, constants.mcr_sd, \
+                                                 Stream.MITOTIC_COST_RATE)
 
         self._production_rate = self._computeProductionRate(is_copy = False, current_time = current_time)
 
@@ -235,12 +253,12 @@ class Symbiont:
         # Connor and Barry experimented and determined gamma(2,0.75) looks
         # reasonable -- mean = 1.5, 50% = 1.25
         # 08 Oct 2016: add max, per Malcolm suggetion in 7 Oct meeting
-        clade_max_photosynthate = self._my_clade.getMaxInitialSurplus()
+        clade_max_photosynthate = constants.max_initial_surplus
         self._photosynthate_surplus = INFINITY
         while self._photosynthate_surplus > clade_max_photosynthate:
             self._photosynthate_surplus = RNG.gamma( \
-                self._my_clade.getInitialSurplusShape(), \
-                self._my_clade.getInitialSurplusScale(), \
+                constants.initial_surplus_shape, \
+                constants.initial_surplus_scale, \
                 Stream.PHOTOSYNTHATE)
         #print(">>>>>>>>> ORIG SURPLUS= ",self._photosynthate_surplus)
 
@@ -481,11 +499,11 @@ class Symbiont:
             stream_exit = None
             if state == SymbiontState.IN_G0:
                 stream_prob = Stream.DIGESTION_VS_ESCAPE_G0
-                prob        = self._my_clade.getG0EscapeProb()
+                prob        = Symbiont.clade_constants[self._clade_number].g0_escape_prob
                 stream_exit = Stream.TIME_G0_ESCAPE
             elif state == SymbiontState.IN_G1SG2M:
                 stream_prob = Stream.DIGESTION_VS_ESCAPE_G1SG2M
-                prob        = self._my_clade.getG1SG2MEscapeProb()
+                prob        = Symbiont.clade_constants[self._clade_number].g1sg2m_escape_prob
                 stream_exit = Stream.TIME_G1SG2M_ESCAPE
             else:
                 assert(False) # should never get here if state is not one of the above
@@ -510,9 +528,9 @@ class Symbiont:
             the next end-of-G0 time for this symbiont (float)
         '''
         # using normal distribution
-        m = self._my_clade.getG0Length()
-        f = self._my_clade.getG0Fuzz()
-        g0_time = RNG.fuzz(m, f, Stream.END_G0)  # fuzzed version of G0 length
+        constants = Symbiont.clade_constants[self._clade_number]
+        g0_time = RNG.fuzzWithSD(constants.g0_length, constants.g0_sd, \
+                                 Stream.END_G0)  # fuzzed version of G0 length
         #print(f">>> G0: {g0_time}")
 
         next_time = current_time + g0_time
@@ -529,9 +547,9 @@ class Symbiont:
             the next end-of-G1SG2M time for this symbiont (float)
         '''
         # Using normal distribution
-        m = self._my_clade.getG1SG2MLength()
-        f = self._my_clade.getG1SG2MFuzz()
-        g1sg2m_time = RNG.fuzz(m, f, Stream.END_G1SG2M)  # fuzzed version of G1SG2M length
+        constants = Symbiont.clade_constants[self._clade_number]
+        g1sg2m_time = RNG.fuzzWithSD(constants.g1sg2m_length, constants.g1sg2m_sd, \
+                                     Stream.END_G1SG2M)  # fuzzed version of G1SG2M length
         #print(f">>> G1SG2M: {g1sg2m_time}")
 
         next_time = current_time + g1sg2m_time
@@ -684,7 +702,7 @@ class Symbiont:
             # child is created but it or parent presumed gone outside our
             # environment -- call the _SymbiontCopy method
             prob = RNG.uniform(0, 1, Stream.EVICTION)
-            if prob < self._my_clade.getParentEvictionProb():
+            if prob < Symbiont.clade_constants[self._clade_number].parent_eviction_prob:
                 ######################################################
                 ## child stays in current cell, parent infects outside
                 ######################################################
@@ -708,7 +726,7 @@ class Symbiont:
         elif open_cell is not None:  # there is an open cell for child or parent
         #########################################################################
             prob = RNG.uniform(0, 1, Stream.EVICTION)
-            if prob < self._my_clade.getParentEvictionProb():
+            if prob < Symbiont.clade_constants[self._clade_number].parent_eviction_prob:
                 ## child stays in current cell, parent moves to the new open cell
                 #print(f"Parent goes to open cell {self._id}")
                 child = self._SymbiontCopy(self._cell, current_time)
@@ -757,7 +775,7 @@ class Symbiont:
             # if 1, the parent will be evicted into the pool, and the copied 
             #     child will go into the current cell
             prob = RNG.uniform(0, 1, Stream.EVICTION) 
-            if prob < self._my_clade.getParentEvictionProb():
+            if prob < Symbiont.clade_constants[self._clade_number].parent_eviction_prob:
                 ## child stays in current cell, parent evicted into pool;
                 ## call symbiont copy constructor, place child into current cell
                 #print(f"Parent evicted into pool {self._id}")
@@ -802,6 +820,8 @@ class Symbiont:
         self._prev_event_type = EventType.END_G1SG2M
         self._setNextEvent()
 
+        Symbiont._last_division_outcome = return_status_and_child[0]
+        Symbiont._division_outcomes[return_status_and_child[0]] += 1
         return return_status_and_child
 
     #############################################################################
@@ -986,9 +1006,9 @@ class Symbiont:
         # symbiont leaves the host cell in order to reproduce) -- this may be
         # superseded by the exit strategy computation below...
 
-        m = self._my_clade.getAvgResidenceTime()
-        f = self._my_clade.getResidenceFuzz()
-        residence_time = RNG.fuzz(m, f, Stream.TIME_DENOUEMENT)
+        constants = Symbiont.clade_constants[self._clade_number]
+        residence_time = RNG.fuzzWithSD(constants.residence_time, constants.residence_sd, \
+                                        Stream.TIME_DENOUEMENT)
         self._time_of_denouement = current_time + residence_time
         #print(f">>> RESTIME: {residence_time}")
 
@@ -1047,17 +1067,18 @@ class Symbiont:
         # maximum number of rows;  after dervation, this should give a line
         # equation of 
         #           y = rho_X + ((1-k)/k)*(x*rho_X/(N-1))
-        # where y is the production rate and x is the corresponding row
-        k = self._my_clade.getPhotosyntheticReduction()
+        # where y is the production rate and x is the corresponding row;
+        # ((1-k)/k and N-1 are precomputed per clade, as are the arrival rates
+        # (rho_X fixed) for each row -- see CladeConstants)
+        constants = Symbiont.clade_constants[self._clade_number]
+        row, col = self._cell.getRowCol() # row x in the equation above
         #######################################################################
         if is_copy:
             rho = self._production_rate  # this is an exact copy of parent
+            rate = rho + constants.gradient * (row*rho/constants.row_denominator)
         else:
-            rho = self._my_clade.getPPR()
+            rate = constants.arrival_rates[row]
         #######################################################################
-        num_rows, num_cols = Symbiont.sponge.getDimensions()
-        row, col = self._cell.getRowCol() # row x in the equation above
-        rate = rho + (float(1-k)/k) * (row*rho/float(num_rows-1))
 
         ## 12 Apr 2016
         # for fuzzing, use normal with  95% of the data b/w (mu +/- mu*f) -- 
@@ -1080,9 +1101,7 @@ class Symbiont:
             '''
         else:
             # use normal -- see implementation in rng.py
-            m = rate
-            f = self._my_clade.getPPRFuzz()
-            fuzzed_rate = RNG.fuzz(m, f, Stream.PHOTOPROD)
+            fuzzed_rate = RNG.fuzzWithSD(rate, constants.arrival_rate_sds[row], Stream.PHOTOPROD)
 
         return fuzzed_rate  # y in the equation above
 
@@ -1092,6 +1111,7 @@ class Symbiont:
     def getCladeNumber(self)   -> int:       return self._clade_number
     def getArrivalTime(self)   -> float:     return self._arrival_time
     def getPrevEventType(self) -> EventType: return self._prev_event_type
+    def getSurplus(self)       -> float:     return self._photosynthate_surplus
 
     #############################################################################
     def __str__(self) -> str:
@@ -1132,64 +1152,93 @@ class Symbiont:
         # This method should be called whenever one of those happens, giving CSV
         # output for the statistics of that exiting symbiont.
         #
+        if Symbiont._write_summary:
+            ExitStatistics.addExit(self._clade_number, exit_status, current_time, \
+                current_time - self._arrival_time, self._num_divisions, \
+                self._surplus_on_arrival, self._photosynthate_surplus)
         if not Symbiont._write_csv: return
-        strval  = str(self._id)                + ','    # overall symbiont id number
-        strval += str(self._how_arrived.name)  + ','    # via pool or division
-        strval += str(self._parent_id)         + ','    # id of parent, -1 via pool
-        strval += str(self._agent_zero)        + ','    # id of ultimate ancestor
-        strval += str(self._clade_number)      + ','
-        strval += str(self._mitotic_cost_rate) + ','
-        strval += str(self._production_rate)   + ','
-        strval += str(self._arrival_time)      + ','    # arrival time
+        # if symbiont is a child immediately evicted or child who infected outside
+        # that means it received a g0 time that was never used -- let's not
+        # include the g0 time in the output; a parent who finished g1sg2m but was 
+        # evicted or infected outside does not get assigned a new g0 time -- see 
+        # endG1SG2M(); for a symbiont who is digested or escapes during G0 (added 
+        # via _computeNextEndOfG0() near end of endG1SG2M()), want to keep that g0
+        # time in the output as it was "partially" used...  (see overall comments
+        # appended to the bottom of this program)
+        len_g0_times = len(self._g0_times)
+        if exit_status == SymbiontState.CHILD_INFECTS_OUTSIDE or \
+           exit_status == SymbiontState.CHILD_EVICTED: len_g0_times -= 1
+
+        # only gather the values here; the (comparatively expensive) conversion
+        # to a CSV line happens in the OutputWriter thread -- see formatCSVRecord;
+        # the lists can be passed by reference since an exiting symbiont is
+        # never updated again
+        record = (self._id, self._how_arrived, self._parent_id, self._agent_zero, \
+                  self._clade_number, self._mitotic_cost_rate, self._production_rate, \
+                  self._arrival_time, current_time, exit_status, \
+                  self._prev_event_time, self._prev_event_type, \
+                  self._surplus_on_arrival, self._photosynthate_surplus, \
+                  self._num_divisions, self._time_of_escape, \
+                  self._time_of_digestion, self._time_of_denouement, \
+                  self._cells_inhabited, self._inhabit_times, \
+                  self._hcds_of_cells_inhabited, \
+                  self._g0_times[:max(len_g0_times, 0)], self._g1sg2m_times)
+        OutputWriter.put(Channel.CSV, record)
+        Symbiont._csv_writes += 1
+
+    ###################################################################################
+    @staticmethod
+    def formatCSVRecord(record: tuple) -> str:
+        ''' formats a record created by csvOutputOnExit as a line of the per-symbiont
+            CSV file (applied by the OutputWriter thread)
+        Parameters:
+            record: tuple of per-symbiont values gathered at exit
+        Returns:
+            the CSV line as a str
+        '''
+        (symbiont_id, how_arrived, parent_id, agent_zero, clade_number, \
+         mitotic_cost_rate, production_rate, arrival_time, current_time, \
+         exit_status, prev_event_time, prev_event_type, surplus_on_arrival, \
+         photosynthate_surplus, num_divisions, time_of_escape, time_of_digestion, \
+         time_of_denouement, cells_inhabited, inhabit_times, \
+         hcds_of_cells_inhabited, g0_times, g1sg2m_times) = record
+
+        strval  = str(symbiont_id)             + ','    # overall symbiont id number
+        strval += str(how_arrived.name)        + ','    # via pool or division
+        strval += str(parent_id)               + ','    # id of parent, -1 via pool
+        strval += str(agent_zero)              + ','    # id of ultimate ancestor
+        strval += str(clade_number)            + ','
+        strval += str(mitotic_cost_rate)       + ','
+        strval += str(production_rate)         + ','
+        strval += str(arrival_time)            + ','    # arrival time
         strval += str(current_time)            + ','    # exit time (1 of 4 above)
         strval += str(exit_status.name)        + ','
         ## begin added 31 Oct 2016
-        strval += str(self._prev_event_time)             + ','
-        strval += str(self._prev_event_type.name)        + ',' 
+        strval += str(prev_event_time)                   + ','
+        strval += str(prev_event_type.name)              + ',' 
         ## end added 31 Oct 2016
-        strval += str(current_time - self._arrival_time) + ','  # residence time
-        strval += str(self._surplus_on_arrival)          + ','  # surplus @ arrival
-        strval += str(self._photosynthate_surplus)       + ','  # surplus @ exit
-        strval += str(self._num_divisions)               + ','  # num successful divs
-        strval += str(self._time_of_escape)              + ','
-        strval += str(self._time_of_digestion)           + ','
-        strval += str(self._time_of_denouement)          + ','
+        strval += str(current_time - arrival_time)       + ','  # residence time
+        strval += str(surplus_on_arrival)                + ','  # surplus @ arrival
+        strval += str(photosynthate_surplus)             + ','  # surplus @ exit
+        strval += str(num_divisions)                     + ','  # num successful divs
+        strval += str(time_of_escape)                    + ','
+        strval += str(time_of_digestion)                 + ','
+        strval += str(time_of_denouement)                + ','
         if exit_status == SymbiontState.STILL_IN_RESIDENCE:
             strval += SymbiontState.STILL_IN_RESIDENCE.name + ','
         else:
             strval += "NOT_IN_RESIDENCE,"
         # append cells (perhaps multiple) inhabited by symbiont -- separate w/ ;
-        for i in range(len(self._cells_inhabited)):
-            strval += ('"' if i == 0 else ';') + str(self._cells_inhabited[i])
-        if len(self._cells_inhabited) > 0: strval += '"'
+        if len(cells_inhabited) > 0:
+            strval += '"' + ';'.join([str(c) for c in cells_inhabited]) + '"'
         # append times (perhaps multiple) cells were inhabited by symbiont
-        strval += ','
-        for i in range(len(self._inhabit_times)):
-            strval += ('' if i == 0 else ';') + str(self._inhabit_times[i])
+        strval += ',' + ';'.join([str(t) for t in inhabit_times])
         # append hcds (perhaps multiple) of cells inhabited by symbiont
-        strval += ','
-        for i in range(len(self._hcds_of_cells_inhabited)):
-            strval += ('' if i == 0 else ';') + str(self._hcds_of_cells_inhabited[i])
+        strval += ',' + ';'.join([str(h) for h in hcds_of_cells_inhabited])
         # append g0 times symbiont experienced; separate diff times by semicolon
-        strval += ','
-        # if symbiont is a child immediately evicted or child who infected outside
-        # that means it received a g0 time that was never used -- let's not
-        # include the g0 time in the output; a parent who finished g1sg2m but was 
-        # evicted or infected outside does not get assigned a new g0 time -- see 
-        # endG1SG2M(); for a symbiont who is digested or escapes during G0 (added 
-        # via _computeNextEndOfG0() near end of endG1SG2M()), want to keep that g0
-        # time in the output as it was "partially" used...  (see overall comments
-        # appended to the bottom of this program)
-        len_g0_times = len(self._g0_times)
-        if exit_status == SymbiontState.CHILD_INFECTS_OUTSIDE or \
-           exit_status == SymbiontState.CHILD_EVICTED: len_g0_times -= 1
-        for i in range(len_g0_times):
-            strval += ('' if i == 0 else ';') + str(self._g0_times[i])
-        #
+        strval += ',' + ';'.join([str(t) for t in g0_times])
         # append g1sg2m times symbiont experienced; separate diff times by semicolon
-        strval += ','
-        for i in range(len(self._g1sg2m_times)):
-            strval += ('' if i == 0 else ';') + str(self._g1sg2m_times[i])
+        strval += ',' + ';'.join([str(t) for t in g1sg2m_times])
         #
         # append cnt of open cells (at division) seen; separate diff times by semicolon
         #strval += ','
@@ -1197,8 +1246,7 @@ class Symbiont:
         #    strval += ('' if i == 0 else ';') + str(self._cells_at_division[i])
         #
         strval += '\n'
-        Symbiont._csv_file.write(strval)
-        Symbiont._csv_writes += 1
+        return strval
 
     #############################################################################
     @classmethod
@@ -1208,29 +1256,76 @@ class Symbiont:
             probabilities of arriving -- used when generating a symbiont
             arrival
         '''
-        cls.clade_cumulative_proportions = numpy.cumsum(Parameters.CLADE_PROPORTIONS)
+        cumulative = numpy.cumsum(Parameters.CLADE_PROPORTIONS)
         # set last entry to 1.0 just to be safe (avoid roundoff errors)
-        cls.clade_cumulative_proportions[-1] = 1.0
+        cumulative[-1] = 1.0
+        # (kept as a list of float: searched by bisect -- see generateArrival)
+        cls.clade_cumulative_proportions = cumulative.tolist()
+
+    @classmethod
+    def computeCladeConstants(cls, num_rows: int) -> None:
+        ''' class-level method to set up the per-clade constants (see
+            CladeConstants) used by the symbionts' hot paths, once the clades
+            and the sponge's number of rows are known
+        Parameters:
+            num_rows: number of rows in the sponge
+        '''
+        cls.clade_constants = [CladeConstants(clade, num_rows) for clade in Clade.clade_objects]
+
+    @classmethod
+    def initializeRun(cls) -> None:
+        ''' class-level method to reset the symbiont count (ids) and output
+            settings at the start of a run (in case of a previous run in this
+            process) '''
+        cls._count          = 0
+        cls._write_csv      = False
+        cls._write_summary  = False
+        cls._csv_writes     = 0
+        cls._num_arrivals   = 0
+        cls._num_rejected_arrivals = 0
+        cls._num_accepted_arrivals = 0
+        cls._division_outcomes = {status: 0 for status in cls.DIVISION_OUTCOMES}
+        cls._last_division_outcome = None
 
     @classmethod
     def openCSVFile(cls, csv_fname: str) -> None:
         cls._write_csv = True
-        cls._csv_file = open(csv_fname, "w")
-        cls._csv_file.write(\
+        OutputWriter.openChannel(Channel.CSV, csv_fname, cls.formatCSVRecord, header = \
            'symbID,poolOrDiv,parent,agentZero,clade,mcr,ppr,'\
           +'arrTime,exitTime,exitStatus,lastEventTime,lastEventType,'\
           +'resTime,arrSurplus,exitSurplus,divs,'\
           +'tEsc,tDig,tRes,stillInRes,cells,inhabitTimes,'\
-          +'hcds,g0Times,g1sg2mTimes,cellsAtDiv\n');
+          +'hcds,g0Times,g1sg2mTimes,cellsAtDiv\n')
+
+    @classmethod
+    def openCSVSink(cls, sink: object) -> None:
+        ''' class-level method to send the per-symbiont records (see
+            csvOutputOnExit) to the given OutputWriter sink instead of the CSV
+            file, e.g., a MemorySink
+        '''
+        cls._write_csv = True
+        OutputWriter.openSink(Channel.CSV, sink)
+
+    @classmethod
+    def enableExitSummary(cls, window: float, max_time: float) -> None:
+        ''' class-level method to turn on the per-clade exit statistics (see
+            ExitStatistics), which are updated on every symbiont exit
+        Parameters:
+            window: length (in days) of each exit-time window; 0 for no windows
+            max_time: maximum simulated time (float)
+        '''
+        cls._write_summary = True
+        ExitStatistics.initialize(window, max_time)
 
     @classmethod
     def csvOutputAtEnd(cls, current_time: float) -> None:
         ''' class-level method to write to CSV the per-symbiont information (if
-            requested) at the end of the simulation
+            requested) at the end of the simulation, and to add those still in
+            residence to the per-clade exit statistics (if requested)
         Parameters:
             current_time: current simulation time @ end (float)
         '''
-        if not cls._write_csv: return
+        if not cls._write_csv and not cls._write_summary: return
         # write output for all those still in residence
         rows, cols = cls.sponge.getDimensions()
         for r in range(rows):
@@ -1239,7 +1334,8 @@ class Symbiont:
                 symbiont = cell.getSymbiont()
                 if symbiont is not None:
                     symbiont.csvOutputOnExit(current_time, SymbiontState.STILL_IN_RESIDENCE)
-        Symbiont._csv_file.close()
+        # flush all remaining records for the CSV file and close it
+        OutputWriter.closeChannel(Channel.CSV)
   
 
     #############################################################################
@@ -1267,7 +1363,8 @@ class Symbiont:
 
     #######################################################################################
     @classmethod
-    def findOpenCellWithin(cls, min_row: int, max_row: int, min_col: int, max_col: int) -> Cell:
+    def findOpenCellWithin(cls, min_row: int, max_row: int, min_col: int, max_col: int) \
+            -> Cell or None:
         ''' Static method to find and select an open cell at random among 
             available (unoccupied) cells within a particular section of the Sponge grid.
             Note that min_row and min_col are inclusive; max_row and max_col
@@ -1278,7 +1375,8 @@ class Symbiont:
             min_col: the minimum col value to start the search (inclusive)
             max_col: the maximum col value to end the search (exclusive)
         Returns:
-            the Cell object selected
+            the Cell object selected, or None if the section has no open cell
+            (e.g., with many clades, some sharing a row or column)
         '''
         # create a list of all open cells
         open_cells = []
@@ -1288,8 +1386,7 @@ class Symbiont:
                 if not cell.isOccupied():
                     open_cells.append(cell)
 
-        # we should never call this method unless there is at least one open cell
-        assert(len(open_cells) > 0)
+        if len(open_cells) == 0: return None
 
         # pick one @ random
         which = RNG.randint(0, len(open_cells)-1, Stream.OPEN_CELL_ON_ARRIVAL)
@@ -1297,6 +1394,39 @@ class Symbiont:
 
     ################################################################################
     @classmethod
+    def getArrivalCounts(cls) -> tuple[int, int]:
+        ''' class-level method returning (number of arrivals from the pool,
+            number of those rejected because the sponge was full) so far '''
+        return (cls._num_arrivals, cls._num_rejected_arrivals)
+
+    @classmethod
+    def addRejectedArrivals(cls, count: int) -> None:
+        ''' class-level method to count arrivals from the pool rejected because
+            the sponge was full without generating them (see ARRIVAL_FAST_FORWARD
+            in simulation.py) '''
+        cls._num_arrivals += count
+        cls._num_rejected_arrivals += count
+
+    @classmethod
+    def getNumAcceptedArrivals(cls) -> int:
+        ''' class-level method returning the number of arrivals from the pool
+            that were phagocytosed (the others were rejected because the
+            sponge was full or for lack of arrival affinity) '''
+        return cls._num_accepted_arrivals
+
+    @classmethod
+    def getDivisionOutcomes(cls) -> dict[SymbiontState, int]:
+        ''' class-level method returning the number of divisions so far with
+            each outcome (see endOfG1SG2M) '''
+        return dict(cls._division_outcomes)
+
+    @classmethod
+    def getLastDivisionOutcome(cls) -> SymbiontState:
+        ''' class-level method returning the outcome of the most recent division '''
+        return cls._last_division_outcome
+
+    #############################################################################
+    @classmethod
     def generateArrival(cls, current_time: float, num_symbionts: int) -> 'Symbiont or None':
         ''' method to generate a symbiont arrival
         Parameters:
@@ -1306,15 +1436,19 @@ class Symbiont:
             a new Symbiont object, if the sponge is not already full; None o/w
         '''
         # no need to even try if there are no available cells
+        cls._num_arrivals += 1
         if num_symbionts == Parameters.NUM_ROWS * Parameters.NUM_COLS:
             #logging.debug('\tNo cells available')
+            cls._num_rejected_arrivals += 1
             return None
 
         # now handle the arrival -- pick a clade at random using the previously
-        # defined cumulative proportions for clades...
+        # defined cumulative proportions for clades: the first clade whose
+        # cumulative proportion exceeds prob, found by binary search (so the
+        # cost grows only as log(NUM_CLADES), e.g., for strain-level runs with
+        # hundreds of clades)
         prob = RNG.uniform(0, 1, Stream.CLADE)
-        clade = 0
-        while prob >= cls.clade_cumulative_proportions[clade]: clade += 1
+        clade = bisect_right(cls.clade_cumulative_proportions, prob)
     
         # now determine if there is appropriate affinity for infection;
         # first grab the clade object and use it to calculate arrival affinity
@@ -1327,6 +1461,7 @@ class Symbiont:
             open_cell = cls.findOpenCell()
             symbiont  = Symbiont(clade, open_cell, current_time)  
             open_cell.setSymbiont(symbiont, current_time)
+            cls._num_accepted_arrivals += 1
         else:
             #logging.debug('\tNo affinity: clade %s' % (clade))
             symbiont = None
@@ -0,0 +1,160 @@
+import math
+import os
+import sys
+import time
+
+from event_list import EventType
+from symbiont import Symbiont, SymbiontState
+from compressed_io import CompressedIO
+
+################################################################################
+class Telemetry:
+    ''' Class to implement optional performance telemetry for a simulation
+        run (enabled by WRITE_TELEMETRY_INFO): every TELEMETRY_INTERVAL
+        simulated days and/or every TELEMETRY_EVENTS events, one row is
+        written to the CSV file TELEMETRY_FILENAME with
+            - wall time, simulated time, and the number of events so far,
+            - events per second of wall time since the previous row, in
+              total and by event type,
+            - the length of the event list and the numbers of symbionts
+              (total and per clade),
+            - arrivals from the pool so far: accepted, rejected because the
+              sponge was full, and rejected for lack of arrival affinity,
+            - divisions so far, by outcome (see Symbiont.endOfG1SG2M), and
+            - the resident set size of the process, in MB,
+        so that slowdowns can be related to population growth and grid
+        saturation.  When telemetry is disabled the simulation holds no hook
+        at all: the event handlers are wrapped with counting handlers (see
+        wrapHandlers) only when it is enabled.
+    '''
+
+    # event types and division outcomes, in the order of the file's columns
+    EVENT_TYPES : tuple[EventType] = (EventType.ARRIVAL, EventType.END_G0, \
+        EventType.END_G1SG2M, EventType.DIGESTION, EventType.ESCAPE, \
+        EventType.DENOUEMENT)
+    DIVISION_OUTCOMES : tuple[SymbiontState] = Symbiont.DIVISION_OUTCOMES
+
+    # class-level variables
+    _file        : 'io.TextIOBase' = None
+    _clock       : 'callable'      = None   # returns the current simulated time
+    _state       : 'callable'      = None   # see open
+    _interval    : float           = math.inf
+    _next_time   : float           = math.inf
+    _every       : int             = 0
+    _countdown   : list[int]       = [0]    # events until the next row
+    _counts      : list[int]       = []     # events so far, by EVENT_TYPES index
+    _prev_counts : list[int]       = []     # ... as of the previous row
+    _start_wall  : float           = 0.0
+    _prev_wall   : float           = 0.0
+
+    ############################################################################
+    @classmethod
+    def open(cls, filename: str, interval: float, every: int, num_clades: int, \
+             clock: 'callable', state: 'callable') -> None:
+        ''' class-level method to create the telemetry file and write its header
+        Parameters:
+            filename: name of the CSV file to be written (may be compressed;
+                see CompressedIO)
+            interval: simulated days between rows (0 for none)
+            every: number of events between rows (0 for none)
+            num_clades: number of clades
+            clock: function returning the current simulated time
+            state: function returning a tuple of (length of the event list,
+                total number of symbionts, list of per-clade numbers)
+        Raises:
+            ValueError, if neither interval nor every is positive
+        '''
+        if interval <= 0 and every <= 0:
+            raise ValueError("Error in Telemetry: TELEMETRY_INTERVAL or " + \
+                             "TELEMETRY_EVENTS must be positive")
+        cls._file     = CompressedIO.openForWriting(filename)
+        cls._clock    = clock
+        cls._state    = state
+        cls._interval = interval if interval > 0 else math.inf
+        cls._next_time = cls._interval
+        cls._every    = every
+        # (a countdown that starts below zero never reaches zero)
+        cls._countdown = [every if every > 0 else -1]
+        cls._counts      = [0] * len(cls.EVENT_TYPES)
+        cls._prev_counts = [0] * len(cls.EVENT_TYPES)
+        cls._start_wall  = cls._prev_wall = time.perf_counter()
+
+        header = ['wallTime', 'simTime', 'events', 'eventsPerSec'] + \
+                 [f'{t.name}PerSec' for t in cls.EVENT_TYPES] + \
+                 ['eventListLen', 'total'] + [f'clade{c+1}' for c in range(num_clades)] + \
+                 ['arrAccepted', 'arrRejectedFull', 'arrRejectedAffinity'] + \
+                 [s.name for s in cls.DIVISION_OUTCOMES] + ['rssMB']
+        cls._file.write(','.join(header) + '\n')
+        cls.sample()
+
+    ############################################################################
+    @classmethod
+    def wrapHandlers(cls, handlers: dict) -> dict:
+        ''' class-level method returning a copy of the simulation's event-handler
+            table (see Simulation.runUntil) in which each handler also counts
+            its events and writes a telemetry row when one is due '''
+        counts, countdown, clock = cls._counts, cls._countdown, cls._clock
+
+        def counting(handler: 'callable', index: int) -> 'callable':
+            def handle(event_type: EventType, symbiont: Symbiont, trace: 'callable') -> None:
+                handler(event_type, symbiont, trace)
+                counts[index] += 1
+                countdown[0] -= 1
+                if countdown[0] == 0 or clock() >= cls._next_time: cls.sample()
+            return handle
+
+        return {event_type: counting(handler, cls.EVENT_TYPES.index(event_type)) \
+                for event_type, handler in handlers.items()}
+
+    ############################################################################
+    @classmethod
+    def sample(cls) -> None:
+        ''' class-level method to write one telemetry row for the current state '''
+        now      = time.perf_counter()
+        sim_time = cls._clock()
+        elapsed  = now - cls._prev_wall
+        rates    = [(c - p) / elapsed if elapsed > 0 else 0.0 \
+                    for c, p in zip(cls._counts, cls._prev_counts)]
+        event_list_len, total, per_clade = cls._state()
+        arrivals, rejected_full = Symbiont.getArrivalCounts()
+        accepted = Symbiont.getNumAcceptedArrivals()
+        outcomes = Symbiont.getDivisionOutcomes()
+
+        row = [f'{now - cls._start_wall:.3f}', f'{sim_time:.6g}', str(sum(cls._counts)), \
+               f'{sum(rates):.1f}'] + [f'{rate:.1f}' for rate in rates] + \
+              [str(event_list_len), str(total)] + [str(n) for n in per_clade] + \
+              [str(accepted), str(rejected_full), str(arrivals - accepted - rejected_full)] + \
+              [str(outcomes.get(s, 0)) for s in cls.DIVISION_OUTCOMES] + \
+              [f'{cls.residentSetSize() / (1 << 20):.1f}']
+        cls._file.write(','.join(row) + '\n')
+
+        cls._prev_wall   = now
+        cls._prev_counts = list(cls._counts)
+        cls._countdown[0] = cls._every if cls._every > 0 else -1
+        while cls._next_time <= sim_time: cls._next_time += cls._interval
+
+    ############################################################################
+    @classmethod
+    def close(cls) -> None:
+        ''' class-level method to write a final row and close the file '''
+        if cls._file is None: return
+        cls.sample()
+        cls._file.close()
+        cls._file = None
+
+    ############################################################################
+    @staticmethod
+    def residentSetSize() -> int:
+        ''' returns the current resident set size of this process in bytes
+            (from /proc on Linux; elsewhere, the peak resident set size) '''
+        try:
+            with open('/proc/self/statm') as file:
+                return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            pass
+        try:
+            import resource
+        except ImportError:   # (e.g., Windows)
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # bytes vs. KB